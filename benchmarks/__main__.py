@@ -0,0 +1,64 @@
+import argparse
+import sys
+from pathlib import Path
+
+from .runner import (
+    BASELINE_PATH,
+    BENCHMARKS,
+    DEFAULT_THRESHOLD,
+    compare_results,
+    format_report,
+    load_results,
+    run_benchmark,
+    save_results,
+)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks",
+        description="Run jmapc benchmarks and compare them to a baseline",
+    )
+    parser.add_argument(
+        "names", nargs="*", help="Benchmarks to run (default: all)"
+    )
+    parser.add_argument("--scale", type=float, default=1.0)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--baseline",
+        type=Path,
+        default=BASELINE_PATH,
+        help=f"Baseline results file (default: {BASELINE_PATH.name})",
+    )
+    parser.add_argument(
+        "--save", action="store_true", help="Save results as the baseline"
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="Allowed slowdown or memory growth ratio before failing",
+    )
+    args = parser.parse_args()
+    benchmarks = [
+        b for b in BENCHMARKS if not args.names or b.name in args.names
+    ]
+    results = []
+    for benchmark in benchmarks:
+        print(f"Running {benchmark.name}...", file=sys.stderr)
+        results.append(run_benchmark(benchmark, args.scale, args.repeat))
+    if args.save:
+        save_results(args.baseline, results)
+        print(format_report(results))
+        return 0
+    comparisons = (
+        compare_results(results, load_results(args.baseline), args.threshold)
+        if args.baseline.exists()
+        else []
+    )
+    print(format_report(results, comparisons))
+    return 1 if any(c.regressed for c in comparisons) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
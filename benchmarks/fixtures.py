@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import json
+from typing import Any
+
+import sseclient
+
+from jmapc import (
+    Email,
+    EmailQueryFilter,
+    EmailQueryFilterCondition,
+    EmailQueryFilterOperator,
+    Operator,
+    Ref,
+)
+from jmapc.methods import EmailGet, EmailQuery, Method
+
+RECEIVED_AT = "1994-08-24T12:01:02Z"
+
+
+def body_part_data(depth: int, part_id: str = "1") -> dict[str, Any]:
+    part: dict[str, Any] = {
+        "partId": part_id,
+        "blobId": f"B{part_id}",
+        "size": 512,
+        "headers": [{"name": "Content-Type", "value": "text/plain"}],
+        "type": "text/plain",
+        "charset": "utf-8",
+    }
+    if depth:
+        part["type"] = "multipart/mixed"
+        part["subParts"] = [
+            body_part_data(depth - 1, f"{part_id}.{n}") for n in (1, 2)
+        ]
+    return part
+
+
+def email_data(i: int, body_depth: int = 3) -> dict[str, Any]:
+    return {
+        "id": f"M{i:06d}",
+        "blobId": f"B{i:06d}",
+        "threadId": f"T{i // 4:06d}",
+        "mailboxIds": {"MBX1": True},
+        "keywords": {"$seen": True},
+        "size": 2048 + i,
+        "receivedAt": RECEIVED_AT,
+        "messageId": [f"<{i}@onett.example.net>"],
+        "headers": [
+            {"name": "X-Onett", "value": "Ness"},
+            {"name": "X-Twoson", "value": "Paula"},
+        ],
+        "from": [{"name": "Paula", "email": "paula@twoson.example.net"}],
+        "to": [{"name": "Ness", "email": "ness@onett.example.net"}],
+        "subject": f"I have the Franklin Badge ({i})",
+        "sentAt": RECEIVED_AT,
+        "bodyStructure": body_part_data(body_depth),
+        "hasAttachment": False,
+        "preview": "It's a sunny day in Onett",
+    }
+
+
+def email_get_response(count: int) -> dict[str, Any]:
+    return {
+        "methodResponses": [
+            [
+                "Email/get",
+                {
+                    "accountId": "u1138",
+                    "list": [email_data(i) for i in range(count)],
+                    "notFound": [],
+                    "state": "2187",
+                },
+                "0.Email/get",
+            ]
+        ],
+        "sessionState": "test;session;state",
+    }
+
+
+def emails(count: int) -> list[Email]:
+    return [Email.from_dict(email_data(i)) for i in range(count)]
+
+
+def ref_call_chain(count: int) -> list[Method]:
+    # Each Email/get uses the IDs from the preceding Email/query
+    calls: list[Method] = []
+    for i in range(count // 2):
+        calls.append(
+            EmailQuery(
+                filter=EmailQueryFilterCondition(in_mailbox=f"MBX{i}"),
+                limit=10,
+            )
+        )
+        calls.append(EmailGet(ids=Ref("/ids"), properties=["id", "subject"]))
+    return calls
+
+
+def filter_tree(
+    leaves: int, fanout: int = 4, depth: int = 0
+) -> EmailQueryFilter:
+    if leaves <= 1:
+        return EmailQueryFilterCondition(
+            in_mailbox=f"MBX{depth}", text="Franklin Badge", min_size=1024
+        )
+    size = -(-leaves // fanout)
+    return EmailQueryFilterOperator(
+        operator=Operator.AND if depth % 2 else Operator.OR,
+        conditions=[
+            filter_tree(min(size, leaves - n), fanout, depth + 1)
+            for n in range(0, leaves, size)
+        ],
+    )
+
+
+def state_events(count: int) -> list[sseclient.Event]:
+    return [
+        sseclient.Event(
+            data=json.dumps(
+                {
+                    "@type": "StateChange",
+                    "changed": {
+                        "u1138": {
+                            "Email": f"{i}",
+                            "Mailbox": f"{i // 10}",
+                            "Thread": f"{i // 2}",
+                        }
+                    },
+                }
+            ),
+            event="state",
+            id=str(i),
+        )
+        for i in range(count)
+    ]
@@ -0,0 +1,281 @@
+from __future__ import annotations
+
+import functools
+import gc
+import io
+import json
+import math
+import time
+import tracemalloc
+from collections.abc import Sequence
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Callable
+
+from jmapc import Email, Event, SlottedEmail
+from jmapc.api import APIRequest, decode_api_response
+from jmapc.codec import DEFAULT_JSON_CODEC
+from jmapc.methods import EmailQuery, EmailSet
+from jmapc.streaming import STREAM_CHUNK_SIZE, StreamingResponseParser
+
+from . import fixtures
+
+BASELINE_PATH = Path(__file__).parent / "baseline.json"
+DEFAULT_THRESHOLD = 0.2
+MIN_SAMPLE_TIME = 0.2
+
+
+@dataclass
+class Benchmark:
+    name: str
+    size: int
+    # Builds fixtures outside of the measured call
+    setup: Callable[[int], Callable[[], Any]]
+
+
+@dataclass
+class Result:
+    name: str
+    items: int
+    seconds: float
+    peak_memory: int
+    # Time taken by a fixed workload on the same machine, measured with the
+    # benchmark so that times from different machines can be compared
+    calibration: float = 0.0
+
+    @property
+    def throughput(self) -> float:
+        return self.items / self.seconds if self.seconds else 0.0
+
+    @property
+    def relative_time(self) -> float:
+        return self.seconds / self.calibration if self.calibration else 0.0
+
+
+@dataclass
+class Comparison:
+    result: Result
+    baseline: Result
+    threshold: float
+
+    @property
+    def time_ratio(self) -> float:
+        if self.result.calibration and self.baseline.calibration:
+            return self.result.relative_time / self.baseline.relative_time
+        return self.result.seconds / self.baseline.seconds
+
+    @property
+    def memory_ratio(self) -> float:
+        return self.result.peak_memory / (self.baseline.peak_memory or 1)
+
+    @property
+    def regressed(self) -> bool:
+        return (
+            self.time_ratio > 1 + self.threshold
+            or self.memory_ratio > 1 + self.threshold
+        )
+
+
+def _email_get_decode(size: int) -> Callable[[], Any]:
+    data = fixtures.email_get_response(size)
+    return lambda: decode_api_response(data)
+
+
+def _email_get_parse(size: int) -> Callable[[], Any]:
+    raw = DEFAULT_JSON_CODEC.dumps(fixtures.email_get_response(size))
+    return lambda: DEFAULT_JSON_CODEC.loads(raw)
+
+
+def _email_get_stream(size: int) -> Callable[[], Any]:
+    raw = io.BytesIO(
+        DEFAULT_JSON_CODEC.dumps(fixtures.email_get_response(size))
+    )
+    chunks = list(iter(functools.partial(raw.read, STREAM_CHUNK_SIZE), b""))
+
+    def _parse() -> int:
+        # Items are dropped as they are parsed, so peak memory shows what
+        # streaming needs rather than the size of the whole response
+        parser = StreamingResponseParser()
+        count = 0
+        for chunk in chunks:
+            count += len(parser.feed(chunk))
+        return count + len(parser.close())
+
+    return _parse
+
+
+def _email_set_serialize(size: int) -> Callable[[], Any]:
+    method = EmailSet(
+        create={f"draft{i}": e for i, e in enumerate(fixtures.emails(size))}
+    )
+    return lambda: method.to_dict(account_id="u1138")
+
+
+def _email_set_request_encode(size: int) -> Callable[[], Any]:
+    # The request body as sent, from the request built for the calls
+    api_request = APIRequest.from_calls(
+        "u1138",
+        EmailSet(
+            create={
+                f"draft{i}": e for i, e in enumerate(fixtures.emails(size))
+            }
+        ),
+    )
+    return lambda: DEFAULT_JSON_CODEC.dumps(api_request.to_dict())
+
+
+def _ref_chain_build(size: int) -> Callable[[], Any]:
+    calls = fixtures.ref_call_chain(size)
+    return lambda: APIRequest.from_calls("u1138", calls)
+
+
+def _ref_chain_encode(size: int) -> Callable[[], Any]:
+    api_request = APIRequest.from_calls("u1138", fixtures.ref_call_chain(size))
+    return lambda: DEFAULT_JSON_CODEC.dumps(api_request.to_dict())
+
+
+def _filter_tree_serialize(size: int) -> Callable[[], Any]:
+    method = EmailQuery(filter=fixtures.filter_tree(size))
+    return lambda: method.to_dict(account_id="u1138")
+
+
+def _event_stream_decode(size: int) -> Callable[[], Any]:
+    events = fixtures.state_events(size)
+    return lambda: [Event.load_from_sseclient_event(e) for e in events]
+
+
+def _email_decode(size: int) -> Callable[[], Any]:
+    data = [fixtures.email_data(i) for i in range(size)]
+    return lambda: [Email.from_dict(d) for d in data]
+
+
+def _slotted_email_decode(size: int) -> Callable[[], Any]:
+    data = [fixtures.email_data(i) for i in range(size)]
+    return lambda: [SlottedEmail.from_dict(d) for d in data]
+
+
+BENCHMARKS = [
+    Benchmark("email_get_decode", 10_000, _email_get_decode),
+    Benchmark("email_get_parse", 10_000, _email_get_parse),
+    Benchmark("email_get_stream", 10_000, _email_get_stream),
+    Benchmark("email_decode", 10_000, _email_decode),
+    Benchmark("slotted_email_decode", 10_000, _slotted_email_decode),
+    Benchmark("email_set_serialize", 1_000, _email_set_serialize),
+    Benchmark("email_set_request_encode", 1_000, _email_set_request_encode),
+    Benchmark("ref_chain_build", 1_000, _ref_chain_build),
+    Benchmark("ref_chain_encode", 1_000, _ref_chain_encode),
+    Benchmark("filter_tree_serialize", 4_096, _filter_tree_serialize),
+    Benchmark("event_stream_decode", 10_000, _event_stream_decode),
+]
+
+
+def _calibration_workload() -> Any:
+    data = [
+        {"id": f"M{i}", "keywords": {"$seen": True}, "size": i}
+        for i in range(20_000)
+    ]
+    return json.loads(json.dumps(data))
+
+
+def _loops(fn: Callable[[], Any]) -> int:
+    # Short functions are timed over enough calls to last MIN_SAMPLE_TIME
+    start = time.perf_counter()
+    fn()
+    return max(1, math.ceil(MIN_SAMPLE_TIME / (time.perf_counter() - start)))
+
+
+def _sample(fn: Callable[[], Any], loops: int) -> float:
+    # Garbage collection is paused as its cost depends on everything else
+    # allocated in the process, as with timeit
+    gc.collect()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        return (time.perf_counter() - start) / loops
+    finally:
+        gc.enable()
+
+
+def run_benchmark(
+    benchmark: Benchmark, scale: float = 1.0, repeat: int = 5
+) -> Result:
+    size = max(1, int(benchmark.size * scale))
+    fn = benchmark.setup(size)
+    loops = _loops(fn)
+    calibration_loops = _loops(_calibration_workload)
+    # Benchmark and calibration runs alternate, so both are measured under
+    # the same machine load. The fastest runs are the least affected by
+    # other load on the machine.
+    times = []
+    calibration_times = []
+    for _ in range(repeat):
+        times.append(_sample(fn, loops))
+        calibration_times.append(
+            _sample(_calibration_workload, calibration_loops)
+        )
+    # Memory is measured in a separate run as tracing slows execution
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return Result(
+        name=benchmark.name,
+        items=size,
+        seconds=min(times),
+        peak_memory=peak_memory,
+        calibration=min(calibration_times),
+    )
+
+
+def load_results(path: Path) -> dict[str, Result]:
+    return {
+        name: Result(name=name, **data)
+        for name, data in json.loads(path.read_text()).items()
+    }
+
+
+def save_results(path: Path, results: Sequence[Result]) -> None:
+    data = {
+        r.name: {k: v for k, v in asdict(r).items() if k != "name"}
+        for r in results
+    }
+    path.write_text(json.dumps(data, indent=4, sort_keys=True) + "\n")
+
+
+def compare_results(
+    results: Sequence[Result],
+    baseline: dict[str, Result],
+    threshold: float = DEFAULT_THRESHOLD,
+) -> list[Comparison]:
+    # Results are only comparable with baselines for the same size
+    return [
+        Comparison(result=r, baseline=baseline[r.name], threshold=threshold)
+        for r in results
+        if r.name in baseline and baseline[r.name].items == r.items
+    ]
+
+
+def format_report(
+    results: Sequence[Result], comparisons: Sequence[Comparison] = ()
+) -> str:
+    compared = {c.result.name: c for c in comparisons}
+    lines = [
+        f"{'benchmark':<24}{'items':>8}{'seconds':>10}{'items/s':>12}"
+        f"{'peak MiB':>10}{'time':>8}{'memory':>8}"
+    ]
+    for r in results:
+        line = (
+            f"{r.name:<24}{r.items:>8}{r.seconds:>10.4f}"
+            f"{r.throughput:>12.0f}{r.peak_memory / 2**20:>10.1f}"
+        )
+        c = compared.get(r.name)
+        if c:
+            line += f"{c.time_ratio:>8.2f}{c.memory_ratio:>8.2f}"
+            if c.regressed:
+                line += "  REGRESSED"
+        lines.append(line)
+    return "\n".join(lines)
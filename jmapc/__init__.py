@@ -1,8 +1,18 @@
 from . import auth, errors, fastmail, methods, models
 from .__version__ import __version__ as version
+from .async_client import AsyncClient
 from .client import Client, ClientError, EventSourceConfig
+from .codec import (
+    JSONCodec,
+    MsgspecJSONCodec,
+    OrjsonJSONCodec,
+    StdlibJSONCodec,
+)
 from .errors import Error
+from .hooks import RequestHooks, RequestInfo, ResponseInfo
+from .interning import StringInterner
 from .methods import Request, ResponseOrError
+from .metrics import MetricsExporter, PrometheusExporter, RequestMetrics
 from .models import (
     AddedItem,
     Address,
@@ -25,6 +35,11 @@ from .models import (
     EmailSubmissionQueryFilterOperator,
     Envelope,
     Event,
+    FrozenEmail,
+    FrozenEmailAddress,
+    FrozenEmailBodyPart,
+    FrozenEmailBodyValue,
+    FrozenEmailHeader,
     Identity,
     ListOrRef,
     Mailbox,
@@ -34,6 +49,11 @@ from .models import (
     Operator,
     SearchSnippet,
     SetError,
+    SlottedEmail,
+    SlottedEmailAddress,
+    SlottedEmailBodyPart,
+    SlottedEmailBodyValue,
+    SlottedEmailHeader,
     StateChange,
     StrOrRef,
     Thread,
@@ -41,10 +61,14 @@ from .models import (
     UndoStatus,
 )
 from .ref import Ref, ResultReference
+from .retry import RetryBudget, RetryPolicy
+from .session_cache import FileSessionCache, MemorySessionCache, SessionCache
+from .transport import RecordingTransport, ReplayError, ReplayTransport
 
 __all__ = [
     "AddedItem",
     "Address",
+    "AsyncClient",
     "Blob",
     "Client",
     "ClientError",
@@ -68,21 +92,50 @@ __all__ = [
     "Error",
     "Event",
     "EventSourceConfig",
+    "FileSessionCache",
+    "FrozenEmail",
+    "FrozenEmailAddress",
+    "FrozenEmailBodyPart",
+    "FrozenEmailBodyValue",
+    "FrozenEmailHeader",
     "Identity",
+    "JSONCodec",
     "ListOrRef",
     "Mailbox",
     "MailboxQueryFilter",
     "MailboxQueryFilterCondition",
     "MailboxQueryFilterOperator",
+    "MemorySessionCache",
+    "MetricsExporter",
+    "MsgspecJSONCodec",
     "Operator",
+    "OrjsonJSONCodec",
+    "PrometheusExporter",
+    "RecordingTransport",
     "Ref",
+    "ReplayError",
+    "ReplayTransport",
     "Request",
+    "RequestHooks",
+    "RequestInfo",
+    "RequestMetrics",
+    "ResponseInfo",
     "ResponseOrError",
     "ResultReference",
+    "RetryBudget",
+    "RetryPolicy",
     "SearchSnippet",
+    "SessionCache",
     "SetError",
+    "SlottedEmail",
+    "SlottedEmailAddress",
+    "SlottedEmailBodyPart",
+    "SlottedEmailBodyValue",
+    "SlottedEmailHeader",
     "StateChange",
+    "StdlibJSONCodec",
     "StrOrRef",
+    "StringInterner",
     "Thread",
     "TypeState",
     "UndoStatus",
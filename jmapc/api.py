@@ -9,6 +9,7 @@ from typing import (
 )
 from collections.abc import Sequence
 
+import dataclasses_json
 from dataclasses_json import config
 
 from . import constants, errors
@@ -26,12 +27,20 @@ from .serializer import Model
 
 def decode_method_responses(
     value: Sequence[tuple[str, dict[str, Any], str]],
+    lazy: bool = False,
 ) -> list[InvocationResponseOrError]:
     def _response_type(method_name: str) -> type[ResponseOrError]:
         if method_name == "error":
             return errors.Error
         return Response.response_types.get(method_name, CustomResponse)
 
+    if lazy:
+        return [
+            InvocationResponseOrError.lazy(
+                method_id, _response_type(name), response
+            )
+            for name, response, method_id in value
+        ]
     return [
         InvocationResponseOrError(
             id=method_id,
@@ -53,6 +62,18 @@ class APIResponse(Model):
     created_ids: list[str] = field(default_factory=list)
 
 
+def decode_api_response(
+    data: dict[str, Any], lazy: bool = False
+) -> APIResponse:
+    if not lazy:
+        return APIResponse.from_dict(data)
+    api_response = APIResponse.from_dict(dict(data, methodResponses=[]))
+    api_response.method_responses = decode_method_responses(
+        data["methodResponses"], lazy=True
+    )
+    return api_response
+
+
 @dataclass
 class APIRequest(Model):
     account_id: str = field(
@@ -66,6 +87,18 @@ class APIRequest(Model):
         metadata=config(encoder=lambda value: sorted(list(value))),
     )
 
+    def to_dict(
+        self, *args: Any, **kwargs: Any
+    ) -> dict[str, dataclasses_json.core.Json]:
+        if args or any(kwargs.values()):
+            return super().to_dict(*args, **kwargs)
+        # Method call arguments are already encoded when the calls are
+        # added, so they are not walked again
+        return {
+            "methodCalls": [list(c) for c in self.method_calls],
+            "using": sorted(self.using),
+        }
+
     @staticmethod
     def from_calls(
         account_id: str,
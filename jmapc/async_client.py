@@ -0,0 +1,711 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import time
+from collections.abc import AsyncGenerator, Iterable, Sequence
+from pathlib import Path
+from types import TracebackType
+from typing import (
+    IO,
+    Any,
+    Callable,
+    Literal,
+    Optional,
+    Union,
+    cast,
+    overload,
+)
+
+import sseclient
+
+from .api import APIRequest, decode_api_response
+from .auth import auth_headers
+from .client import (
+    DOWNLOAD_CHUNK_SIZE,
+    REQUEST_TIMEOUT,
+    ClientBase,
+    EventSourceConfig,
+    ProgressCallback,
+    RequestResult,
+    RequestsAuth,
+)
+from .codec import JSONCodec
+from .hooks import RequestHooks
+from .interning import StringInterner
+from .logging import log
+from .methods import (
+    InvocationResponse,
+    Method,
+    Request,
+    Response,
+    ResponseOrError,
+)
+from .metrics import RequestMetrics
+from .models import Blob, EmailBodyPart, Event
+from .planner import MethodResponse, RequestPlan
+from .retry import (
+    REJECTED_STATUSES,
+    RetryPolicy,
+    is_idempotent_request,
+    merge_retried_responses,
+    parse_retry_after,
+    retry_request,
+)
+from .session import Session
+from .session_cache import SessionCache
+from .streaming import STREAM_CHUNK_SIZE, StreamingResponseParser
+from .upload import (
+    UploadData,
+    UploadItem,
+    is_repeatable_upload,
+    upload_body,
+    upload_item,
+)
+
+try:
+    import aiohttp
+except ImportError:  # pragma: no cover
+    aiohttp = None  # type: ignore
+
+
+def async_upload_data(data: Any) -> Any:
+    # aiohttp streams async iterables, so plain chunk iterators are wrapped
+    if isinstance(data, (bytes, memoryview)) or hasattr(data, "read"):
+        return data
+
+    async def _chunks() -> AsyncGenerator[bytes, None]:
+        for chunk in data:
+            yield chunk
+
+    return _chunks()
+
+
+async def read_sse_events(
+    stream: aiohttp.StreamReader,
+) -> AsyncGenerator[sseclient.Event, None]:
+    fields: dict[str, str] = {}
+    async for raw_line in stream:
+        line = raw_line.decode("utf-8").rstrip("\r\n")
+        if not line:
+            if fields:
+                yield sseclient.Event(
+                    data=fields.get("data", ""),
+                    event=fields.get("event", "message"),
+                    id=fields.get("id"),
+                )
+            fields = {}
+            continue
+        name, _, value = line.partition(":")
+        if not name:
+            # Comment line
+            continue
+        if value.startswith(" "):
+            value = value[1:]
+        if name == "data" and "data" in fields:
+            value = f"{fields['data']}\n{value}"
+        fields[name] = value
+
+
+class AsyncClient(ClientBase):
+    def __init__(
+        self,
+        host: str,
+        auth: Optional[RequestsAuth] = None,
+        last_event_id: Optional[str] = None,
+        event_source_config: Optional[EventSourceConfig] = None,
+        session_cache: Optional[SessionCache] = None,
+        background_session_refresh: bool = False,
+        retry_policy: Optional[RetryPolicy] = None,
+        json_codec: Optional[JSONCodec] = None,
+        lazy_responses: bool = False,
+        hooks: Optional[RequestHooks] = None,
+        metrics: Optional[RequestMetrics] = None,
+        interner: Optional[StringInterner] = None,
+    ) -> None:
+        if aiohttp is None:  # pragma: no cover
+            raise ImportError(
+                "AsyncClient requires aiohttp, install jmapc[async]"
+            )
+        super().__init__(
+            host,
+            auth=auth,
+            last_event_id=last_event_id,
+            event_source_config=event_source_config,
+            session_cache=session_cache,
+            background_session_refresh=background_session_refresh,
+            retry_policy=retry_policy,
+            json_codec=json_codec,
+            lazy_responses=lazy_responses,
+            hooks=hooks,
+            metrics=metrics,
+            interner=interner,
+        )
+        self._aiohttp_session: Optional[aiohttp.ClientSession] = None
+        self._jmap_session: Optional[Session] = None
+        self._jmap_session_lock: Optional[asyncio.Lock] = None
+        self._session_refresh_task: Optional[asyncio.Task[None]] = None
+
+    async def __aenter__(self) -> AsyncClient:
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: Optional[type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        if self._session_refresh_task:
+            self._session_refresh_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._session_refresh_task
+            self._session_refresh_task = None
+        if self._aiohttp_session:
+            await self._aiohttp_session.close()
+            self._aiohttp_session = None
+
+    @property
+    def aiohttp_session(self) -> aiohttp.ClientSession:
+        if not self._aiohttp_session:
+            self._aiohttp_session = aiohttp.ClientSession(
+                headers=auth_headers(self._auth, self._session_url),
+                # Like the timeout of requests, the timeout applies to
+                # connecting and to each read, so large transfers are not
+                # limited as long as data keeps arriving
+                timeout=aiohttp.ClientTimeout(
+                    total=None,
+                    sock_connect=REQUEST_TIMEOUT,
+                    sock_read=REQUEST_TIMEOUT,
+                ),
+            )
+        return self._aiohttp_session
+
+    @property
+    def events(self) -> AsyncGenerator[Event, None]:
+        return self._events()
+
+    async def _events(self) -> AsyncGenerator[Event, None]:
+        headers = {"Accept": "text/event-stream"}
+        if self._last_event_id:
+            headers["Last-Event-ID"] = self._last_event_id
+        async with self.aiohttp_session.get(
+            self._event_source_url(await self.jmap_session()),
+            headers=headers,
+            timeout=aiohttp.ClientTimeout(total=None),
+        ) as r:
+            r.raise_for_status()
+            async for event in read_sse_events(r.content):
+                if event.id:
+                    self._last_event_id = event.id
+                if event.event != "state":
+                    continue
+                yield Event.load_from_sseclient_event(
+                    event, codec=self._json_codec
+                )
+
+    async def jmap_session(self) -> Session:
+        if not self._jmap_session:
+            self._jmap_session = self._load_cached_session()
+        if not self._jmap_session:
+            # The lock is created here to bind it to the running event loop
+            if not self._jmap_session_lock:
+                self._jmap_session_lock = asyncio.Lock()
+            # Concurrent callers wait for a single session fetch
+            async with self._jmap_session_lock:
+                if not self._jmap_session:
+                    self._jmap_session = await self._fetch_jmap_session()
+        return self._jmap_session
+
+    async def _fetch_jmap_session(self) -> Session:
+        async with self.aiohttp_session.get(self._session_url) as r:
+            r.raise_for_status()
+            data = self._json_codec.loads(await r.read())
+        return self._store_session(data)
+
+    async def _refetch_stale_session(
+        self, session: Session, url: Callable[[Session], str]
+    ) -> bool:
+        # Returns True if a failed request should be retried with a
+        # refetched session that has a different URL
+        if not self._drop_stale_session(session):
+            return False
+        self._jmap_session = None
+        return url(await self.jmap_session()) != url(session)
+
+    def _refresh_session_in_background(self) -> None:
+        if (
+            self._session_refresh_task
+            and not self._session_refresh_task.done()
+        ):
+            return
+        self._session_refresh_task = asyncio.create_task(
+            self._refresh_session()
+        )
+
+    async def _refresh_session(self) -> None:
+        try:
+            session = await self._fetch_jmap_session()
+        except Exception as e:
+            log.warning(f"Unable to refresh JMAP session: {e}")
+            self._jmap_session = None
+            self._invalidate_cached_session()
+            return
+        # Requests keep using the previous session until it is replaced here
+        self._jmap_session = session
+
+    async def account_id(self) -> str:
+        return self._primary_account_id(await self.jmap_session())
+
+    async def upload_blob(
+        self, file_name: UploadData, content_type: Optional[str] = None
+    ) -> Blob:
+        while True:
+            session = await self.jmap_session()
+            upload_url = self._upload_url(session, await self.account_id())
+            try:
+                with upload_body(file_name, content_type) as body:
+                    self._validate_upload_size(session, body)
+                    async with self.aiohttp_session.post(
+                        upload_url,
+                        data=async_upload_data(body.data),
+                        headers={"Content-Type": body.content_type},
+                    ) as r:
+                        r.raise_for_status()
+                        raw_response = await r.read()
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if (
+                    not self._is_rejected_request(e)
+                    and await self._refetch_stale_session(
+                        session, lambda s: s.upload_url
+                    )
+                    and is_repeatable_upload(file_name)
+                ):
+                    continue
+                raise
+            return Blob.from_dict(self._json_codec.loads(raw_response))
+
+    async def upload_blobs(
+        self, uploads: Iterable[UploadItem]
+    ) -> list[Union[Blob, Exception]]:
+        session = await self.jmap_session()
+        semaphore = asyncio.Semaphore(
+            session.capabilities.core.max_concurrent_upload
+        )
+
+        async def _bounded_upload(item: UploadItem) -> Blob:
+            async with semaphore:
+                return await self.upload_blob(*upload_item(item))
+
+        # Failed uploads are returned in place of their blobs
+        results = await asyncio.gather(
+            *[_bounded_upload(item) for item in uploads],
+            return_exceptions=True,
+        )
+        for r in results:
+            if isinstance(r, BaseException) and not isinstance(r, Exception):
+                raise r
+        return cast(list[Union[Blob, Exception]], results)
+
+    async def stream_attachment(
+        self,
+        attachment: EmailBodyPart,
+        chunk_size: int = DOWNLOAD_CHUNK_SIZE,
+        progress: Optional[ProgressCallback] = None,
+    ) -> AsyncGenerator[bytes, None]:
+        blob_url = self._download_url(
+            await self.jmap_session(), await self.account_id(), attachment
+        )
+        async with self.aiohttp_session.get(blob_url) as r:
+            r.raise_for_status()
+            received = 0
+            async for chunk in r.content.iter_chunked(chunk_size):
+                received += len(chunk)
+                if progress:
+                    progress(received, attachment.size)
+                yield chunk
+
+    async def download_attachment(
+        self,
+        attachment: EmailBodyPart,
+        file_name: Union[str, Path, IO[bytes]],
+        progress: Optional[ProgressCallback] = None,
+    ) -> None:
+        if not file_name:
+            raise Exception("Destination file name is required")
+        chunks = self.stream_attachment(attachment, progress=progress)
+        if not isinstance(file_name, (str, Path)):
+            async for chunk in chunks:
+                file_name.write(chunk)
+            return
+        with open(Path(file_name), "wb") as f:
+            async for chunk in chunks:
+                f.write(chunk)
+
+    @overload
+    async def request(
+        self,
+        calls: Method,
+        raise_errors: Literal[False] = False,
+        single_response: Literal[True] = True,
+        *,
+        split_oversized: bool = False,
+        raw: Literal[False] = False,
+    ) -> ResponseOrError: ...  # pragma: no cover
+
+    @overload
+    async def request(
+        self,
+        calls: Method,
+        raise_errors: Literal[False] = False,
+        single_response: Literal[False] = False,
+        *,
+        split_oversized: bool = False,
+        raw: Literal[False] = False,
+    ) -> Union[
+        Sequence[ResponseOrError], ResponseOrError
+    ]: ...  # pragma: no cover
+
+    @overload
+    async def request(
+        self,
+        calls: Method,
+        raise_errors: Literal[True],
+        single_response: Literal[True],
+        *,
+        split_oversized: bool = False,
+        raw: Literal[False] = False,
+    ) -> Response: ...  # pragma: no cover
+
+    @overload
+    async def request(
+        self,
+        calls: Method,
+        raise_errors: Literal[True],
+        single_response: Literal[False] = False,
+        *,
+        split_oversized: bool = False,
+        raw: Literal[False] = False,
+    ) -> Union[Sequence[Response], Response]: ...  # pragma: no cover
+
+    @overload
+    async def request(
+        self,
+        calls: Sequence[Request],
+        raise_errors: Literal[False] = False,
+        *,
+        split_oversized: bool = False,
+        raw: Literal[False] = False,
+    ) -> Sequence[InvocationResponse]: ...  # pragma: no cover
+
+    @overload
+    async def request(
+        self,
+        calls: Sequence[Request],
+        raise_errors: Literal[True],
+        *,
+        split_oversized: bool = False,
+        raw: Literal[False] = False,
+    ) -> Sequence[InvocationResponse]: ...  # pragma: no cover
+
+    @overload
+    async def request(
+        self,
+        calls: Method,
+        raise_errors: bool = False,
+        single_response: bool = False,
+        *,
+        split_oversized: bool = False,
+        raw: Literal[True],
+    ) -> Union[
+        Sequence[MethodResponse], MethodResponse
+    ]: ...  # pragma: no cover
+
+    @overload
+    async def request(
+        self,
+        calls: Sequence[Request],
+        raise_errors: bool = False,
+        *,
+        split_oversized: bool = False,
+        raw: Literal[True],
+    ) -> Sequence[MethodResponse]: ...  # pragma: no cover
+
+    async def request(
+        self,
+        calls: Union[Sequence[Request], Sequence[Method], Method],
+        raise_errors: bool = False,
+        single_response: bool = False,
+        *,
+        split_oversized: bool = False,
+        raw: bool = False,
+    ) -> RequestResult:
+        return await self._request(
+            calls,
+            raise_errors=raise_errors,
+            single_response=single_response,
+            split_oversized=split_oversized,
+            raw=raw,
+        )
+
+    async def _request(
+        self,
+        calls: Union[Sequence[Request], Sequence[Method], Method],
+        raise_errors: bool = False,
+        single_response: bool = False,
+        split_oversized: bool = False,
+        raw: bool = False,
+    ) -> RequestResult:
+        self._validate_calls(calls, single_response)
+        session = await self.jmap_session()
+        account_id = await self.account_id()
+        with self._measure("prepare"):
+            api_request = self._prepare_request(session, account_id, calls)
+            plan = self._plan_request(session, api_request, split_oversized)
+        if self._metrics:
+            self._metrics.observe_request(api_request)
+        # Execute request
+        data = await self._api_request(plan)
+        with self._measure("decode"), self._interning():
+            if raw:
+                return self._process_raw_result(
+                    calls,
+                    api_request,
+                    data["methodResponses"],
+                    raise_errors,
+                    single_response,
+                )
+            result = decode_api_response(
+                data, lazy=self._lazy_responses
+            ).method_responses
+            return self._process_result(
+                calls, api_request, result, raise_errors, single_response
+            )
+
+    async def request_many(
+        self,
+        calls_list: Sequence[Union[Sequence[Request], Method]],
+        raise_errors: bool = False,
+        *,
+        split_oversized: bool = False,
+        raw: bool = False,
+    ) -> list[Union[RequestResult, Exception]]:
+        session = await self.jmap_session()
+        semaphore = asyncio.Semaphore(
+            session.capabilities.core.max_concurrent_requests
+        )
+
+        async def _bounded_request(
+            calls: Union[Sequence[Request], Method],
+        ) -> RequestResult:
+            async with semaphore:
+                return await self._request(
+                    calls,
+                    raise_errors=raise_errors,
+                    split_oversized=split_oversized,
+                    raw=raw,
+                )
+
+        # Failed requests are returned in place of their results
+        results = await asyncio.gather(
+            *[_bounded_request(calls) for calls in calls_list],
+            return_exceptions=True,
+        )
+        for r in results:
+            if isinstance(r, BaseException) and not isinstance(r, Exception):
+                raise r
+        return cast(list[Union[RequestResult, Exception]], results)
+
+    async def request_stream(
+        self,
+        calls: Union[Sequence[Request], Sequence[Method], Method],
+        *,
+        split_oversized: bool = False,
+    ) -> AsyncGenerator[Any, None]:
+        session = await self.jmap_session()
+        api_request = self._prepare_request(
+            session, await self.account_id(), calls
+        )
+        plan = self._plan_request(session, api_request, split_oversized)
+        responses = []
+        for i, request in enumerate(plan.requests):
+            parser = StreamingResponseParser()
+            raw_request = plan.raw_requests.get(i)
+            if raw_request is None:
+                raw_request = self._encode_request(request)
+            info = self._before_request(session.api_url, request, raw_request)
+            start = time.perf_counter()
+            response_bytes = 0
+            try:
+                async with self.aiohttp_session.post(
+                    session.api_url,
+                    headers={"Content-Type": "application/json"},
+                    data=raw_request,
+                ) as r:
+                    r.raise_for_status()
+                    async for chunk in r.content.iter_chunked(
+                        STREAM_CHUNK_SIZE
+                    ):
+                        response_bytes += len(chunk)
+                        for item in self._decode_list_items(
+                            parser.feed(chunk)
+                        ):
+                            yield item
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                self._request_error(info, e, start)
+                raise
+            self._after_response(
+                info, r.status, start, response_bytes=response_bytes
+            )
+            for item in self._decode_list_items(parser.close()):
+                yield item
+            responses.append(parser.response)
+        data = plan.combine_responses(responses)
+        self._update_session_state(session, data["sessionState"])
+        self._process_raw_result(
+            calls,
+            api_request,
+            data["methodResponses"],
+            raise_errors=True,
+            single_response=False,
+        )
+
+    async def _api_request(self, plan: RequestPlan) -> dict[str, Any]:
+        session = await self.jmap_session()
+        data = plan.combine_responses(
+            [
+                await self._send_api_request(
+                    session, request, plan.raw_requests.get(i)
+                )
+                for i, request in enumerate(plan.requests)
+            ]
+        )
+        self._update_session_state(session, data["sessionState"])
+        return data
+
+    def _update_session_state(
+        self, session: Session, session_state: str
+    ) -> None:
+        # Responses to requests sent before the session was replaced or
+        # invalidated do not invalidate it again
+        if session is not self._jmap_session:
+            return
+        if self._session_state_changed(session, session_state):
+            if self._background_session_refresh:
+                self._refresh_session_in_background()
+            else:
+                self._jmap_session = None
+                self._invalidate_cached_session()
+
+    async def _send_api_request(
+        self,
+        session: Session,
+        request: APIRequest,
+        raw_request: Optional[bytes] = None,
+    ) -> dict[str, Any]:
+        data = await self._post_api_request(session, request, raw_request)
+        attempt = 1
+        while self._retry_policy:
+            calls = self._retry_policy.retryable_calls(request, data)
+            if not calls or not self._retry_policy.acquire(attempt):
+                break
+            log.debug(f"Retrying {len(calls)} failed JMAP method calls")
+            await self._retry_policy.async_sleep(attempt)
+            attempt += 1
+            data = merge_retried_responses(
+                data,
+                await self._post_api_request(
+                    session, retry_request(request, calls)
+                ),
+            )
+        return data
+
+    async def _post_api_request(
+        self,
+        session: Session,
+        request: APIRequest,
+        raw_request: Optional[bytes] = None,
+    ) -> dict[str, Any]:
+        if raw_request is None:
+            raw_request = self._encode_request(request)
+        attempt = 1
+        while True:
+            info = self._before_request(
+                session.api_url, request, raw_request, attempt
+            )
+            if self._retry_policy:
+                self._retry_policy.record_request()
+            start = time.perf_counter()
+            try:
+                with self._measure("network"):
+                    async with self.aiohttp_session.post(
+                        session.api_url,
+                        headers={"Content-Type": "application/json"},
+                        data=raw_request,
+                    ) as r:
+                        r.raise_for_status()
+                        raw_response = await r.read()
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                self._request_error(info, e, start)
+                if not self._is_rejected_request(
+                    e
+                ) and await self._refetch_stale_session(
+                    session, lambda s: s.api_url
+                ):
+                    session = await self.jmap_session()
+                    continue
+                if not (
+                    self._retry_policy
+                    and self._is_retryable_error(
+                        self._retry_policy, e, request
+                    )
+                    and self._retry_policy.acquire(attempt)
+                ):
+                    raise
+                log.debug(f"Retrying JMAP request after error: {e}")
+                await self._retry_policy.async_sleep(
+                    attempt,
+                    retry_after=(
+                        parse_retry_after(e.headers.get("Retry-After"))
+                        if isinstance(e, aiohttp.ClientResponseError)
+                        and e.headers
+                        else None
+                    ),
+                )
+                attempt += 1
+                continue
+            self._after_response(info, r.status, start, raw_response)
+            if self._metrics:
+                self._metrics.observe_sizes(
+                    len(raw_request), len(raw_response)
+                )
+            with self._measure("parse"):
+                return cast(
+                    dict[str, Any], self._json_codec.loads(raw_response)
+                )
+
+    @staticmethod
+    def _is_rejected_request(
+        e: Union[aiohttp.ClientError, asyncio.TimeoutError],
+    ) -> bool:
+        return (
+            isinstance(e, aiohttp.ClientResponseError)
+            and e.status in REJECTED_STATUSES
+        )
+
+    @staticmethod
+    def _is_retryable_error(
+        retry_policy: RetryPolicy,
+        e: Union[aiohttp.ClientError, asyncio.TimeoutError],
+        request: APIRequest,
+    ) -> bool:
+        if isinstance(e, aiohttp.ClientResponseError):
+            return retry_policy.should_retry_status(e.status, request)
+        if isinstance(e, aiohttp.ClientConnectorError):
+            # The request was never sent
+            return True
+        return isinstance(
+            e, (aiohttp.ClientConnectionError, asyncio.TimeoutError)
+        ) and is_idempotent_request(request)
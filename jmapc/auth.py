@@ -1,5 +1,10 @@
+import json
+from typing import Optional, Union
+
 import requests
 
+RequestsAuth = Union[requests.auth.AuthBase, tuple[str, str]]
+
 
 class BearerAuth(requests.auth.AuthBase):
     def __init__(self, api_token: str):
@@ -10,3 +15,35 @@ class BearerAuth(requests.auth.AuthBase):
     ) -> requests.models.PreparedRequest:
         request.headers["Authorization"] = f"Bearer {self.api_token}"
         return request
+
+
+def auth_headers(auth: Optional[RequestsAuth], url: str) -> dict[str, str]:
+    if not auth:
+        return {}
+    # Apply the requests authentication handler to a throwaway request to
+    # obtain its Authorization header, so both clients accept the same auth
+    prepared = requests.PreparedRequest()
+    prepared.prepare(method="GET", url=url, auth=auth)
+    if "Authorization" not in prepared.headers:
+        return {}
+    return {"Authorization": prepared.headers["Authorization"]}
+
+
+def auth_identity(auth: Optional[RequestsAuth], url: str) -> Optional[str]:
+    # Headers and URL changes made by the authentication handler identify the
+    # user, whether credentials are sent as the Authorization header, another
+    # header, a cookie or a query parameter
+    if not auth:
+        return None
+    unauthenticated = requests.PreparedRequest()
+    unauthenticated.prepare(method="GET", url=url)
+    prepared = requests.PreparedRequest()
+    prepared.prepare(method="GET", url=url, auth=auth)
+    identity = sorted(
+        [k.lower(), v]
+        for k, v in prepared.headers.items()
+        if unauthenticated.headers.get(k) != v
+    )
+    if prepared.url != unauthenticated.url:
+        identity.append(["url", str(prepared.url)])
+    return json.dumps(identity) if identity else None
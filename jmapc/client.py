@@ -1,18 +1,43 @@
 from __future__ import annotations
 
+import contextlib
 import functools
-import mimetypes
-from collections.abc import Generator, Sequence
+import logging
+import threading
+import time
+from collections.abc import Generator, Iterable, Sequence
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import asdict, dataclass
 from pathlib import Path
-from typing import Any, Literal, Optional, TypeVar, Union, cast, overload
+from typing import (
+    IO,
+    Any,
+    Callable,
+    ContextManager,
+    Literal,
+    Optional,
+    TypeVar,
+    Union,
+    cast,
+    overload,
+)
 
 import requests
 import sseclient
+from requests.adapters import DEFAULT_POOLSIZE, BaseAdapter, HTTPAdapter
+from urllib3.exceptions import MaxRetryError, NewConnectionError
 
 from . import errors
-from .api import APIRequest, APIResponse
-from .auth import BearerAuth
+from .api import APIRequest, decode_api_response, decode_method_responses
+from .auth import BearerAuth, RequestsAuth
+from .codec import DEFAULT_JSON_CODEC, JSONCodec
+from .download import (
+    SegmentedDownload,
+    is_empty_content_range,
+    parse_content_range,
+)
+from .hooks import RequestHooks, RequestInfo, ResponseInfo
+from .interning import StringInterner, interning
 from .logging import log
 from .methods import (
     InvocationResponse,
@@ -22,13 +47,47 @@ from .methods import (
     Response,
     ResponseOrError,
 )
+from .metrics import RequestMetrics
 from .models import Blob, EmailBodyPart, Event
-from .session import Session
+from .planner import MethodResponse, RequestPlan
+from .retry import (
+    REJECTED_STATUSES,
+    RetryPolicy,
+    is_idempotent_request,
+    merge_retried_responses,
+    parse_retry_after,
+    retry_request,
+)
+from .session import Session, session_url
+from .session_cache import SessionCache, session_cache_key
+from .streaming import (
+    STREAM_CHUNK_SIZE,
+    StreamingResponseParser,
+    list_item_decoder,
+)
+from .upload import (
+    UploadBody,
+    UploadData,
+    UploadItem,
+    is_repeatable_upload,
+    upload_body,
+    upload_item,
+)
 
-RequestsAuth = Union[requests.auth.AuthBase, tuple[str, str]]
-ClientType = TypeVar("ClientType", bound="Client")
+RequestResult = Union[
+    Sequence[InvocationResponseOrError],
+    Sequence[InvocationResponse],
+    Union[Sequence[ResponseOrError], ResponseOrError],
+    Union[Sequence[Response], Response],
+    Union[Sequence[MethodResponse], MethodResponse],
+]
+ClientType = TypeVar("ClientType", bound="ClientBase")
+ProgressCallback = Callable[[int, Optional[int]], None]
 
 REQUEST_TIMEOUT = 30
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+DOWNLOAD_SEGMENT_SIZE = 16 * 1024 * 1024
+DOWNLOAD_MAX_WORKERS = 4
 
 
 @dataclass
@@ -49,7 +108,7 @@ class ClientError(RuntimeError):
         self.result = result
 
 
-class Client:
+class ClientBase:
     @classmethod
     def create_with_api_token(
         cls: type[ClientType],
@@ -81,6 +140,14 @@ class Client:
         auth: Optional[RequestsAuth] = None,
         last_event_id: Optional[str] = None,
         event_source_config: Optional[EventSourceConfig] = None,
+        session_cache: Optional[SessionCache] = None,
+        background_session_refresh: bool = False,
+        retry_policy: Optional[RetryPolicy] = None,
+        json_codec: Optional[JSONCodec] = None,
+        lazy_responses: bool = False,
+        hooks: Optional[RequestHooks] = None,
+        metrics: Optional[RequestMetrics] = None,
+        interner: Optional[StringInterner] = None,
     ) -> None:
         self._host: str = host
         self._auth: Optional[RequestsAuth] = auth
@@ -88,86 +155,603 @@ class Client:
         self._event_source_config: EventSourceConfig = (
             event_source_config or EventSourceConfig()
         )
+        self._session_cache: Optional[SessionCache] = session_cache
+        self._background_session_refresh: bool = background_session_refresh
+        self._retry_policy: Optional[RetryPolicy] = retry_policy
+        self._json_codec: JSONCodec = json_codec or DEFAULT_JSON_CODEC
+        self._lazy_responses: bool = lazy_responses
+        self._hooks: Optional[RequestHooks] = hooks
+        self._metrics: Optional[RequestMetrics] = metrics
+        # Interns strings decoded from this client's responses, if set
+        self._interner: Optional[StringInterner] = interner
+        # Session in use that was loaded from the session cache, if any
+        self._cached_session: Optional[Session] = None
+
+    @property
+    def _session_url(self) -> str:
+        return session_url(self._host)
+
+    @functools.cached_property
+    def _session_cache_key(self) -> Optional[str]:
+        if not self._session_cache:
+            return None
+        return session_cache_key(
+            self._host, self._auth, self._session_cache.secret()
+        )
+
+    def _load_cached_session(self) -> Optional[Session]:
+        if not self._session_cache or not self._session_cache_key:
+            return None
+        data = self._session_cache.get(self._session_cache_key)
+        if not data:
+            return None
+        try:
+            session = Session.from_dict(data)
+        except (KeyError, TypeError, ValueError):
+            self._session_cache.delete(self._session_cache_key)
+            return None
+        log.debug(f"Loaded cached JMAP session with state {session.state}")
+        self._cached_session = session
+        return session
+
+    def _store_session(self, data: dict[str, Any]) -> Session:
+        session = Session.from_dict(data)
+        log.debug(f"Retrieved JMAP session with state {session.state}")
+        if self._session_cache and self._session_cache_key:
+            self._session_cache.set(self._session_cache_key, data)
+        return session
+
+    def _invalidate_cached_session(self) -> None:
+        if self._session_cache and self._session_cache_key:
+            self._session_cache.delete(self._session_cache_key)
+
+    def _drop_stale_session(self, session: Session) -> bool:
+        # A cached session may refer to URLs that are no longer valid, so it
+        # is removed from the cache after a failed request, once
+        if session is not self._cached_session:
+            return False
+        log.debug("Request with cached JMAP session failed, refetching it")
+        self._cached_session = None
+        self._invalidate_cached_session()
+        return True
+
+    def _event_source_url(self, session: Session) -> str:
+        return session.event_source_url.format(
+            **asdict(self._event_source_config)
+        )
+
+    @staticmethod
+    def _primary_account_id(session: Session) -> str:
+        primary_account_id = (
+            session.primary_accounts.core
+            or session.primary_accounts.mail
+            or session.primary_accounts.submission
+        )
+        if not primary_account_id:
+            raise Exception("No primary account ID found")
+        return primary_account_id
+
+    @staticmethod
+    def _upload_url(session: Session, account_id: str) -> str:
+        return session.upload_url.format(accountId=account_id)
+
+    @staticmethod
+    def _download_url(
+        session: Session, account_id: str, attachment: EmailBodyPart
+    ) -> str:
+        return session.download_url.format(
+            accountId=account_id,
+            blobId=attachment.blob_id,
+            name=attachment.name,
+            type=attachment.type,
+        )
+
+    @staticmethod
+    def _validate_upload_size(session: Session, body: UploadBody) -> None:
+        max_size_upload = session.capabilities.core.max_size_upload
+        if body.size is not None and body.size > max_size_upload:
+            raise ValueError(
+                f"Upload of {body.size} bytes is larger than the server"
+                f" upload limit of {max_size_upload} bytes"
+            )
+
+    @staticmethod
+    def _validate_calls(
+        calls: Union[Sequence[Request], Sequence[Method], Method],
+        single_response: bool,
+    ) -> None:
+        if isinstance(calls, list) and single_response:
+            raise ValueError(
+                "single_response cannot be used with "
+                "multiple JMAP request methods"
+            )
+
+    @staticmethod
+    def _prepare_request(
+        session: Session,
+        account_id: str,
+        calls: Union[Sequence[Request], Sequence[Method], Method],
+    ) -> APIRequest:
+        api_request = APIRequest.from_calls(account_id, calls)
+        # Validate all requested JMAP URNs are supported by the server
+        unsupported_urns = api_request.using - session.capabilities.urns
+        if unsupported_urns:
+            log.warning(
+                "URNs in request are not in server capabilities: "
+                f"{', '.join(sorted(unsupported_urns))}"
+            )
+        return api_request
+
+    def _plan_request(
+        self, session: Session, api_request: APIRequest, split_oversized: bool
+    ) -> RequestPlan:
+        core = session.capabilities.core
+        return RequestPlan.from_request(
+            api_request,
+            max_objects_in_get=(
+                core.max_objects_in_get if split_oversized else None
+            ),
+            max_objects_in_set=(
+                core.max_objects_in_set if split_oversized else None
+            ),
+            max_calls_in_request=core.max_calls_in_request,
+            max_size_request=core.max_size_request,
+            json_codec=self._json_codec,
+            encode_request=self._encode_request,
+        )
+
+    def _encode_request(self, request: APIRequest) -> bytes:
+        with self._measure("encode"):
+            return self._json_codec.dumps(request.to_dict())
+
+    @staticmethod
+    def _process_result(
+        calls: Union[Sequence[Request], Sequence[Method], Method],
+        api_request: APIRequest,
+        result: Union[
+            Sequence[InvocationResponseOrError], Sequence[InvocationResponse]
+        ],
+        raise_errors: bool,
+        single_response: bool,
+    ) -> RequestResult:
+        if raise_errors:
+            # Response types are checked without decoding lazy responses
+            if any(issubclass(r.response_type, errors.Error) for r in result):
+                raise ClientError(
+                    "Errors found in method responses", result=result
+                )
+            result = [
+                (
+                    r.to_invocation_response()
+                    if isinstance(r, InvocationResponseOrError)
+                    else r
+                )
+                for r in result
+            ]
+        if isinstance(calls, Method):
+            if len(result) > 1:
+                if single_response:
+                    raise ClientError(
+                        f"{len(result)} method responses received for single"
+                        f" method call {api_request.method_calls[0][0]}",
+                        result=result,
+                    )
+                return [r.response for r in result]
+            return result[0].response
+        return result
+
+    def _measure(self, phase: str) -> ContextManager[None]:
+        if not self._metrics:
+            return contextlib.nullcontext()
+        return self._metrics.time(phase)
+
+    def _interning(self) -> ContextManager[Any]:
+        if self._interner is None:
+            return contextlib.nullcontext()
+        return interning(self._interner)
+
+    def _before_request(
+        self, url: str, request: APIRequest, body: bytes, attempt: int = 1
+    ) -> Optional[RequestInfo]:
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug(f"Sending JMAP request {body.decode()}")
+        if not self._hooks:
+            return None
+        info = RequestInfo.create(url, request, body, attempt)
+        self._hooks.before_request(info)
+        return info
+
+    def _after_response(
+        self,
+        info: Optional[RequestInfo],
+        status: int,
+        start: float,
+        body: Optional[bytes] = None,
+        response_bytes: int = 0,
+    ) -> None:
+        if body is not None and log.isEnabledFor(logging.DEBUG):
+            log.debug(f"Received JMAP response {body.decode()}")
+        if self._hooks and info:
+            self._hooks.after_response(
+                ResponseInfo(
+                    request=info,
+                    status=status,
+                    response_bytes=(
+                        len(body) if body is not None else response_bytes
+                    ),
+                    duration=time.perf_counter() - start,
+                    response_body=body,
+                )
+            )
+
+    def _request_error(
+        self, info: Optional[RequestInfo], error: BaseException, start: float
+    ) -> None:
+        if self._hooks and info:
+            self._hooks.on_error(info, error, time.perf_counter() - start)
+
+    def _decode_list_items(
+        self, items: list[tuple[str, Any]]
+    ) -> Generator[Any, None, None]:
+        for method_name, item in items:
+            # The interner is not kept set while the generator is suspended
+            with self._interning():
+                decoded = list_item_decoder(method_name)(item)
+            yield decoded
+
+    @staticmethod
+    def _process_raw_result(
+        calls: Union[Sequence[Request], Sequence[Method], Method],
+        api_request: APIRequest,
+        result: list[MethodResponse],
+        raise_errors: bool,
+        single_response: bool,
+    ) -> RequestResult:
+        # Responses decoded from JSON are lists, while those merged from
+        # split requests are already tuples
+        result = [(name, args, call_id) for name, args, call_id in result]
+        # Errors are decoded lazily only to be attached to ClientError
+        if raise_errors and any(name == "error" for name, _, _ in result):
+            raise ClientError(
+                "Errors found in method responses",
+                result=decode_method_responses(result, lazy=True),
+            )
+        if isinstance(calls, Method):
+            if len(result) > 1:
+                if single_response:
+                    raise ClientError(
+                        f"{len(result)} method responses received for single"
+                        f" method call {api_request.method_calls[0][0]}",
+                        result=decode_method_responses(result, lazy=True),
+                    )
+                return result
+            return result[0]
+        return result
+
+    @staticmethod
+    def _session_state_changed(session: Session, session_state: str) -> bool:
+        if session_state == session.state:
+            return False
+        log.debug(
+            "JMAP response session state"
+            f' "{session_state}" differs from cached state'
+            f'"{session.state}", invalidating cached state'
+        )
+        return True
+
+
+class Client(ClientBase):
+    def __init__(
+        self,
+        host: str,
+        auth: Optional[RequestsAuth] = None,
+        last_event_id: Optional[str] = None,
+        event_source_config: Optional[EventSourceConfig] = None,
+        session_cache: Optional[SessionCache] = None,
+        background_session_refresh: bool = False,
+        retry_policy: Optional[RetryPolicy] = None,
+        json_codec: Optional[JSONCodec] = None,
+        lazy_responses: bool = False,
+        hooks: Optional[RequestHooks] = None,
+        metrics: Optional[RequestMetrics] = None,
+        interner: Optional[StringInterner] = None,
+        transport: Optional[BaseAdapter] = None,
+    ) -> None:
+        super().__init__(
+            host,
+            auth=auth,
+            last_event_id=last_event_id,
+            event_source_config=event_source_config,
+            session_cache=session_cache,
+            background_session_refresh=background_session_refresh,
+            retry_policy=retry_policy,
+            json_codec=json_codec,
+            lazy_responses=lazy_responses,
+            hooks=hooks,
+            metrics=metrics,
+            interner=interner,
+        )
+        # Handles all HTTP requests in place of the default requests adapter
+        self._transport: Optional[BaseAdapter] = transport
         self._events: Optional[sseclient.SSEClient] = None
+        self._session_refresh_lock = threading.Lock()
+        self._session_refresh_thread: Optional[threading.Thread] = None
+        # Connections kept for reuse by the requests session
+        self._pool_size: int = DEFAULT_POOLSIZE
+        self._pool_lock = threading.Lock()
 
     @property
     def events(self) -> Generator[Event, None, None]:
         if not self._events:
             self._events = sseclient.SSEClient(
-                self.jmap_session.event_source_url.format(
-                    **asdict(self._event_source_config)
-                ),
+                self._event_source_url(self.jmap_session),
                 auth=self.requests_session.auth,
                 last_id=self._last_event_id,
+                session=self.requests_session,
             )
         for event in self._events:
             if event.event != "state":
                 continue
-            yield Event.load_from_sseclient_event(event)
+            yield Event.load_from_sseclient_event(
+                event, codec=self._json_codec
+            )
 
     @functools.cached_property
     def requests_session(self) -> requests.Session:
         requests_session = requests.Session()
         requests_session.auth = self._auth
+        if self._transport:
+            requests_session.mount("https://", self._transport)
+            requests_session.mount("http://", self._transport)
         return requests_session
 
+    def _size_connection_pool(self, connections: int) -> None:
+        # requests discards connections beyond the pool size of its adapter,
+        # so the pool is enlarged to keep a connection for each concurrent
+        # request
+        if self._transport or connections <= self._pool_size:
+            return
+        with self._pool_lock:
+            if connections <= self._pool_size:
+                return
+            adapter = HTTPAdapter(pool_maxsize=connections)
+            self.requests_session.mount("https://", adapter)
+            self.requests_session.mount("http://", adapter)
+            self._pool_size = connections
+
     @functools.cached_property
     def jmap_session(self) -> Session:
+        return self._load_cached_session() or self._fetch_jmap_session()
+
+    def _fetch_jmap_session(self) -> Session:
         r = self.requests_session.get(
-            f"https://{self._host}/.well-known/jmap", timeout=REQUEST_TIMEOUT
+            self._session_url, timeout=REQUEST_TIMEOUT
         )
         r.raise_for_status()
-        session = Session.from_dict(r.json())
-        log.debug(f"Retrieved JMAP session with state {session.state}")
-        return session
+        return self._store_session(self._json_codec.loads(r.content))
+
+    def _refetch_stale_session(self, url: Callable[[Session], str]) -> bool:
+        # Returns True if a failed request should be retried with a
+        # refetched session that has a different URL
+        session = self.jmap_session
+        if not self._drop_stale_session(session):
+            return False
+        self.__dict__.pop("jmap_session", None)
+        return url(self.jmap_session) != url(session)
+
+    def _refresh_session_in_background(self) -> None:
+        with self._session_refresh_lock:
+            if (
+                self._session_refresh_thread
+                and self._session_refresh_thread.is_alive()
+            ):
+                return
+            self._session_refresh_thread = threading.Thread(
+                target=self._refresh_session,
+                name="jmapc-session-refresh",
+                daemon=True,
+            )
+            self._session_refresh_thread.start()
+
+    def _refresh_session(self) -> None:
+        try:
+            session = self._fetch_jmap_session()
+        except Exception as e:
+            log.warning(f"Unable to refresh JMAP session: {e}")
+            self.__dict__.pop("jmap_session", None)
+            self._invalidate_cached_session()
+            return
+        # Requests keep using the previous session until it is replaced here
+        self.__dict__["jmap_session"] = session
 
     @property
     def account_id(self) -> str:
-        primary_account_id = (
-            self.jmap_session.primary_accounts.core
-            or self.jmap_session.primary_accounts.mail
-            or self.jmap_session.primary_accounts.submission
+        return self._primary_account_id(self.jmap_session)
+
+    def upload_blob(
+        self, file_name: UploadData, content_type: Optional[str] = None
+    ) -> Blob:
+        while True:
+            upload_url = self._upload_url(self.jmap_session, self.account_id)
+            try:
+                with upload_body(file_name, content_type) as body:
+                    self._validate_upload_size(self.jmap_session, body)
+                    r = self.requests_session.post(
+                        upload_url,
+                        stream=True,
+                        data=body.data,
+                        headers={"Content-Type": body.content_type},
+                        timeout=REQUEST_TIMEOUT,
+                    )
+                r.raise_for_status()
+            except requests.RequestException as e:
+                if (
+                    not self._is_rejected_request(e)
+                    and self._refetch_stale_session(lambda s: s.upload_url)
+                    and is_repeatable_upload(file_name)
+                ):
+                    continue
+                raise
+            return Blob.from_dict(self._json_codec.loads(r.content))
+
+    def upload_blobs(
+        self, uploads: Iterable[UploadItem]
+    ) -> list[Union[Blob, Exception]]:
+        items = [upload_item(item) for item in uploads]
+        max_workers = min(
+            len(items) or 1,
+            self.jmap_session.capabilities.core.max_concurrent_upload,
         )
-        if not primary_account_id:
-            raise Exception("No primary account ID found")
-        return primary_account_id
+        self._size_connection_pool(max_workers)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(self.upload_blob, data, content_type)
+                for data, content_type in items
+            ]
+        # Failed uploads are returned in place of their blobs
+        return [
+            cast(Exception, f.exception()) if f.exception() else f.result()
+            for f in futures
+        ]
 
-    def upload_blob(self, file_name: Union[str, Path]) -> Blob:
-        mime_type, mime_encoding = mimetypes.guess_type(file_name)
-        upload_url = self.jmap_session.upload_url.format(
-            accountId=self.account_id
+    def stream_attachment(
+        self,
+        attachment: EmailBodyPart,
+        chunk_size: int = DOWNLOAD_CHUNK_SIZE,
+        progress: Optional[ProgressCallback] = None,
+    ) -> Generator[bytes, None, None]:
+        blob_url = self._download_url(
+            self.jmap_session, self.account_id, attachment
         )
-        with open(file_name, "rb") as f:
-            r = self.requests_session.post(
-                upload_url,
-                stream=True,
-                data=f,
-                headers={"Content-Type": mime_type},
-                timeout=REQUEST_TIMEOUT,
-            )
-        r.raise_for_status()
-        return Blob.from_dict(r.json())
+        with self.requests_session.get(
+            blob_url, stream=True, timeout=REQUEST_TIMEOUT
+        ) as r:
+            r.raise_for_status()
+            received = 0
+            for chunk in r.iter_content(chunk_size=chunk_size):
+                received += len(chunk)
+                if progress:
+                    progress(received, attachment.size)
+                yield chunk
 
     def download_attachment(
+        self,
+        attachment: EmailBodyPart,
+        file_name: Union[str, Path, IO[bytes]],
+        progress: Optional[ProgressCallback] = None,
+    ) -> None:
+        if not file_name:
+            raise Exception("Destination file name is required")
+        if not isinstance(file_name, (str, Path)):
+            file_name.writelines(
+                self.stream_attachment(attachment, progress=progress)
+            )
+            return
+        with open(Path(file_name), "wb") as f:
+            f.writelines(self.stream_attachment(attachment, progress=progress))
+
+    def download_blob(
         self,
         attachment: EmailBodyPart,
         file_name: Union[str, Path],
+        segment_size: int = DOWNLOAD_SEGMENT_SIZE,
+        max_workers: int = DOWNLOAD_MAX_WORKERS,
+        progress: Optional[ProgressCallback] = None,
     ) -> None:
         if not file_name:
             raise Exception("Destination file name is required")
         file_name = Path(file_name)
-        blob_url = self.jmap_session.download_url.format(
-            accountId=self.account_id,
-            blobId=attachment.blob_id,
-            name=attachment.name,
-            type=attachment.type,
+        blob_url = self._download_url(
+            self.jmap_session, self.account_id, attachment
+        )
+        r = self._get_blob_range(blob_url, 0, segment_size - 1)
+        if r.status_code == 416 and is_empty_content_range(
+            r.headers.get("Content-Range")
+        ):
+            # Empty blobs have no satisfiable byte range
+            r.close()
+            file_name.write_bytes(b"")
+            if progress:
+                progress(0, 0)
+            return
+        r.raise_for_status()
+        if r.status_code != 206:
+            # Server does not support range requests
+            with r, open(file_name, "wb") as f:
+                received = 0
+                for chunk in r.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                    f.write(chunk)
+                    received += len(chunk)
+                    if progress:
+                        progress(received, attachment.size)
+            return
+        _, _, size = parse_content_range(r.headers.get("Content-Range"))
+        download = SegmentedDownload(
+            path=file_name,
+            blob_id=str(attachment.blob_id),
+            size=size,
+            segment_size=segment_size,
         )
+        download.prepare()
+        received = download.completed_bytes()
+        progress_lock = threading.Lock()
+
+        def _progress(r: requests.Response) -> Generator[bytes, None, None]:
+            nonlocal received
+            for chunk in r.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                if progress:
+                    with progress_lock:
+                        received += len(chunk)
+                        progress(received, size)
+                yield chunk
+
+        def _download_segment(
+            index: int, r: Optional[requests.Response] = None
+        ) -> None:
+            start, end = download.segment_range(index)
+            if not r:
+                r = self._get_blob_range(blob_url, start, end)
+            with r:
+                if (
+                    r.status_code != 206
+                    or parse_content_range(r.headers.get("Content-Range"))[0]
+                    != start
+                ):
+                    raise Exception(
+                        f"Unexpected response for bytes {start}-{end} of"
+                        f" blob {attachment.blob_id}"
+                    )
+                download.write_segment(index, _progress(r))
+
+        pending = download.pending
+        if 0 not in pending:
+            # Resuming a download with the first segment already complete
+            r.close()
+        self._size_connection_pool(max_workers)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(_download_segment, i, r if i == 0 else None)
+                for i in pending
+            ]
+            for future in futures:
+                future.result()
+        download.finish()
+
+    def _get_blob_range(
+        self, blob_url: str, start: int, end: int
+    ) -> requests.Response:
         r = self.requests_session.get(
-            blob_url, stream=True, timeout=REQUEST_TIMEOUT
+            blob_url,
+            headers={
+                "Range": f"bytes={start}-{end}",
+                "Accept-Encoding": "identity",
+            },
+            stream=True,
+            timeout=REQUEST_TIMEOUT,
         )
-        r.raise_for_status()
-        with open(file_name, "wb") as f:
-            f.write(r.raw.data)
+        if r.status_code != 416:
+            r.raise_for_status()
+        return r
 
     @overload
     def request(
@@ -175,6 +759,9 @@ class Client:
         calls: Method,
         raise_errors: Literal[False] = False,
         single_response: Literal[True] = True,
+        *,
+        split_oversized: bool = False,
+        raw: Literal[False] = False,
     ) -> ResponseOrError: ...  # pragma: no cover
 
     @overload
@@ -183,6 +770,9 @@ class Client:
         calls: Method,
         raise_errors: Literal[False] = False,
         single_response: Literal[False] = False,
+        *,
+        split_oversized: bool = False,
+        raw: Literal[False] = False,
     ) -> Union[
         Sequence[ResponseOrError], ResponseOrError
     ]: ...  # pragma: no cover
@@ -193,6 +783,9 @@ class Client:
         calls: Method,
         raise_errors: Literal[True],
         single_response: Literal[True],
+        *,
+        split_oversized: bool = False,
+        raw: Literal[False] = False,
     ) -> Response: ...  # pragma: no cover
 
     @overload
@@ -201,6 +794,9 @@ class Client:
         calls: Method,
         raise_errors: Literal[True],
         single_response: Literal[False] = False,
+        *,
+        split_oversized: bool = False,
+        raw: Literal[False] = False,
     ) -> Union[Sequence[Response], Response]: ...  # pragma: no cover
 
     @overload
@@ -208,6 +804,9 @@ class Client:
         self,
         calls: Sequence[Request],
         raise_errors: Literal[False] = False,
+        *,
+        split_oversized: bool = False,
+        raw: Literal[False] = False,
     ) -> Sequence[InvocationResponse]: ...  # pragma: no cover
 
     @overload
@@ -215,80 +814,294 @@ class Client:
         self,
         calls: Sequence[Request],
         raise_errors: Literal[True],
+        *,
+        split_oversized: bool = False,
+        raw: Literal[False] = False,
     ) -> Sequence[InvocationResponse]: ...  # pragma: no cover
 
+    @overload
     def request(
         self,
-        calls: Union[Sequence[Request], Sequence[Method], Method],
+        calls: Method,
         raise_errors: bool = False,
         single_response: bool = False,
+        *,
+        split_oversized: bool = False,
+        raw: Literal[True],
     ) -> Union[
-        Sequence[InvocationResponseOrError],
-        Sequence[InvocationResponse],
-        Union[Sequence[ResponseOrError], ResponseOrError],
-        Union[Sequence[Response], Response],
-    ]:
-        if isinstance(calls, list) and single_response:
-            raise ValueError(
-                "single_response cannot be used with "
-                "multiple JMAP request methods"
-            )
-        api_request = APIRequest.from_calls(self.account_id, calls)
-        # Validate all requested JMAP URNs are supported by the server
-        unsupported_urns = (
-            api_request.using - self.jmap_session.capabilities.urns
+        Sequence[MethodResponse], MethodResponse
+    ]: ...  # pragma: no cover
+
+    @overload
+    def request(
+        self,
+        calls: Sequence[Request],
+        raise_errors: bool = False,
+        *,
+        split_oversized: bool = False,
+        raw: Literal[True],
+    ) -> Sequence[MethodResponse]: ...  # pragma: no cover
+
+    def request(
+        self,
+        calls: Union[Sequence[Request], Sequence[Method], Method],
+        raise_errors: bool = False,
+        single_response: bool = False,
+        *,
+        split_oversized: bool = False,
+        raw: bool = False,
+    ) -> RequestResult:
+        return self._request(
+            calls,
+            raise_errors=raise_errors,
+            single_response=single_response,
+            split_oversized=split_oversized,
+            raw=raw,
         )
-        if unsupported_urns:
-            log.warning(
-                "URNs in request are not in server capabilities: "
-                f"{', '.join(sorted(unsupported_urns))}"
+
+    def _request(
+        self,
+        calls: Union[Sequence[Request], Sequence[Method], Method],
+        raise_errors: bool = False,
+        single_response: bool = False,
+        split_oversized: bool = False,
+        raw: bool = False,
+    ) -> RequestResult:
+        self._validate_calls(calls, single_response)
+        session = self.jmap_session
+        with self._measure("prepare"):
+            api_request = self._prepare_request(
+                session, self.account_id, calls
             )
+            plan = self._plan_request(session, api_request, split_oversized)
+        if self._metrics:
+            self._metrics.observe_request(api_request)
         # Execute request
-        result: Union[
-            Sequence[InvocationResponseOrError], Sequence[InvocationResponse]
-        ] = self._api_request(api_request)
-        if raise_errors:
-            if any(isinstance(r.response, errors.Error) for r in result):
-                raise ClientError(
-                    "Errors found in method responses", result=result
+        data = self._api_request(plan)
+        with self._measure("decode"), self._interning():
+            if raw:
+                return self._process_raw_result(
+                    calls,
+                    api_request,
+                    data["methodResponses"],
+                    raise_errors,
+                    single_response,
                 )
-            result = [
-                InvocationResponse(
-                    id=r.id, response=cast(Response, r.response)
+            result = decode_api_response(
+                data, lazy=self._lazy_responses
+            ).method_responses
+            return self._process_result(
+                calls, api_request, result, raise_errors, single_response
+            )
+
+    def request_many(
+        self,
+        calls_list: Sequence[Union[Sequence[Request], Method]],
+        raise_errors: bool = False,
+        *,
+        split_oversized: bool = False,
+        raw: bool = False,
+    ) -> list[Union[RequestResult, Exception]]:
+        max_workers = min(
+            len(calls_list) or 1,
+            self.jmap_session.capabilities.core.max_concurrent_requests,
+        )
+        self._size_connection_pool(max_workers)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(
+                    self._request,
+                    calls,
+                    raise_errors=raise_errors,
+                    split_oversized=split_oversized,
+                    raw=raw,
                 )
-                for r in result
+                for calls in calls_list
             ]
-        if isinstance(calls, Method):
-            if len(result) > 1:
-                if single_response:
-                    raise ClientError(
-                        f"{len(result)} method responses received for single"
-                        f" method call {api_request.method_calls[0][0]}",
-                        result=result,
+        # Failed requests are returned in place of their results
+        return [
+            cast(Exception, f.exception()) if f.exception() else f.result()
+            for f in futures
+        ]
+
+    def request_stream(
+        self,
+        calls: Union[Sequence[Request], Sequence[Method], Method],
+        *,
+        split_oversized: bool = False,
+    ) -> Generator[Any, None, None]:
+        api_request = self._prepare_request(
+            self.jmap_session, self.account_id, calls
+        )
+        plan = self._plan_request(
+            self.jmap_session, api_request, split_oversized
+        )
+        responses = []
+        for i, request in enumerate(plan.requests):
+            parser = StreamingResponseParser()
+            raw_request = plan.raw_requests.get(i)
+            if raw_request is None:
+                raw_request = self._encode_request(request)
+            info = self._before_request(
+                self.jmap_session.api_url, request, raw_request
+            )
+            start = time.perf_counter()
+            response_bytes = 0
+            try:
+                with self.requests_session.post(
+                    self.jmap_session.api_url,
+                    headers={"Content-Type": "application/json"},
+                    data=raw_request,
+                    stream=True,
+                    timeout=REQUEST_TIMEOUT,
+                ) as r:
+                    r.raise_for_status()
+                    for chunk in r.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+                        response_bytes += len(chunk)
+                        yield from self._decode_list_items(parser.feed(chunk))
+            except requests.RequestException as e:
+                self._request_error(info, e, start)
+                raise
+            self._after_response(
+                info, r.status_code, start, response_bytes=response_bytes
+            )
+            yield from self._decode_list_items(parser.close())
+            responses.append(parser.response)
+        data = plan.combine_responses(responses)
+        self._update_session_state(data["sessionState"])
+        self._process_raw_result(
+            calls,
+            api_request,
+            data["methodResponses"],
+            raise_errors=True,
+            single_response=False,
+        )
+
+    def _api_request(self, plan: RequestPlan) -> dict[str, Any]:
+        data = plan.combine_responses(
+            [
+                self._send_api_request(request, plan.raw_requests.get(i))
+                for i, request in enumerate(plan.requests)
+            ]
+        )
+        self._update_session_state(data["sessionState"])
+        return data
+
+    def _update_session_state(self, session_state: str) -> None:
+        if self._session_state_changed(self.jmap_session, session_state):
+            if self._background_session_refresh:
+                self._refresh_session_in_background()
+            else:
+                # Another thread may have already invalidated the session
+                self.__dict__.pop("jmap_session", None)
+                self._invalidate_cached_session()
+
+    def _send_api_request(
+        self, request: APIRequest, raw_request: Optional[bytes] = None
+    ) -> dict[str, Any]:
+        data = self._post_api_request(request, raw_request)
+        attempt = 1
+        while self._retry_policy:
+            calls = self._retry_policy.retryable_calls(request, data)
+            if not calls or not self._retry_policy.acquire(attempt):
+                break
+            log.debug(f"Retrying {len(calls)} failed JMAP method calls")
+            self._retry_policy.sleep(attempt)
+            attempt += 1
+            data = merge_retried_responses(
+                data, self._post_api_request(retry_request(request, calls))
+            )
+        return data
+
+    def _post_api_request(
+        self, request: APIRequest, raw_request: Optional[bytes] = None
+    ) -> dict[str, Any]:
+        if raw_request is None:
+            raw_request = self._encode_request(request)
+        attempt = 1
+        while True:
+            info = self._before_request(
+                self.jmap_session.api_url, request, raw_request, attempt
+            )
+            if self._retry_policy:
+                self._retry_policy.record_request()
+            start = time.perf_counter()
+            try:
+                with self._measure("network"):
+                    r = self.requests_session.post(
+                        self.jmap_session.api_url,
+                        headers={"Content-Type": "application/json"},
+                        data=raw_request,
+                        timeout=REQUEST_TIMEOUT,
                     )
-                return [r.response for r in result]
-            return result[0].response
-        return result
+                    r.raise_for_status()
+            except requests.RequestException as e:
+                self._request_error(info, e, start)
+                if not self._is_rejected_request(
+                    e
+                ) and self._refetch_stale_session(lambda s: s.api_url):
+                    continue
+                if not (
+                    self._retry_policy
+                    and self._is_retryable_error(
+                        self._retry_policy, e, request
+                    )
+                    and self._retry_policy.acquire(attempt)
+                ):
+                    raise
+                log.debug(f"Retrying JMAP request after error: {e}")
+                self._retry_policy.sleep(
+                    attempt,
+                    retry_after=(
+                        parse_retry_after(
+                            e.response.headers.get("Retry-After")
+                        )
+                        if e.response is not None
+                        else None
+                    ),
+                )
+                attempt += 1
+                continue
+            self._after_response(info, r.status_code, start, r.content)
+            if self._metrics:
+                self._metrics.observe_sizes(len(raw_request), len(r.content))
+            with self._measure("parse"):
+                return cast(dict[str, Any], self._json_codec.loads(r.content))
 
-    def _api_request(
-        self, request: APIRequest
-    ) -> Sequence[InvocationResponseOrError]:
-        raw_request = request.to_json()
-        log.debug(f"Sending JMAP request {raw_request}")
-        r = self.requests_session.post(
-            self.jmap_session.api_url,
-            headers={"Content-Type": "application/json"},
-            data=raw_request,
-            timeout=REQUEST_TIMEOUT,
+    @staticmethod
+    def _is_rejected_request(e: requests.RequestException) -> bool:
+        return (
+            isinstance(e, requests.HTTPError)
+            and e.response is not None
+            and e.response.status_code in REJECTED_STATUSES
         )
-        r.raise_for_status()
-        log.debug(f"Received JMAP response {r.text}")
-        api_response = APIResponse.from_dict(r.json())
-        if api_response.session_state != self.jmap_session.state:
-            log.debug(
-                "JMAP response session state"
-                f' "{api_response.session_state}" differs from cached state'
-                f'"{self.jmap_session.state}", invalidating cached state'
+
+    @staticmethod
+    def _is_connect_error(e: requests.RequestException) -> bool:
+        # Connection failures other than timeouts are raised as
+        # ConnectionError, wrapping the urllib3 error for the failed attempt
+        if isinstance(e, requests.ConnectTimeout):
+            return True
+        reason = e.args[0] if e.args else None
+        if isinstance(reason, MaxRetryError):
+            reason = reason.reason
+        return isinstance(e, requests.ConnectionError) and isinstance(
+            reason, NewConnectionError
+        )
+
+    @staticmethod
+    def _is_retryable_error(
+        retry_policy: RetryPolicy,
+        e: requests.RequestException,
+        request: APIRequest,
+    ) -> bool:
+        if isinstance(e, requests.HTTPError) and e.response is not None:
+            return retry_policy.should_retry_status(
+                e.response.status_code, request
             )
-            del self.jmap_session
-        return api_response.method_responses
+        if Client._is_connect_error(e):
+            # The request was never sent
+            return True
+        return isinstance(
+            e, (requests.ConnectionError, requests.Timeout)
+        ) and is_idempotent_request(request)
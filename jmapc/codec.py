@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import json
+from typing import Any, Protocol, Union
+
+from dataclasses_json.core import _ExtendedEncoder
+
+# Optional codec dependencies are type checked whether or not they are
+# installed
+try:
+    import orjson  # type: ignore[import-not-found, unused-ignore]
+except ImportError:  # pragma: no cover
+    orjson = None  # type: ignore[assignment, unused-ignore]
+
+try:
+    import msgspec  # type: ignore[import-not-found, unused-ignore]
+except ImportError:  # pragma: no cover
+    msgspec = None  # type: ignore[assignment, unused-ignore]
+
+
+def _encode_default(obj: Any) -> Any:
+    # Values dataclasses_json leaves unencoded (enums, sets, etc.) are encoded
+    # the same way by every codec
+    return _ExtendedEncoder().default(obj)
+
+
+class JSONCodec(Protocol):
+    def dumps(self, obj: Any) -> bytes: ...
+
+    def loads(self, data: Union[str, bytes]) -> Any: ...
+
+
+class StdlibJSONCodec:
+    def dumps(self, obj: Any) -> bytes:
+        return json.dumps(
+            obj,
+            cls=_ExtendedEncoder,
+            ensure_ascii=False,
+            separators=(",", ":"),
+        ).encode("utf-8")
+
+    def loads(self, data: Union[str, bytes]) -> Any:
+        return json.loads(data)
+
+
+class OrjsonJSONCodec:
+    def __init__(self) -> None:
+        if orjson is None:  # pragma: no cover
+            raise ImportError(
+                "OrjsonJSONCodec requires orjson, install jmapc[orjson]"
+            )
+
+    def dumps(self, obj: Any) -> bytes:
+        data: bytes = orjson.dumps(
+            obj,
+            default=_encode_default,
+            option=orjson.OPT_PASSTHROUGH_DATETIME,
+        )
+        return data
+
+    def loads(self, data: Union[str, bytes]) -> Any:
+        return orjson.loads(data)
+
+
+class MsgspecJSONCodec:
+    def __init__(self) -> None:
+        if msgspec is None:  # pragma: no cover
+            raise ImportError(
+                "MsgspecJSONCodec requires msgspec, install jmapc[msgspec]"
+            )
+        self._encoder = msgspec.json.Encoder(enc_hook=_encode_default)
+        self._decoder = msgspec.json.Decoder()
+
+    def dumps(self, obj: Any) -> bytes:
+        data: bytes = self._encoder.encode(obj)
+        return data
+
+    def loads(self, data: Union[str, bytes]) -> Any:
+        return self._decoder.decode(data)
+
+
+DEFAULT_JSON_CODEC: JSONCodec = StdlibJSONCodec()
@@ -0,0 +1,267 @@
+from __future__ import annotations
+
+import collections.abc
+import functools
+import threading
+import warnings
+from dataclasses import MISSING, fields, is_dataclass
+from enum import Enum
+from typing import (
+    Any,
+    Callable,
+    Optional,
+    Union,
+    get_args,
+    get_origin,
+    get_type_hints,
+)
+
+from dataclasses_json import Undefined, cfg
+from dataclasses_json.core import (
+    _decode_dataclass,
+    _decode_generic,
+    _is_optional,
+    _is_supported_generic,
+    _support_extended_types,
+    _user_overrides_or_exts,
+)
+from dataclasses_json.utils import _is_new_type
+
+from .interning import INTERN_METADATA_KEY, category_interner
+
+ValueDecoder = Callable[[Any], Any]
+
+LIST_TYPES = (list, collections.abc.Sequence, collections.abc.MutableSequence)
+MAPPING_TYPES = (dict, collections.abc.Mapping, collections.abc.MutableMapping)
+SCALAR_TYPES = (str, int, float, bool)
+
+_decoders: dict[type, ValueDecoder] = {}
+_decoders_lock = threading.Lock()
+
+
+def model_decoder(cls: type) -> ValueDecoder:
+    decoder = _decoders.get(cls)
+    if decoder is None:
+        with _decoders_lock:
+            decoder = _decoders.get(cls)
+            if decoder is None:
+                decoder = _decoders[cls] = compile_decoder(cls)
+    return decoder
+
+
+def compile_decoder(cls: type) -> ValueDecoder:
+    if not is_compilable(cls):
+        return functools.partial(_decode_dataclass, cls, infer_missing=False)
+    # Field names, letter case and type conversions are resolved here once,
+    # rather than by dataclasses_json on every call
+    overrides = _user_overrides_or_exts(cls)
+    types = get_type_hints(cls)
+    specs: list[tuple[str, str, Optional[ValueDecoder], bool, bool]] = []
+    for f in fields(cls):
+        if not f.init:
+            continue
+        override = overrides[f.name]
+        key = override.letter_case(f.name) if override.letter_case else f.name
+        field_type = types[f.name]
+        while _is_new_type(field_type):
+            field_type = field_type.__supertype__
+        decode_value: Optional[ValueDecoder]
+        if override.decoder is not None:
+            decode_value = override_decoder(field_type, override.decoder)
+        elif f.metadata.get(INTERN_METADATA_KEY):
+            decode_value = interning_decoder(
+                field_type, f.metadata[INTERN_METADATA_KEY]
+            )
+        else:
+            decode_value = field_decoder(field_type)
+        required = f.default is MISSING and f.default_factory is MISSING
+        specs.append(
+            (f.name, key, decode_value, required, not _is_optional(field_type))
+        )
+
+    def decode(kvs: Any) -> Any:
+        if isinstance(kvs, cls):
+            return kvs
+        kwargs: dict[str, Any] = {}
+        for name, key, decode_value, required, warn_none in specs:
+            if key in kvs:
+                value = kvs[key]
+            elif name in kvs:
+                value = kvs[name]
+            elif required:
+                raise KeyError(name)
+            else:
+                continue
+            if value is None:
+                if warn_none:
+                    warnings.warn(
+                        f"'NoneType' object value of non-optional type {name}"
+                        f" detected when decoding {cls.__name__}.",
+                        RuntimeWarning,
+                        stacklevel=2,
+                    )
+                kwargs[name] = None
+            elif decode_value is None:
+                kwargs[name] = value
+            else:
+                kwargs[name] = decode_value(value)
+        return cls(**kwargs)
+
+    return decode
+
+
+def is_compilable(cls: type) -> bool:
+    if not is_dataclass(cls) or cfg.global_config.decoders:
+        return False
+    config = getattr(cls, "dataclass_json_config", None) or {}
+    # Undefined.INCLUDE (catch-all fields) and Undefined.RAISE need
+    # dataclasses_json to inspect the unknown keys
+    return config.get("undefined") in (None, Undefined.EXCLUDE)
+
+
+def override_decoder(field_type: Any, decoder: ValueDecoder) -> ValueDecoder:
+    if not isinstance(field_type, type):
+        return decoder
+
+    def decode(value: Any) -> Any:
+        return value if type(value) is field_type else decoder(value)
+
+    return decode
+
+
+def field_decoder(field_type: Any) -> Optional[ValueDecoder]:
+    # Field values are never None here, so Optional fields decode as their
+    # inner type
+    args = get_args(field_type)
+    if (
+        get_origin(field_type) is Union
+        and len(args) == 2
+        and _is_optional(field_type)
+    ):
+        return value_decoder(next(a for a in args if a is not type(None)))
+    return value_decoder(field_type)
+
+
+def interning_decoder(
+    field_type: Any, category: str
+) -> Optional[ValueDecoder]:
+    # Strings, string list items and mapping keys are replaced with shared
+    # instances from the current interner
+    args = get_args(field_type)
+    if (
+        get_origin(field_type) is Union
+        and len(args) == 2
+        and _is_optional(field_type)
+    ):
+        field_type = next(a for a in args if a is not type(None))
+    origin = get_origin(field_type)
+    args = get_args(field_type)
+    if field_type is str:
+        return intern_decoder(category)
+    if origin in LIST_TYPES and args == (str,):
+        return intern_list_decoder(category)
+    if origin in MAPPING_TYPES and len(args) == 2 and args[0] is str:
+        return intern_mapping_decoder(category, value_decoder(args[1]))
+    return field_decoder(field_type)
+
+
+def value_decoder(type_: Any) -> Optional[ValueDecoder]:
+    # Returns None when values can be used as-is
+    if type_ is Any:
+        return None
+    if isinstance(type_, type) and is_dataclass(type_):
+        return dataclass_decoder(type_)
+    if isinstance(type_, type) and issubclass(type_, Enum):
+        return type_
+    if type_ in SCALAR_TYPES:
+        return scalar_decoder(type_)
+    origin = get_origin(type_)
+    args = get_args(type_)
+    if origin is Union and len(args) == 2 and _is_optional(type_):
+        inner = value_decoder(next(a for a in args if a is not type(None)))
+        return optional_decoder(inner)
+    if origin in LIST_TYPES and len(args) == 1:
+        return list_decoder(value_decoder(args[0]))
+    if origin in MAPPING_TYPES and len(args) == 2 and args[0] in (str, Any):
+        return mapping_decoder(value_decoder(args[1]))
+    if _is_supported_generic(type_):
+        return functools.partial(_decode_generic, type_, infer_missing=False)
+    return functools.partial(_support_extended_types, type_)
+
+
+def dataclass_decoder(cls: type) -> ValueDecoder:
+    # Decoders are looked up on first use to allow recursive models
+    def decode(value: Any) -> Any:
+        if is_dataclass(value):
+            return value
+        return model_decoder(cls)(value)
+
+    return decode
+
+
+def scalar_decoder(type_: type) -> ValueDecoder:
+    def decode(value: Any) -> Any:
+        return value if isinstance(value, type_) else type_(value)
+
+    return decode
+
+
+def optional_decoder(
+    decoder: Optional[ValueDecoder],
+) -> Optional[ValueDecoder]:
+    if decoder is None:
+        return None
+
+    def decode(value: Any) -> Any:
+        return None if value is None else decoder(value)
+
+    return decode
+
+
+def list_decoder(decoder: Optional[ValueDecoder]) -> ValueDecoder:
+    if decoder is None:
+        return list
+
+    def decode(value: Any) -> Any:
+        return [decoder(v) for v in value]
+
+    return decode
+
+
+def mapping_decoder(decoder: Optional[ValueDecoder]) -> ValueDecoder:
+    if decoder is None:
+        return dict
+
+    def decode(value: Any) -> Any:
+        return {k: decoder(v) for k, v in value.items()}
+
+    return decode
+
+
+def intern_decoder(category: str) -> ValueDecoder:
+    def decode(value: Any) -> Any:
+        return category_interner(category)(
+            value if type(value) is str else str(value)
+        )
+
+    return decode
+
+
+def intern_list_decoder(category: str) -> ValueDecoder:
+    def decode(value: Any) -> Any:
+        intern = category_interner(category)
+        return [intern(v if type(v) is str else str(v)) for v in value]
+
+    return decode
+
+
+def intern_mapping_decoder(
+    category: str, decoder: Optional[ValueDecoder]
+) -> ValueDecoder:
+    def decode(value: Any) -> Any:
+        intern = category_interner(category)
+        if decoder is None:
+            return {intern(k): v for k, v in value.items()}
+        return {intern(k): decoder(v) for k, v in value.items()}
+
+    return decode
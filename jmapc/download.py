@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import json
+import re
+import threading
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+
+CONTENT_RANGE_PATTERN = re.compile(r"^bytes (\d+)-(\d+)/(\d+)$")
+# Sent with 416 responses to range requests for empty blobs
+EMPTY_CONTENT_RANGE = "bytes */0"
+
+
+def parse_content_range(value: Optional[str]) -> tuple[int, int, int]:
+    match = CONTENT_RANGE_PATTERN.match((value or "").strip())
+    if not match:
+        raise ValueError(f"Unexpected Content-Range: {value}")
+    start, end, total = (int(v) for v in match.groups())
+    return start, end, total
+
+
+def is_empty_content_range(value: Optional[str]) -> bool:
+    return (value or "").strip() == EMPTY_CONTENT_RANGE
+
+
+@dataclass
+class SegmentedDownload:
+    path: Path
+    blob_id: str
+    size: int
+    segment_size: int
+    completed: set[int] = field(default_factory=set)
+    _lock: threading.Lock = field(
+        default_factory=threading.Lock, init=False, repr=False
+    )
+
+    @property
+    def state_path(self) -> Path:
+        return self.path.with_name(f"{self.path.name}.jmapc-download")
+
+    @property
+    def segment_count(self) -> int:
+        return max(1, -(-self.size // self.segment_size))
+
+    @property
+    def pending(self) -> list[int]:
+        return [
+            i for i in range(self.segment_count) if i not in self.completed
+        ]
+
+    def segment_range(self, index: int) -> tuple[int, int]:
+        start = index * self.segment_size
+        return start, min(start + self.segment_size, self.size) - 1
+
+    def completed_bytes(self) -> int:
+        return sum(
+            end - start + 1
+            for start, end in map(self.segment_range, self.completed)
+        )
+
+    def prepare(self) -> None:
+        # Resume from a previous attempt for the same blob, otherwise
+        # preallocate the destination file
+        if self.path.exists() and self.state_path.exists():
+            state = json.loads(self.state_path.read_text())
+            if (
+                state.get("blobId") == self.blob_id
+                and state.get("size") == self.size
+                and state.get("segmentSize") == self.segment_size
+                and self.path.stat().st_size == self.size
+            ):
+                self.completed = set(state.get("completed", []))
+                return
+        with open(self.path, "wb") as f:
+            f.truncate(self.size)
+        self.completed = set()
+        self._save_state()
+
+    def write_segment(self, index: int, chunks: Iterable[bytes]) -> int:
+        start, end = self.segment_range(index)
+        written = 0
+        with open(self.path, "r+b") as f:
+            f.seek(start)
+            for chunk in chunks:
+                written += len(chunk)
+                if written > end - start + 1:
+                    raise ValueError(
+                        f"Segment {index} of blob {self.blob_id}"
+                        " exceeds the requested range"
+                    )
+                f.write(chunk)
+        if written != end - start + 1:
+            raise ValueError(
+                f"Segment {index} of blob {self.blob_id} is incomplete"
+            )
+        with self._lock:
+            self.completed.add(index)
+            self._save_state()
+        return written
+
+    def finish(self) -> None:
+        self.state_path.unlink(missing_ok=True)
+
+    def _save_state(self) -> None:
+        self.state_path.write_text(
+            json.dumps(
+                {
+                    "blobId": self.blob_id,
+                    "size": self.size,
+                    "segmentSize": self.segment_size,
+                    "completed": sorted(self.completed),
+                }
+            )
+        )
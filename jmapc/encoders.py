@@ -0,0 +1,283 @@
+from __future__ import annotations
+
+import threading
+from dataclasses import fields, is_dataclass
+from enum import Enum
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Optional,
+    Union,
+    get_args,
+    get_origin,
+    get_type_hints,
+)
+
+from dataclasses_json import Undefined, cfg
+from dataclasses_json.core import _asdict, _user_overrides_or_exts
+from dataclasses_json.utils import _is_new_type
+
+from .decoders import LIST_TYPES, MAPPING_TYPES, SCALAR_TYPES
+from .ref import REF_SENTINEL_KEY, Ref, ResultReference
+
+if TYPE_CHECKING:
+    from .serializer import ModelToDictPostprocessor  # pragma: no cover
+
+ValueEncoder = Callable[[Any, Optional["ModelToDictPostprocessor"]], Any]
+
+REF_TYPES = (Ref, ResultReference)
+# Returned by value encoders for values that do not match the field type,
+# which are then encoded by dataclasses_json instead
+FALLBACK = object()
+
+_encoders: dict[type, ValueEncoder] = {}
+_encoders_lock = threading.Lock()
+
+
+def model_encoder(cls: type) -> ValueEncoder:
+    encoder = _encoders.get(cls)
+    if encoder is None:
+        with _encoders_lock:
+            encoder = _encoders.get(cls)
+            if encoder is None:
+                encoder = _encoders[cls] = compile_encoder(cls)
+    return encoder
+
+
+def compile_encoder(cls: type) -> ValueEncoder:
+    if not is_compilable(cls):
+        return generic_encoder
+    # Result references and email header lists are rewritten while encoding
+    # each field, so the output needs no separate postprocessing pass except
+    # for fields whose types are not known ahead of time
+    overrides = _user_overrides_or_exts(cls)
+    types = get_type_hints(cls)
+    specs: list[
+        tuple[
+            str,
+            str,
+            Optional[ValueEncoder],
+            Optional[Callable[[Any], Any]],
+            Optional[Callable[[Any], bool]],
+            bool,
+            bool,
+        ]
+    ] = []
+    for f in fields(cls):
+        override = overrides[f.name]
+        key = override.letter_case(f.name) if override.letter_case else f.name
+        may_ref, encode_value = field_encoder(types[f.name])
+        specs.append(
+            (
+                f.name,
+                key,
+                encode_value,
+                override.encoder,
+                override.exclude,
+                may_ref,
+                encode_value is None or key == "headers",
+            )
+        )
+
+    def encode(obj: Any, todict: Optional[ModelToDictPostprocessor]) -> Any:
+        data: dict[str, Any] = {}
+        postprocess_keys: list[str] = []
+        for (
+            name,
+            key,
+            encode_value,
+            override_encoder,
+            exclude,
+            may_ref,
+            postprocess,
+        ) in specs:
+            value = getattr(obj, name)
+            if override_encoder is not None:
+                if exclude is not None and exclude(value):
+                    continue
+                value = data[key] = override_encoder(value)
+                if postprocess or isinstance(value, dict):
+                    postprocess_keys.append(key)
+                continue
+            if may_ref and todict is not None and is_reference(value):
+                data[f"#{key}"] = todict.encode_result_reference(value)
+                continue
+            fallback = postprocess
+            if value is not None and encode_value is not None:
+                encoded = encode_value(value, todict)
+                if encoded is FALLBACK:
+                    fallback = True
+                    value = _asdict(value)
+                else:
+                    value = encoded
+            elif value is not None:
+                value = _asdict(value)
+            if exclude is not None and exclude(value):
+                continue
+            data[key] = value
+            if fallback:
+                postprocess_keys.append(key)
+        if todict is not None and postprocess_keys:
+            return todict.postprocess_keys(data, postprocess_keys)
+        return data
+
+    return encode
+
+
+def is_compilable(cls: type) -> bool:
+    if not is_dataclass(cls) or cfg.global_config.encoders:
+        return False
+    config = getattr(cls, "dataclass_json_config", None) or {}
+    # Undefined.INCLUDE merges catch-all fields into the output
+    if config.get("undefined") == Undefined.INCLUDE:
+        return False
+    overrides = _user_overrides_or_exts(cls)
+    keys = [
+        (
+            overrides[f.name].letter_case(f.name)
+            if overrides[f.name].letter_case
+            else f.name
+        )
+        for f in fields(cls)
+    ]
+    # dataclasses_json raises an error for duplicate keys
+    return len(keys) == len(set(keys))
+
+
+def is_reference(value: Any) -> bool:
+    return (
+        type(value) in REF_TYPES
+        and value._ref_sentinel == type(value).__name__
+    )
+
+
+def generic_encoder(
+    value: Any, todict: Optional[ModelToDictPostprocessor]
+) -> Any:
+    encoded = _asdict(value)
+    if todict is not None and isinstance(encoded, dict):
+        return todict.postprocess(encoded)
+    return encoded
+
+
+def field_encoder(field_type: Any) -> tuple[bool, Optional[ValueEncoder]]:
+    # Returns whether the field may hold a result reference, and the encoder
+    # for other values
+    while _is_new_type(field_type):
+        field_type = field_type.__supertype__
+    members = (
+        list(get_args(field_type))
+        if get_origin(field_type) is Union
+        else [field_type]
+    )
+    members = [m for m in members if m is not type(None)]
+    value_types = [m for m in members if m not in REF_TYPES]
+    may_ref = len(value_types) < len(members)
+    if not value_types:
+        return may_ref, never_encoder
+    if len(value_types) == 1:
+        return may_ref, value_encoder(value_types[0])
+    return may_ref, union_encoder([value_encoder(m) for m in value_types])
+
+
+def value_encoder(type_: Any) -> Optional[ValueEncoder]:
+    # Returns None when values can only be encoded by dataclasses_json
+    while _is_new_type(type_):
+        type_ = type_.__supertype__
+    if type_ in REF_TYPES:
+        return None
+    if isinstance(type_, type) and is_dataclass(type_):
+        return dataclass_encoder(type_)
+    if type_ in SCALAR_TYPES or (
+        isinstance(type_, type) and issubclass(type_, Enum)
+    ):
+        return scalar_encoder(type_)
+    origin = get_origin(type_)
+    args = get_args(type_)
+    if origin is Union:
+        return union_encoder(
+            [value_encoder(a) for a in args if a is not type(None)]
+        )
+    if origin in LIST_TYPES and len(args) == 1:
+        return list_encoder(value_encoder(args[0]))
+    if origin in MAPPING_TYPES and len(args) == 2 and args[0] is str:
+        return mapping_encoder(value_encoder(args[1]))
+    return None
+
+
+def never_encoder(
+    value: Any, todict: Optional[ModelToDictPostprocessor]
+) -> Any:
+    return FALLBACK
+
+
+def dataclass_encoder(cls: type) -> ValueEncoder:
+    # Encoders are looked up on first use to allow recursive models
+    def encode(value: Any, todict: Optional[ModelToDictPostprocessor]) -> Any:
+        if type(value) is not cls:
+            return FALLBACK
+        return model_encoder(cls)(value, todict)
+
+    return encode
+
+
+def scalar_encoder(type_: type) -> ValueEncoder:
+    def encode(value: Any, todict: Optional[ModelToDictPostprocessor]) -> Any:
+        return value if isinstance(value, type_) else FALLBACK
+
+    return encode
+
+
+def union_encoder(encoders: list[Optional[ValueEncoder]]) -> ValueEncoder:
+    if any(e is None for e in encoders):
+        return never_encoder
+    union_encoders = [e for e in encoders if e is not None]
+
+    def encode(value: Any, todict: Optional[ModelToDictPostprocessor]) -> Any:
+        for encode_value in union_encoders:
+            encoded = encode_value(value, todict)
+            if encoded is not FALLBACK:
+                return encoded
+        return FALLBACK
+
+    return encode
+
+
+def list_encoder(encode_item: Optional[ValueEncoder]) -> ValueEncoder:
+    # Values within lists are never postprocessed
+    def encode(value: Any, todict: Optional[ModelToDictPostprocessor]) -> Any:
+        if not isinstance(value, (list, tuple, set, frozenset)):
+            return FALLBACK
+        if encode_item is None:
+            return [_asdict(v) for v in value]
+        encoded = []
+        for v in value:
+            item = None if v is None else encode_item(v, None)
+            encoded.append(_asdict(v) if item is FALLBACK else item)
+        return encoded
+
+    return encode
+
+
+def mapping_encoder(encode_item: Optional[ValueEncoder]) -> ValueEncoder:
+    def encode(value: Any, todict: Optional[ModelToDictPostprocessor]) -> Any:
+        if encode_item is None or type(value) is not dict:
+            return FALLBACK
+        if todict is not None and REF_SENTINEL_KEY in value:
+            return FALLBACK
+        encoded: dict[str, Any] = {}
+        for k, v in value.items():
+            if v is None:
+                encoded[k] = None
+                continue
+            if not isinstance(k, str):
+                return FALLBACK
+            item = encode_item(v, None if k.startswith("#") else todict)
+            # Header lists in mappings are rewritten like fields
+            if item is FALLBACK or (k == "headers" and isinstance(item, list)):
+                return FALLBACK
+            encoded[k] = item
+        return encoded
+
+    return encode
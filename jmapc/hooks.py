@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Optional
+
+from .api import APIRequest
+
+
+@dataclass
+class RequestInfo:
+    url: str
+    method_names: list[str]
+    attempt: int
+    request_bytes: int
+    # Raw bodies are passed as-is, and only decoded by hooks that use them
+    request_body: bytes
+
+    @classmethod
+    def create(
+        cls, url: str, request: APIRequest, body: bytes, attempt: int
+    ) -> RequestInfo:
+        return cls(
+            url=url,
+            method_names=[c[0] for c in request.method_calls],
+            attempt=attempt,
+            request_bytes=len(body),
+            request_body=body,
+        )
+
+
+@dataclass
+class ResponseInfo:
+    request: RequestInfo
+    status: int
+    response_bytes: int
+    duration: float
+    # Not retained for streaming requests
+    response_body: Optional[bytes] = None
+
+
+class RequestHooks:
+    # Subclasses override the hooks they need. Hooks are called for each
+    # HTTP request sent to the JMAP API, including retries, and should return
+    # quickly as they run inline with requests.
+    def before_request(self, info: RequestInfo) -> None:
+        pass
+
+    def after_response(self, info: ResponseInfo) -> None:
+        pass
+
+    def on_error(
+        self, info: RequestInfo, error: BaseException, duration: float
+    ) -> None:
+        pass
@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import contextlib
+from collections.abc import Iterable, Iterator, Mapping
+from contextvars import ContextVar
+from typing import Any, Callable, Optional
+
+# Field metadata key naming the category of string fields to be interned
+# when decoded
+INTERN_METADATA_KEY = "jmapc_intern"
+DEFAULT_MAX_SIZE = 65536
+
+# Low-cardinality values repeated across most emails, such as mailbox IDs,
+# keywords, MIME types and header names
+COMMON = "common"
+# Values only shared by related emails, which are interned on request
+THREAD_IDS = "thread_ids"
+ADDRESSES = "addresses"
+DEFAULT_CATEGORIES = frozenset({COMMON})
+
+
+class StringInterner:
+    # Maps decoded strings to a single shared instance. Once max_size strings
+    # are stored, further new strings are returned as-is so that unexpectedly
+    # high-cardinality values cannot grow the table without bound.
+    def __init__(
+        self,
+        max_size: int = DEFAULT_MAX_SIZE,
+        categories: Iterable[str] = DEFAULT_CATEGORIES,
+    ) -> None:
+        self.max_size = max_size
+        self.categories = frozenset(categories)
+        self._strings: dict[str, str] = {}
+
+    def __len__(self) -> int:
+        return len(self._strings)
+
+    def __contains__(self, value: object) -> bool:
+        return value in self._strings
+
+    def intern(self, value: str) -> str:
+        interned = self._strings.get(value)
+        if interned is not None:
+            return interned
+        if len(self._strings) >= self.max_size:
+            return value
+        return self._strings.setdefault(value, value)
+
+    def clear(self) -> None:
+        self._strings.clear()
+
+
+# Strings are only interned while an interner is in use, such as the
+# interner of a client, so that interned strings are freed with it
+_current_interner: ContextVar[Optional[StringInterner]] = ContextVar(
+    "jmapc_interner", default=None
+)
+current_interner = _current_interner.get
+
+
+@contextlib.contextmanager
+def interning(
+    interner: Optional[StringInterner],
+) -> Iterator[Optional[StringInterner]]:
+    token = _current_interner.set(interner)
+    try:
+        yield interner
+    finally:
+        _current_interner.reset(token)
+
+
+def category_interner(category: str) -> Callable[[str], str]:
+    # Strings in categories the current interner does not include are used
+    # as-is
+    interner = _current_interner.get()
+    if interner is None or category not in interner.categories:
+        return str
+    return interner.intern
+
+
+def interned(
+    category: str = COMMON, metadata: Optional[Mapping[str, Any]] = None
+) -> dict[str, Any]:
+    return dict(metadata or {}, **{INTERN_METADATA_KEY: category})
@@ -2,11 +2,12 @@ from __future__ import annotations
 
 import contextlib
 from dataclasses import dataclass, field
-from typing import Any, Optional
+from typing import TYPE_CHECKING, Any, Optional
 from typing import Set as SetType
-from typing import Union, cast
+from typing import TypeVar, Union, cast
 
 from ..errors import Error
+from ..interning import StringInterner, current_interner, interning
 from ..models import AddedItem, Comparator, ListOrRef, SetError, StrOrRef
 from ..serializer import Model
 
@@ -70,15 +71,77 @@ class Invocation(InvocationBase):
     method: Method
 
 
+LazyResponseType = TypeVar("LazyResponseType", bound="LazyResponse")
+
+
+class LazyResponse:
+    # Invocations created with lazy() keep the raw response data and decode
+    # it on first access to the response attribute
+    id: str
+    response: Union[Error, Response]
+    _lazy_response: tuple[
+        type[Union[Error, Response]],
+        dict[str, Any],
+        Optional[StringInterner],
+    ]
+
+    @classmethod
+    def lazy(
+        cls: type[LazyResponseType],
+        id: str,
+        response_type: type[Union[Error, Response]],
+        data: dict[str, Any],
+        interner: Optional[StringInterner] = None,
+    ) -> LazyResponseType:
+        invocation = cls.__new__(cls)
+        invocation.id = id
+        # Responses are decoded with the interner in use when they were
+        # received, such as the client's own interner
+        invocation._lazy_response = (
+            response_type,
+            data,
+            interner if interner is not None else current_interner(),
+        )
+        return invocation
+
+    @property
+    def response_type(self) -> type[Union[Error, Response]]:
+        if "_lazy_response" in self.__dict__:
+            return self._lazy_response[0]
+        return type(self.response)
+
+    if not TYPE_CHECKING:
+
+        def __getattr__(self, name: str) -> Any:
+            lazy_response = self.__dict__.get("_lazy_response")
+            if name != "response" or not lazy_response:
+                raise AttributeError(
+                    f"'{type(self).__name__}' object has no attribute"
+                    f" '{name}'"
+                )
+            response_type, data, interner = lazy_response
+            with interning(interner):
+                self.response = response_type.from_dict(data)
+            self.__dict__.pop("_lazy_response", None)
+            return self.response
+
+
 @dataclass
-class InvocationResponse(InvocationBase):
+class InvocationResponse(LazyResponse, InvocationBase):
     response: Response
 
 
 @dataclass
-class InvocationResponseOrError(InvocationBase):
+class InvocationResponseOrError(LazyResponse, InvocationBase):
     response: Union[Error, Response]
 
+    def to_invocation_response(self) -> InvocationResponse:
+        if "_lazy_response" in self.__dict__:
+            return InvocationResponse.lazy(self.id, *self._lazy_response)
+        return InvocationResponse(
+            id=self.id, response=cast(Response, self.response)
+        )
+
 
 class ChangesMethod:
     method_type: Optional[str] = "changes"
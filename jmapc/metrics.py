@@ -0,0 +1,205 @@
+from __future__ import annotations
+
+import bisect
+import contextlib
+import contextvars
+import math
+import threading
+import time
+from collections import Counter
+from collections.abc import Iterator, Sequence
+from typing import Any, Protocol
+
+from .api import APIRequest
+
+PHASES = ("prepare", "encode", "network", "parse", "decode")
+DEFAULT_DURATION_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+# 1 KiB to 16 MiB
+DEFAULT_SIZE_BUCKETS = tuple(float(1024 * 4**i) for i in range(8))
+DEFAULT_COUNT_BUCKETS = (1.0, 2.0, 4.0, 8.0, 16.0, 32.0, 64.0)
+# Time spent in phases nested within the current phase, per thread or task
+_nested_time: contextvars.ContextVar[list[float]] = contextvars.ContextVar(
+    "nested_time"
+)
+
+
+class Histogram:
+    def __init__(self, buckets: Sequence[float]) -> None:
+        self.buckets = tuple(sorted(buckets))
+        # The last count is for values above the largest bucket
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative_counts(self) -> list[tuple[float, int]]:
+        total = 0
+        counts = []
+        for bound, count in zip((*self.buckets, math.inf), self.counts):
+            total += count
+            counts.append((bound, total))
+        return counts
+
+
+class RequestMetrics:
+    def __init__(
+        self,
+        duration_buckets: Sequence[float] = DEFAULT_DURATION_BUCKETS,
+        size_buckets: Sequence[float] = DEFAULT_SIZE_BUCKETS,
+        count_buckets: Sequence[float] = DEFAULT_COUNT_BUCKETS,
+    ) -> None:
+        self.phases = {phase: Histogram(duration_buckets) for phase in PHASES}
+        self.request_bytes = Histogram(size_buckets)
+        self.response_bytes = Histogram(size_buckets)
+        self.method_calls = Histogram(count_buckets)
+        self.methods: Counter[str] = Counter()
+        # Requests made by the caller, before any splitting. Sizes are
+        # observed for each HTTP request, counted in http_requests.
+        self.requests = 0
+        self.http_requests = 0
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def time(self, phase: str) -> Iterator[None]:
+        # Time spent in nested phases, such as encoding while preparing a
+        # request, is only observed for the nested phase
+        parent = _nested_time.get(None)
+        nested = [0.0]
+        token = _nested_time.set(nested)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+            _nested_time.reset(token)
+            if parent is not None:
+                parent[0] += duration
+            self.observe_phase(phase, duration - nested[0])
+
+    def observe_phase(self, phase: str, duration: float) -> None:
+        with self._lock:
+            self.phases[phase].observe(duration)
+
+    def observe_request(self, request: APIRequest) -> None:
+        with self._lock:
+            self.requests += 1
+            self.method_calls.observe(len(request.method_calls))
+            self.methods.update(c[0] for c in request.method_calls)
+
+    def observe_sizes(self, request_bytes: int, response_bytes: int) -> None:
+        with self._lock:
+            self.http_requests += 1
+            self.request_bytes.observe(request_bytes)
+            self.response_bytes.observe(response_bytes)
+
+    def export(self, exporter: MetricsExporter) -> Any:
+        with self._lock:
+            return exporter.export(self)
+
+
+class MetricsExporter(Protocol):
+    def export(self, metrics: RequestMetrics) -> Any: ...
+
+
+class PrometheusExporter:
+    # Renders metrics in the Prometheus text exposition format
+    def __init__(self, prefix: str = "jmapc") -> None:
+        self.prefix = prefix
+
+    def export(self, metrics: RequestMetrics) -> str:
+        lines: list[str] = []
+        self._counter(
+            lines,
+            "requests_total",
+            "JMAP API requests",
+            [("", metrics.requests)],
+        )
+        self._counter(
+            lines,
+            "http_requests_total",
+            "JMAP API HTTP requests, after splitting large requests",
+            [("", metrics.http_requests)],
+        )
+        self._counter(
+            lines,
+            "method_calls_total",
+            "JMAP method calls by method",
+            [
+                (f'method="{name}"', count)
+                for name, count in sorted(metrics.methods.items())
+            ],
+        )
+        self._histogram_header(
+            lines, "phase_duration_seconds", "Request phase durations"
+        )
+        for phase, histogram in metrics.phases.items():
+            self._histogram(
+                lines, "phase_duration_seconds", histogram, f'phase="{phase}"'
+            )
+        for name, histogram, description in (
+            ("request_bytes", metrics.request_bytes, "Request body sizes"),
+            ("response_bytes", metrics.response_bytes, "Response body sizes"),
+            (
+                "request_method_calls",
+                metrics.method_calls,
+                "Method calls per request",
+            ),
+        ):
+            self._histogram_header(lines, name, description)
+            self._histogram(lines, name, histogram)
+        return "\n".join(lines) + "\n"
+
+    def _counter(
+        self,
+        lines: list[str],
+        name: str,
+        description: str,
+        values: list[tuple[str, int]],
+    ) -> None:
+        name = f"{self.prefix}_{name}"
+        lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} counter")
+        for labels, value in values:
+            lines.append(
+                f"{name}{{{labels}}} {value}" if labels else f"{name} {value}"
+            )
+
+    def _histogram_header(
+        self, lines: list[str], name: str, description: str
+    ) -> None:
+        lines.append(f"# HELP {self.prefix}_{name} {description}")
+        lines.append(f"# TYPE {self.prefix}_{name} histogram")
+
+    def _histogram(
+        self,
+        lines: list[str],
+        name: str,
+        histogram: Histogram,
+        labels: str = "",
+    ) -> None:
+        name = f"{self.prefix}_{name}"
+        prefix = f"{labels}," if labels else ""
+        for bound, count in histogram.cumulative_counts():
+            le = "+Inf" if math.isinf(bound) else str(bound)
+            lines.append(f'{name}_bucket{{{prefix}le="{le}"}} {count}')
+        suffix = f"{{{labels}}}" if labels else ""
+        lines.append(f"{name}_sum{suffix} {histogram.sum}")
+        lines.append(f"{name}_count{suffix} {histogram.count}")
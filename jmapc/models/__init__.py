@@ -6,6 +6,16 @@ from .email import (
     EmailQueryFilter,
     EmailQueryFilterCondition,
     EmailQueryFilterOperator,
+    FrozenEmail,
+    FrozenEmailAddress,
+    FrozenEmailBodyPart,
+    FrozenEmailBodyValue,
+    FrozenEmailHeader,
+    SlottedEmail,
+    SlottedEmailAddress,
+    SlottedEmailBodyPart,
+    SlottedEmailBodyValue,
+    SlottedEmailHeader,
 )
 from .email_submission import (
     Address,
@@ -63,6 +73,11 @@ __all__ = [
     "EmailSubmissionQueryFilterOperator",
     "Envelope",
     "Event",
+    "FrozenEmail",
+    "FrozenEmailAddress",
+    "FrozenEmailBodyPart",
+    "FrozenEmailBodyValue",
+    "FrozenEmailHeader",
     "Identity",
     "ListOrRef",
     "Mailbox",
@@ -72,6 +87,11 @@ __all__ = [
     "Operator",
     "SearchSnippet",
     "SetError",
+    "SlottedEmail",
+    "SlottedEmailAddress",
+    "SlottedEmailBodyPart",
+    "SlottedEmailBodyValue",
+    "SlottedEmailHeader",
     "StateChange",
     "StrOrRef",
     "Thread",
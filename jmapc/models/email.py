@@ -2,11 +2,18 @@ from __future__ import annotations
 
 from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Optional, Union
+from typing import TYPE_CHECKING, Optional, Union
 
 from dataclasses_json import config
 
-from ..serializer import Model, datetime_decode, datetime_encode
+from ..interning import THREAD_IDS, interned
+from ..serializer import (
+    Model,
+    SlottedModel,
+    datetime_decode,
+    datetime_encode,
+    slotted_models,
+)
 from .models import EmailAddress, ListOrRef, Operator, StrOrRef
 
 
@@ -14,9 +21,15 @@ from .models import EmailAddress, ListOrRef, Operator, StrOrRef
 class Email(Model):
     id: Optional[str] = field(metadata=config(field_name="id"), default=None)
     blob_id: Optional[str] = None
-    thread_id: Optional[str] = None
-    mailbox_ids: Optional[dict[str, bool]] = None
-    keywords: Optional[dict[str, bool]] = None
+    thread_id: Optional[str] = field(
+        default=None, metadata=interned(THREAD_IDS)
+    )
+    mailbox_ids: Optional[dict[str, bool]] = field(
+        default=None, metadata=interned()
+    )
+    keywords: Optional[dict[str, bool]] = field(
+        default=None, metadata=interned()
+    )
     size: Optional[int] = None
     received_at: Optional[datetime] = field(
         default=None,
@@ -49,7 +62,7 @@ class Email(Model):
 
 @dataclass
 class EmailHeader(Model):
-    name: Optional[str] = None
+    name: Optional[str] = field(default=None, metadata=interned())
     value: Optional[str] = None
 
 
@@ -60,11 +73,11 @@ class EmailBodyPart(Model):
     size: Optional[int] = None
     headers: Optional[list[EmailHeader]] = None
     name: Optional[str] = None
-    type: Optional[str] = None
-    charset: Optional[str] = None
-    disposition: Optional[str] = None
+    type: Optional[str] = field(default=None, metadata=interned())
+    charset: Optional[str] = field(default=None, metadata=interned())
+    disposition: Optional[str] = field(default=None, metadata=interned())
     cid: Optional[str] = None
-    language: Optional[list[str]] = None
+    language: Optional[list[str]] = field(default=None, metadata=interned())
     location: Optional[str] = None
     sub_parts: Optional[list[EmailBodyPart]] = None
 
@@ -114,3 +127,67 @@ class EmailQueryFilterOperator(Model):
 
 
 EmailQueryFilter = Union[EmailQueryFilterCondition, EmailQueryFilterOperator]
+
+
+# Compact variants of the email models with __slots__, for keeping large
+# numbers of emails in memory. Frozen variants also prevent reassigning
+# fields, but are not hashable.
+COMPACT_MODELS = (
+    Email,
+    EmailAddress,
+    EmailBodyPart,
+    EmailBodyValue,
+    EmailHeader,
+)
+
+if TYPE_CHECKING:  # pragma: no cover
+    # The variants are created from the models below, so type checkers see
+    # them as subclasses of the models to share their fields. At runtime,
+    # they are not subclasses, fields typed as models hold the corresponding
+    # variants, and frozen variants reject assignments.
+
+    class SlottedEmail(SlottedModel, Email):
+        pass
+
+    class SlottedEmailAddress(SlottedModel, EmailAddress):
+        pass
+
+    class SlottedEmailBodyPart(SlottedModel, EmailBodyPart):
+        pass
+
+    class SlottedEmailBodyValue(SlottedModel, EmailBodyValue):
+        pass
+
+    class SlottedEmailHeader(SlottedModel, EmailHeader):
+        pass
+
+    class FrozenEmail(SlottedModel, Email):
+        pass
+
+    class FrozenEmailAddress(SlottedModel, EmailAddress):
+        pass
+
+    class FrozenEmailBodyPart(SlottedModel, EmailBodyPart):
+        pass
+
+    class FrozenEmailBodyValue(SlottedModel, EmailBodyValue):
+        pass
+
+    class FrozenEmailHeader(SlottedModel, EmailHeader):
+        pass
+
+else:
+    (
+        SlottedEmail,
+        SlottedEmailAddress,
+        SlottedEmailBodyPart,
+        SlottedEmailBodyValue,
+        SlottedEmailHeader,
+    ) = slotted_models(COMPACT_MODELS, __name__, "Slotted")
+    (
+        FrozenEmail,
+        FrozenEmailAddress,
+        FrozenEmailBodyPart,
+        FrozenEmailBodyValue,
+        FrozenEmailHeader,
+    ) = slotted_models(COMPACT_MODELS, __name__, "Frozen", frozen=True)
@@ -1,10 +1,10 @@
-import json
 from dataclasses import dataclass, field
 from typing import Optional
 
 import sseclient
 from dataclasses_json import config
 
+from ..codec import DEFAULT_JSON_CODEC, JSONCodec
 from ..serializer import Model
 
 
@@ -39,6 +39,8 @@ class Event(Model):
     data: StateChange
 
     @classmethod
-    def load_from_sseclient_event(cls, event: sseclient.Event) -> "Event":
-        data = json.loads(event.data)
+    def load_from_sseclient_event(
+        cls, event: sseclient.Event, codec: Optional[JSONCodec] = None
+    ) -> "Event":
+        data = (codec or DEFAULT_JSON_CODEC).loads(event.data)
         return cls.from_dict({"id": event.id, "data": data})
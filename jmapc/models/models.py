@@ -6,6 +6,7 @@ from typing import Optional, TypeVar, Union
 
 from dataclasses_json import config
 
+from ..interning import ADDRESSES, interned
 from ..ref import Ref, ResultReference
 from ..serializer import Model
 
@@ -30,8 +31,8 @@ class AddedItem(Model):
 
 @dataclass
 class EmailAddress(Model):
-    name: Optional[str] = None
-    email: Optional[str] = None
+    name: Optional[str] = field(default=None, metadata=interned(ADDRESSES))
+    email: Optional[str] = field(default=None, metadata=interned(ADDRESSES))
 
 
 @dataclass
@@ -0,0 +1,433 @@
+from __future__ import annotations
+
+import itertools
+from collections import defaultdict
+from collections.abc import Iterable, Iterator, Sequence
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional
+
+from .api import APIRequest
+from .codec import DEFAULT_JSON_CODEC, JSONCodec
+
+MethodCall = tuple[str, Any, str]
+MethodResponse = tuple[str, dict[str, Any], str]
+
+
+def result_references(value: Any) -> Iterator[str]:
+    if isinstance(value, dict):
+        for k, v in value.items():
+            if k.startswith("#") and isinstance(v, dict) and "resultOf" in v:
+                yield v["resultOf"]
+            else:
+                yield from result_references(v)
+    elif isinstance(value, list):
+        for v in value:
+            yield from result_references(v)
+
+
+def referenced_call_ids(method_calls: Sequence[MethodCall]) -> set[str]:
+    return {
+        ref for _, args, _ in method_calls for ref in result_references(args)
+    }
+
+
+def chunked(items: Iterable[Any], size: int) -> Iterator[list[Any]]:
+    it = iter(items)
+    while chunk := list(itertools.islice(it, size)):
+        yield chunk
+
+
+def split_get_call(
+    method_call: MethodCall, max_objects_in_get: int
+) -> list[MethodCall]:
+    name, args, call_id = method_call
+    ids = args.get("ids")
+    if (
+        not name.endswith("/get")
+        or not isinstance(ids, list)
+        or len(ids) <= max_objects_in_get
+    ):
+        return [method_call]
+    return [
+        (name, dict(args, ids=chunk), chunk_call_id(call_id, n))
+        for n, chunk in enumerate(chunked(ids, max_objects_in_get))
+    ]
+
+
+def merge_get_responses(responses: list[dict[str, Any]]) -> dict[str, Any]:
+    merged = dict(responses[0])
+    merged["list"] = [o for r in responses for o in r.get("list") or []]
+    not_found = [i for r in responses for i in r.get("notFound") or []]
+    if not_found or any("notFound" in r for r in responses):
+        merged["notFound"] = not_found
+    return merged
+
+
+def split_set_call(
+    method_call: MethodCall, max_objects_in_set: int
+) -> list[MethodCall]:
+    name, args, call_id = method_call
+    if not name.endswith("/set"):
+        return [method_call]
+    destroy = args.get("destroy")
+    operations = [
+        *[("create", k, v) for k, v in (args.get("create") or {}).items()],
+        *[("update", k, v) for k, v in (args.get("update") or {}).items()],
+        *[
+            ("destroy", i, None)
+            for i in (destroy if isinstance(destroy, list) else [])
+        ],
+    ]
+    if len(operations) <= max_objects_in_set:
+        return [method_call]
+    split_calls: list[MethodCall] = []
+    for n, chunk in enumerate(chunked(operations, max_objects_in_set)):
+        chunk_args = {
+            k: v
+            for k, v in args.items()
+            if k not in SET_OPERATIONS
+            and k not in SET_ON_SUCCESS
+            and (n == 0 or k not in SET_FIRST_CHUNK_ONLY)
+        }
+        for operation, key, value in chunk:
+            if operation == "destroy":
+                chunk_args.setdefault(operation, []).append(key)
+            else:
+                chunk_args.setdefault(operation, {})[key] = value
+        split_calls.append((name, chunk_args, chunk_call_id(call_id, n)))
+    split_on_success_args(args, split_calls)
+    return split_calls
+
+
+def split_on_success_args(
+    args: dict[str, Any], split_calls: list[MethodCall]
+) -> None:
+    # Actions to take after successful operations, such as
+    # onSuccessUpdateEmail in EmailSubmission/set, are keyed by the ID or
+    # "#" creation ID of the object they apply to, and are sent with the
+    # chunk that creates, updates or destroys that object. Other entries are
+    # sent with the first chunk.
+    chunk_ids: dict[str, int] = {}
+    for n, (_, chunk_args, _) in enumerate(split_calls):
+        for creation_id in chunk_args.get("create") or {}:
+            chunk_ids[f"#{creation_id}"] = n
+        for id in chunk_args.get("update") or {}:
+            chunk_ids[id] = n
+        for id in chunk_args.get("destroy") or []:
+            chunk_ids[id] = n
+    for key in SET_ON_SUCCESS:
+        value = args.get(key)
+        if value is None:
+            continue
+        if not isinstance(value, (dict, list)):
+            split_calls[0][1][key] = value
+            continue
+        for id in value:
+            chunk_args = split_calls[chunk_ids.get(id, 0)][1]
+            if isinstance(value, dict):
+                chunk_args.setdefault(key, {})[id] = value[id]
+            else:
+                chunk_args.setdefault(key, []).append(id)
+
+
+def set_error_response(
+    args: dict[str, Any], error: dict[str, Any]
+) -> dict[str, Any]:
+    # Report each operation in a failed chunk as a SetError
+    destroy = args.get("destroy")
+    return {
+        "accountId": args.get("accountId"),
+        "notCreated": {k: error for k in args.get("create") or {}},
+        "notUpdated": {k: error for k in args.get("update") or {}},
+        "notDestroyed": {
+            k: error for k in (destroy if isinstance(destroy, list) else [])
+        },
+    }
+
+
+def merge_set_responses(responses: list[dict[str, Any]]) -> dict[str, Any]:
+    merged = dict(responses[0])
+    states = [r for r in responses if "newState" in r]
+    merged["oldState"] = states[0].get("oldState") if states else None
+    merged["newState"] = states[-1]["newState"] if states else None
+    for key in ("created", "updated", *SET_ERROR_KEYS):
+        values = [r[key] for r in responses if r.get(key) is not None]
+        merged[key] = (
+            {k: v for d in values for k, v in d.items()} if values else None
+        )
+    destroyed = [
+        r["destroyed"] for r in responses if r.get("destroyed") is not None
+    ]
+    merged["destroyed"] = (
+        [i for d in destroyed for i in d] if destroyed else None
+    )
+    return merged
+
+
+SET_OPERATIONS = ("create", "update", "destroy")
+SET_FIRST_CHUNK_ONLY = ("ifInState", "#ifInState", "#destroy")
+SET_ON_SUCCESS = ("onSuccessUpdateEmail", "onSuccessDestroyEmail")
+SET_ERROR_KEYS = ("notCreated", "notUpdated", "notDestroyed")
+
+MERGE_FUNCTIONS: dict[
+    str, Callable[[list[dict[str, Any]]], dict[str, Any]]
+] = {
+    "get": merge_get_responses,
+    "set": merge_set_responses,
+}
+
+
+def chunk_call_id(call_id: str, n: int) -> str:
+    return f"{call_id}#{n}"
+
+
+def creation_references(value: Any) -> Iterator[str]:
+    if isinstance(value, str):
+        if value.startswith("#"):
+            yield value[1:]
+    elif isinstance(value, dict):
+        for k, v in value.items():
+            yield from creation_references(k)
+            yield from creation_references(v)
+    elif isinstance(value, list):
+        for v in value:
+            yield from creation_references(v)
+
+
+def call_dependencies(method_calls: Sequence[MethodCall]) -> list[int]:
+    # Index of the earliest call each call refers to, either by result
+    # reference or by creation ID
+    call_index: dict[str, int] = {}
+    creation_index: dict[str, int] = {}
+    earliest: list[int] = []
+    for i, (_, args, call_id) in enumerate(method_calls):
+        dependencies = [
+            call_index[ref]
+            for ref in result_references(args)
+            if ref in call_index
+        ] + [
+            creation_index[ref]
+            for ref in creation_references(args)
+            if ref in creation_index
+        ]
+        earliest.append(min(dependencies, default=i))
+        call_index.setdefault(call_id, i)
+        if isinstance(args, dict) and isinstance(args.get("create"), dict):
+            for creation_id in args["create"]:
+                creation_index.setdefault(creation_id, i)
+    return earliest
+
+
+def split_method_calls(
+    method_calls: Sequence[MethodCall],
+    max_calls_in_request: Optional[int] = None,
+    max_size: Optional[int] = None,
+    json_codec: JSONCodec = DEFAULT_JSON_CODEC,
+) -> list[list[MethodCall]]:
+    # Find the positions where the calls can be split into separate
+    # requests, which are those not crossed by any reference
+    earliest = call_dependencies(method_calls)
+    units: list[list[MethodCall]] = []
+    end = len(method_calls)
+    earliest_after = end
+    for i in reversed(range(len(method_calls))):
+        earliest_after = min(earliest_after, earliest[i])
+        if earliest_after >= i:
+            units.append(list(method_calls[i:end]))
+            end = i
+    units.reverse()
+    # Pack as many consecutive units as fit into each request
+    batches: list[list[MethodCall]] = [[]]
+    batch_size = 0
+    for unit in units:
+        # Sizes are measured with the encoder used to send the request, as
+        # method call arguments may contain values such as enums
+        unit_size = sum(len(json_codec.dumps(c)) + 1 for c in unit)
+        if batches[-1] and (
+            (
+                max_calls_in_request
+                and len(batches[-1]) + len(unit) > max_calls_in_request
+            )
+            or (max_size and batch_size + unit_size > max_size)
+        ):
+            batches.append([])
+            batch_size = 0
+        batches[-1].extend(unit)
+        batch_size += unit_size
+    return batches
+
+
+@dataclass
+class RequestPlan:
+    requests: list[APIRequest]
+    chunked_calls: dict[str, str] = field(default_factory=dict)
+    # Request bodies encoded while planning, by request position, which are
+    # sent as-is
+    raw_requests: dict[int, bytes] = field(default_factory=dict)
+
+    @classmethod
+    def from_request(
+        cls,
+        request: APIRequest,
+        max_objects_in_get: Optional[int] = None,
+        max_objects_in_set: Optional[int] = None,
+        max_calls_in_request: Optional[int] = None,
+        max_size_request: Optional[int] = None,
+        json_codec: JSONCodec = DEFAULT_JSON_CODEC,
+        encode_request: Optional[Callable[[APIRequest], bytes]] = None,
+    ) -> RequestPlan:
+        method_calls, chunked_calls = cls._split_oversized_calls(
+            request.method_calls, max_objects_in_get, max_objects_in_set
+        )
+        if chunked_calls:
+            request = cls._batch_request(request, method_calls)
+        plan = cls(requests=[request], chunked_calls=chunked_calls)
+        if len(method_calls) <= 1:
+            return plan
+        if not max_calls_in_request or len(method_calls) <= (
+            max_calls_in_request
+        ):
+            if not max_size_request:
+                return plan
+            # Calls are only measured one by one when the whole request is
+            # too large
+            raw_request = (
+                encode_request(request)
+                if encode_request
+                else json_codec.dumps(request.to_dict())
+            )
+            plan.raw_requests[0] = raw_request
+            if len(raw_request) <= max_size_request:
+                return plan
+        envelope_size = len(
+            json_codec.dumps(
+                {"using": sorted(request.using), "methodCalls": []}
+            )
+        )
+        batches = split_method_calls(
+            method_calls,
+            max_calls_in_request=max_calls_in_request,
+            max_size=(
+                max_size_request - envelope_size if max_size_request else None
+            ),
+            json_codec=json_codec,
+        )
+        if len(batches) == 1:
+            return plan
+        return cls(
+            requests=[cls._batch_request(request, b) for b in batches],
+            chunked_calls=chunked_calls,
+        )
+
+    @staticmethod
+    def _batch_request(
+        request: APIRequest, method_calls: list[MethodCall]
+    ) -> APIRequest:
+        batch_request = APIRequest(
+            account_id=request.account_id, method_calls=method_calls
+        )
+        batch_request.using = request.using
+        return batch_request
+
+    @staticmethod
+    def _split_oversized_calls(
+        method_calls: list[MethodCall],
+        max_objects_in_get: Optional[int],
+        max_objects_in_set: Optional[int],
+    ) -> tuple[list[MethodCall], dict[str, str]]:
+        if not max_objects_in_get and not max_objects_in_set:
+            return method_calls, {}
+        # Calls referenced by later calls are sent as-is, as a result
+        # reference cannot point at more than one chunk
+        referenced = referenced_call_ids(method_calls)
+        split_method_calls: list[MethodCall] = []
+        chunked_calls: dict[str, str] = {}
+        for method_call in method_calls:
+            call_id = method_call[2]
+            if call_id in referenced:
+                split_method_calls.append(method_call)
+                continue
+            split_calls = [method_call]
+            if max_objects_in_get:
+                split_calls = split_get_call(method_call, max_objects_in_get)
+            if max_objects_in_set and len(split_calls) == 1:
+                split_calls = split_set_call(method_call, max_objects_in_set)
+            if len(split_calls) > 1:
+                chunked_calls.update({c[2]: call_id for c in split_calls})
+            split_method_calls.extend(split_calls)
+        return split_method_calls, chunked_calls
+
+    def merge_method_responses(
+        self, method_responses: Sequence[MethodResponse]
+    ) -> list[MethodResponse]:
+        # Chunk responses are grouped by method name as well as call ID, as
+        # a call may also return implicit responses of other methods, such
+        # as Email/set for EmailSubmission/set. Errors are grouped with the
+        # responses of the method that was called.
+        call_names = {
+            c[2]: c[0] for r in self.requests for c in r.method_calls
+        }
+        chunks: dict[tuple[str, str], list[MethodResponse]] = defaultdict(list)
+        for response in method_responses:
+            original_id = self.chunked_calls.get(response[2])
+            if original_id:
+                chunks[
+                    self._chunk_key(response, original_id, call_names)
+                ].append(response)
+        merged: list[MethodResponse] = []
+        for response in method_responses:
+            original_id = self.chunked_calls.get(response[2])
+            if not original_id:
+                merged.append(response)
+                continue
+            key = self._chunk_key(response, original_id, call_names)
+            if key in chunks:
+                # Merged response takes the place of the first chunk response
+                merged.append(self._merge_chunks(original_id, chunks.pop(key)))
+        return merged
+
+    @staticmethod
+    def _chunk_key(
+        response: MethodResponse, original_id: str, call_names: dict[str, str]
+    ) -> tuple[str, str]:
+        name = response[0]
+        if name == "error":
+            name = call_names.get(response[2], name)
+        return (name, original_id)
+
+    def _merge_chunks(
+        self, call_id: str, responses: list[MethodResponse]
+    ) -> MethodResponse:
+        errors = [r for r in responses if r[0] == "error"]
+        name = next((r[0] for r in responses if r[0] != "error"), None)
+        method_type = name.rsplit("/", 1)[-1] if name else None
+        if not name or (errors and method_type != "set"):
+            # A failed chunk fails the whole call, except for /set calls
+            # where the other chunks may already have been applied
+            return ("error", errors[0][1], call_id)
+        if len(responses) == 1:
+            return (name, responses[0][1], call_id)
+        if errors:
+            chunk_args = {
+                c[2]: c[1] for r in self.requests for c in r.method_calls
+            }
+            responses = [
+                (
+                    (name, set_error_response(chunk_args[r[2]], r[1]), r[2])
+                    if r[0] == "error"
+                    else r
+                )
+                for r in responses
+            ]
+        merge = MERGE_FUNCTIONS[str(method_type)]
+        return (name, merge([r[1] for r in responses]), call_id)
+
+    def combine_responses(
+        self, data: Sequence[dict[str, Any]]
+    ) -> dict[str, Any]:
+        # Responses to split requests are reassembled in request order, with
+        # the session state of the last response
+        method_responses = [r for d in data for r in d["methodResponses"]]
+        if self.chunked_calls:
+            method_responses = self.merge_method_responses(method_responses)
+        return dict(data[-1], methodResponses=method_responses)
@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+import asyncio
+import email.utils
+import random
+import threading
+import time
+from collections.abc import Sequence
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+from .api import APIRequest
+from .planner import (
+    MethodCall,
+    MethodResponse,
+    creation_references,
+    referenced_call_ids,
+)
+
+IDEMPOTENT_METHOD_TYPES = ("get", "query", "queryChanges", "changes")
+# Responses with these statuses come from a server that was reached at the
+# request URL, so the session URLs are not stale
+REJECTED_STATUSES = (429, 503)
+
+
+def is_idempotent_call(method_call: MethodCall) -> bool:
+    return method_call[0].rsplit("/", 1)[-1] in IDEMPOTENT_METHOD_TYPES
+
+
+def is_idempotent_request(request: APIRequest) -> bool:
+    return all(is_idempotent_call(c) for c in request.method_calls)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(tz=timezone.utc)).total_seconds())
+
+
+class RetryBudget:
+    # Each request deposits a fraction of a retry, and each retry withdraws a
+    # whole one, which caps retries to a share of overall traffic
+    def __init__(self, ratio: float = 0.1, reserve: float = 10.0) -> None:
+        self.ratio = ratio
+        self.reserve = reserve
+        self._tokens = reserve
+        self._lock = threading.Lock()
+
+    def deposit(self) -> None:
+        with self._lock:
+            self._tokens = min(self.reserve, self._tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+@dataclass
+class RetryPolicy:
+    max_attempts: int = 3
+    backoff: float = 0.5
+    backoff_multiplier: float = 2.0
+    max_backoff: float = 30.0
+    jitter: bool = True
+    retry_statuses: tuple[int, ...] = (429, 502, 503, 504)
+    # Requests with calls that change data are only retried for statuses
+    # that mean the request was not processed. Intermediaries may also send
+    # 503 after forwarding the request, so it is not retried by default.
+    non_idempotent_retry_statuses: tuple[int, ...] = (429,)
+    retry_method_errors: tuple[str, ...] = (
+        "serverUnavailable",
+        "serverFail",
+    )
+    budget: Optional[RetryBudget] = field(default_factory=RetryBudget)
+
+    def delay(
+        self, attempt: int, retry_after: Optional[float] = None
+    ) -> float:
+        if retry_after is not None:
+            # Waits requested by the server are capped to avoid blocking for
+            # an arbitrarily long time
+            return min(self.max_backoff, retry_after)
+        delay = min(
+            self.max_backoff,
+            self.backoff * self.backoff_multiplier ** (attempt - 1),
+        )
+        # Full jitter spreads out retries from many clients after an outage.
+        # The jitter is not security sensitive.
+        if not self.jitter:
+            return delay
+        return random.uniform(0, delay)  # nosec B311
+
+    def record_request(self) -> None:
+        if self.budget:
+            self.budget.deposit()
+
+    def acquire(self, attempt: int) -> bool:
+        if attempt >= self.max_attempts:
+            return False
+        return not self.budget or self.budget.withdraw()
+
+    def should_retry_status(self, status: int, request: APIRequest) -> bool:
+        return status in self.retry_statuses and (
+            status in self.non_idempotent_retry_statuses
+            or is_idempotent_request(request)
+        )
+
+    def retryable_calls(
+        self, request: APIRequest, response: dict[str, Any]
+    ) -> list[MethodCall]:
+        # Only idempotent calls that neither use nor provide result
+        # references, and do not refer to creation IDs, can be re-issued on
+        # their own
+        failed_ids = {
+            call_id
+            for name, args, call_id in response.get("methodResponses", [])
+            if name == "error" and args.get("type") in self.retry_method_errors
+        }
+        if not failed_ids:
+            return []
+        referenced = referenced_call_ids(request.method_calls)
+        return [
+            c
+            for c in request.method_calls
+            if c[2] in failed_ids
+            and c[2] not in referenced
+            and is_idempotent_call(c)
+            and not referenced_call_ids([c])
+            and not any(creation_references(c[1]))
+        ]
+
+    def sleep(self, attempt: int, retry_after: Optional[float] = None) -> None:
+        time.sleep(self.delay(attempt, retry_after))
+
+    async def async_sleep(
+        self, attempt: int, retry_after: Optional[float] = None
+    ) -> None:
+        await asyncio.sleep(self.delay(attempt, retry_after))
+
+
+def retry_request(request: APIRequest, calls: list[MethodCall]) -> APIRequest:
+    retry = APIRequest(account_id=request.account_id, method_calls=calls)
+    retry.using = request.using
+    return retry
+
+
+def merge_retried_responses(
+    response: dict[str, Any], retried: dict[str, Any]
+) -> dict[str, Any]:
+    retried_responses: dict[str, MethodResponse] = {
+        r[2]: r for r in retried["methodResponses"]
+    }
+    method_responses: Sequence[MethodResponse] = response["methodResponses"]
+    return dict(
+        response,
+        methodResponses=[
+            retried_responses.get(r[2], r) for r in method_responses
+        ],
+        sessionState=retried.get("sessionState", response.get("sessionState")),
+    )
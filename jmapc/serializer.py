@@ -1,17 +1,36 @@
 from __future__ import annotations
 
 import contextlib
+import types
+from collections.abc import Mapping, Sequence
+from dataclasses import Field, field, fields, make_dataclass
 from datetime import datetime
-from typing import TYPE_CHECKING, Any, Optional, cast
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    ClassVar,
+    Optional,
+    TypeVar,
+    Union,
+    cast,
+    get_args,
+    get_origin,
+    get_type_hints,
+)
 
 import dataclasses_json
 import dateutil.parser
 
+from .decoders import model_decoder
+from .encoders import model_encoder
 from .ref import REF_SENTINEL_KEY, Ref, ResultReference
 
 if TYPE_CHECKING:
     from .methods import Invocation  # pragma: no cover
 
+ModelType = TypeVar("ModelType", bound="Model")
+SlottedModelType = TypeVar("SlottedModelType", bound="SlottedModel")
+
 
 def datetime_encode(dt: datetime) -> str:
     return f"{dt.replace(tzinfo=None).isoformat()}Z"
@@ -33,7 +52,16 @@ class ModelToDictPostprocessor:
         self,
         data: dict[str, dataclasses_json.core.Json],
     ) -> dict[str, dataclasses_json.core.Json]:
-        for key in [key for key in data.keys() if not key.startswith("#")]:
+        return self.postprocess_keys(
+            data, [key for key in data.keys() if not key.startswith("#")]
+        )
+
+    def postprocess_keys(
+        self,
+        data: dict[str, dataclasses_json.core.Json],
+        keys: list[str],
+    ) -> dict[str, dataclasses_json.core.Json]:
+        for key in keys:
             value = data[key]
             if isinstance(value, dict):
                 if REF_SENTINEL_KEY in value:
@@ -71,6 +99,12 @@ class ModelToDictPostprocessor:
             result_of=self.method_calls_slice[ref_target].id,
         )
 
+    def encode_result_reference(
+        self, ref: Union[Ref, ResultReference]
+    ) -> dict[str, dataclasses_json.core.Json]:
+        rr = self.ref_to_result_reference(ref) if isinstance(ref, Ref) else ref
+        return dict(name=rr.name, path=rr.path, resultOf=rr.result_of)
+
     def fix_result_reference(
         self,
         data: dict[str, dataclasses_json.core.Json],
@@ -111,7 +145,7 @@ class ModelToDictPostprocessor:
 
 
 class Model(dataclasses_json.DataClassJsonMixin):
-    dataclass_json_config = dataclasses_json.config(
+    dataclass_json_config: Optional[dict] = dataclasses_json.config(
         letter_case=dataclasses_json.LetterCase.CAMEL,
         undefined=dataclasses_json.Undefined.EXCLUDE,
         exclude=lambda f: f is None,
@@ -127,4 +161,183 @@ class Model(dataclasses_json.DataClassJsonMixin):
         if account_id:
             self.account_id: Optional[str] = account_id
         todict = ModelToDictPostprocessor(method_calls_slice)
-        return todict.postprocess(super().to_dict(*args, **kwargs))
+        # Only the default encode_json=False output is precompiled
+        if args or any(kwargs.values()):
+            return todict.postprocess(super().to_dict(*args, **kwargs))
+        return cast(
+            dict[str, dataclasses_json.core.Json],
+            model_encoder(type(self))(self, todict),
+        )
+
+    @classmethod
+    def from_dict(
+        cls: type[ModelType],
+        kvs: dataclasses_json.core.Json,
+        *,
+        infer_missing: bool = False,
+    ) -> ModelType:
+        if infer_missing:
+            return super().from_dict(kvs, infer_missing=infer_missing)
+        return cast(ModelType, model_decoder(cls)(kvs))
+
+
+class SlottedModel:
+    # Base for the compact variants of models created by slotted_models().
+    # dataclasses_json's mixin has no __slots__, so serialization is
+    # provided here directly by the precompiled encoders and decoders.
+    __slots__ = ()
+    dataclass_json_config: Optional[dict] = Model.dataclass_json_config
+    # Maps models to their variants, for the models converted together
+    _variants: ClassVar[dict[type, type[SlottedModel]]] = {}
+
+    def to_dict(
+        self,
+        *args: Any,
+        account_id: Optional[str] = None,
+        method_calls_slice: Optional[list[Invocation]] = None,
+        **kwargs: Any,
+    ) -> dict[str, dataclasses_json.core.Json]:
+        todict = ModelToDictPostprocessor(method_calls_slice)
+        if args or any(kwargs.values()):
+            return todict.postprocess(
+                dataclasses_json.core._asdict(self, *args, **kwargs)
+            )
+        return cast(
+            dict[str, dataclasses_json.core.Json],
+            model_encoder(type(self))(self, todict),
+        )
+
+    @classmethod
+    def from_dict(
+        cls: type[SlottedModelType],
+        kvs: dataclasses_json.core.Json,
+        *,
+        infer_missing: bool = False,
+    ) -> SlottedModelType:
+        if infer_missing:
+            return cast(
+                SlottedModelType,
+                dataclasses_json.core._decode_dataclass(
+                    cls, kvs, infer_missing
+                ),
+            )
+        return cast(SlottedModelType, model_decoder(cls)(kvs))
+
+    @classmethod
+    def from_model(
+        cls: type[SlottedModelType], model: Model
+    ) -> SlottedModelType:
+        return cls(
+            **{
+                f.name: cls._convert(getattr(model, f.name))
+                for f in fields(cast(Any, cls))
+            }
+        )
+
+    @classmethod
+    def _convert(cls, value: Any) -> Any:
+        variant = cls._variants.get(type(value))
+        if variant:
+            return variant.from_model(value)
+        if isinstance(value, list):
+            return [cls._convert(v) for v in value]
+        if isinstance(value, dict):
+            return {k: cls._convert(v) for k, v in value.items()}
+        return value
+
+    # Frozen instances can't be restored with setattr
+    def __getstate__(self) -> list[Any]:
+        return [getattr(self, f.name) for f in fields(cast(Any, self))]
+
+    def __setstate__(self, state: list[Any]) -> None:
+        for f, value in zip(fields(cast(Any, self)), state):
+            object.__setattr__(self, f.name, value)
+
+
+def slotted_models(
+    models: Sequence[type[Model]],
+    module: str,
+    prefix: str,
+    frozen: bool = False,
+) -> list[type[SlottedModel]]:
+    # Creates variants of models with __slots__ and the same fields, which
+    # use much less memory per instance. Model types of fields are replaced
+    # with their variants.
+    variants: dict[type, type[SlottedModel]] = {}
+    for model in models:
+        variants[model] = _slotted_model(
+            model, module, f"{prefix}{model.__name__}", frozen, variants
+        )
+    for model, variant in variants.items():
+        hints = get_type_hints(model)
+        variant.__annotations__ = {
+            name: _replace_types(hints[name], variants)
+            for name in variant.__annotations__
+        }
+        for f in fields(cast(Any, variant)):
+            f.type = variant.__annotations__[f.name]
+    return [variants[model] for model in models]
+
+
+def _slotted_model(
+    model: type[Model],
+    module: str,
+    name: str,
+    frozen: bool,
+    variants: dict[type, type[SlottedModel]],
+) -> type[SlottedModel]:
+    model_fields: list[tuple[str, Any, Field[Any]]] = [
+        (
+            f.name,
+            f.type,
+            cast(
+                "Field[Any]",
+                field(
+                    default=f.default,
+                    default_factory=f.default_factory,
+                    metadata=f.metadata,
+                ),
+            ),
+        )
+        for f in fields(cast(Any, model))
+        if f.init
+    ]
+    namespace: dict[str, Any] = {"_variants": variants}
+    if frozen:
+        # Frozen variants only prevent reassigning fields. Field values such
+        # as dicts and lists can still be changed, so they aren't hashable.
+        namespace["__hash__"] = None
+    cls = make_dataclass(
+        name,
+        model_fields,
+        bases=(SlottedModel,),
+        namespace=namespace,
+        frozen=frozen,
+    )
+    # dataclass(slots=True) requires Python 3.10
+    names = tuple(f.name for f in fields(cls))
+    namespace = {
+        k: v
+        for k, v in cls.__dict__.items()
+        if k not in names and k not in ("__dict__", "__weakref__")
+    }
+    namespace["__slots__"] = names
+    # Variants are pickled by reference to their module attributes
+    namespace["__module__"] = module
+    namespace["__qualname__"] = name
+    return cast(type[SlottedModel], type(cls)(name, cls.__bases__, namespace))
+
+
+def _replace_types(type_: Any, replacements: Mapping[type, type]) -> Any:
+    replacement = replacements.get(type_)
+    if replacement:
+        return replacement
+    args = get_args(type_)
+    if not args:
+        return type_
+    new_args = tuple(_replace_types(a, replacements) for a in args)
+    if get_origin(type_) is Union:
+        return Union[new_args]
+    if isinstance(type_, types.GenericAlias):
+        return types.GenericAlias(get_origin(type_), new_args)
+    return type_.copy_with(new_args)
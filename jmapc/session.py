@@ -8,6 +8,12 @@ from . import constants
 from .serializer import Model
 
 
+def session_url(host: str) -> str:
+    # Hosts may include a URL scheme, such as for local test servers
+    base_url = host if "://" in host else f"https://{host}"
+    return f"{base_url}/.well-known/jmap"
+
+
 @dataclass
 class Session(Model):
     username: str
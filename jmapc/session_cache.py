@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import tempfile
+from pathlib import Path
+from typing import Any, Optional, Protocol, Union
+
+from .auth import RequestsAuth, auth_identity
+from .session import session_url
+
+
+class SessionCache(Protocol):
+    # Random key for deriving cache keys from credentials, kept with the
+    # cached sessions
+    def secret(self) -> bytes: ...
+
+    def get(self, key: str) -> Optional[dict[str, Any]]: ...
+
+    def set(self, key: str, data: dict[str, Any]) -> None: ...
+
+    def delete(self, key: str) -> None: ...
+
+
+def session_cache_key(
+    host: str, auth: Optional[RequestsAuth], secret: bytes
+) -> Optional[str]:
+    # Sessions are per user, so the key includes a keyed digest of the
+    # credentials rather than the credentials themselves. Sessions are not
+    # cached without credentials to tell users apart.
+    identity = auth_identity(auth, session_url(host))
+    if not identity:
+        return None
+    return hmac.new(
+        secret, f"{host}\0{identity}".encode(), hashlib.sha256
+    ).hexdigest()
+
+
+class MemorySessionCache:
+    def __init__(self) -> None:
+        self._sessions: dict[str, dict[str, Any]] = {}
+        self._secret = secrets.token_bytes(32)
+
+    def secret(self) -> bytes:
+        return self._secret
+
+    def get(self, key: str) -> Optional[dict[str, Any]]:
+        return self._sessions.get(key)
+
+    def set(self, key: str, data: dict[str, Any]) -> None:
+        self._sessions[key] = data
+
+    def delete(self, key: str) -> None:
+        self._sessions.pop(key, None)
+
+
+class FileSessionCache:
+    def __init__(self, directory: Union[str, Path, None] = None) -> None:
+        self.directory = (
+            Path(directory)
+            if directory
+            else Path(
+                os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+            )
+            / "jmapc"
+            / "sessions"
+        )
+        self._secret: Optional[bytes] = None
+
+    def secret(self) -> bytes:
+        if self._secret is None:
+            self._secret = self._load_secret()
+        return self._secret
+
+    def _load_secret(self) -> bytes:
+        path = self.directory / "secret.key"
+        if path.exists():
+            return path.read_bytes()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # The key is written to a temporary file and linked into place, so
+        # concurrent writers agree on one key and readers never see a
+        # partially written key
+        fd, temp_name = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(secrets.token_bytes(32))
+            os.link(temp_name, path)
+        except FileExistsError:
+            pass
+        finally:
+            Path(temp_name).unlink(missing_ok=True)
+        return path.read_bytes()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.json"
+
+    def get(self, key: str) -> Optional[dict[str, Any]]:
+        try:
+            data = json.loads(self._path(key).read_text())
+        except (OSError, ValueError):
+            return None
+        return data if isinstance(data, dict) else None
+
+    def set(self, key: str, data: dict[str, Any]) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary file first so concurrent readers never see a
+        # partially written session
+        fd, temp_name = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(data, f)
+            os.replace(temp_name, self._path(key))
+        except BaseException:
+            Path(temp_name).unlink(missing_ok=True)
+            raise
+
+    def delete(self, key: str) -> None:
+        self._path(key).unlink(missing_ok=True)
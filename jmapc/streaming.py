@@ -0,0 +1,191 @@
+from __future__ import annotations
+
+import codecs
+import functools
+import json
+from collections.abc import Generator
+from dataclasses import fields
+from typing import Any, Callable, get_args, get_type_hints
+
+from dataclasses_json.core import _user_overrides_or_exts
+
+from .methods import Response
+from .planner import MethodResponse
+from .serializer import Model
+
+STREAM_CHUNK_SIZE = 64 * 1024
+JSON_WHITESPACE = " \t\n\r"
+
+ParserState = Generator[None, None, Any]
+
+
+class StreamingResponseParser:
+    # Parses a JMAP API response as it is received. Items of each method
+    # response "list" argument are returned as soon as they are complete, so
+    # only one item at a time is held in memory rather than the whole
+    # response. Parsing steps are generators which yield when they need more
+    # data, and are resumed by feed().
+    def __init__(self) -> None:
+        self.method_responses: list[MethodResponse] = []
+        self.data: dict[str, Any] = {}
+        self._items: list[tuple[str, Any]] = []
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+        self._done = False
+        self._text_decoder = codecs.getincrementaldecoder("utf-8")()
+        self._json_decoder = json.JSONDecoder()
+        self._parser = self._parse_response()
+        next(self._parser)
+
+    @property
+    def response(self) -> dict[str, Any]:
+        return dict(self.data, methodResponses=self.method_responses)
+
+    def feed(self, chunk: bytes) -> list[tuple[str, Any]]:
+        # Drop parsed data before buffering more
+        remaining = self._buffer[self._pos:]  # fmt: skip
+        self._buffer = remaining + self._text_decoder.decode(chunk)
+        self._pos = 0
+        return self._resume()
+
+    def close(self) -> list[tuple[str, Any]]:
+        self._buffer += self._text_decoder.decode(b"", final=True)
+        self._eof = True
+        items = self._resume()
+        if not self._done:
+            raise ValueError("Incomplete JMAP response")
+        return items
+
+    def _resume(self) -> list[tuple[str, Any]]:
+        if not self._done:
+            try:
+                next(self._parser)
+            except StopIteration:
+                self._done = True
+        items, self._items = self._items, []
+        return items
+
+    def _skip_whitespace(self) -> ParserState:
+        while True:
+            while (
+                self._pos < len(self._buffer)
+                and self._buffer[self._pos] in JSON_WHITESPACE
+            ):
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return
+            if self._eof:
+                raise ValueError("Unexpected end of JMAP response")
+            yield
+
+    def _expect(self, chars: str) -> ParserState:
+        yield from self._skip_whitespace()
+        char = self._buffer[self._pos]
+        if char not in chars:
+            raise ValueError(
+                f'Unexpected "{char}" in JMAP response, expected one of'
+                f' "{chars}"'
+            )
+        self._pos += 1
+        return char
+
+    def _value(self) -> ParserState:
+        yield from self._skip_whitespace()
+        min_length = 0
+        while True:
+            available = len(self._buffer) - self._pos
+            if available >= min_length or self._eof:
+                try:
+                    value, end = self._json_decoder.raw_decode(
+                        self._buffer, self._pos
+                    )
+                except json.JSONDecodeError:
+                    if self._eof:
+                        raise
+                else:
+                    # A number at the end of the buffer may continue in the
+                    # next chunk
+                    if end < len(self._buffer) or self._eof:
+                        self._pos = end
+                        return value
+                # Large values are only decoded again once the available data
+                # has doubled, rather than after every chunk
+                min_length = available * 2
+            yield
+
+    def _object(
+        self, read_member: Callable[[str], ParserState]
+    ) -> ParserState:
+        yield from self._expect("{")
+        yield from self._skip_whitespace()
+        if self._buffer[self._pos] == "}":
+            self._pos += 1
+            return
+        while True:
+            key = yield from self._value()
+            yield from self._expect(":")
+            yield from read_member(key)
+            if (yield from self._expect(",}")) == "}":
+                return
+
+    def _array(self, read_element: Callable[[], ParserState]) -> ParserState:
+        yield from self._expect("[")
+        yield from self._skip_whitespace()
+        if self._buffer[self._pos] == "]":
+            self._pos += 1
+            return
+        while True:
+            yield from read_element()
+            if (yield from self._expect(",]")) == "]":
+                return
+
+    def _parse_response(self) -> ParserState:
+        yield from self._object(self._response_member)
+
+    def _response_member(self, key: str) -> ParserState:
+        if key == "methodResponses":
+            yield from self._array(self._method_response)
+        else:
+            self.data[key] = yield from self._value()
+
+    def _method_response(self) -> ParserState:
+        yield from self._expect("[")
+        name = yield from self._value()
+        yield from self._expect(",")
+        args: dict[str, Any] = {}
+
+        def _list_item() -> ParserState:
+            item = yield from self._value()
+            self._items.append((name, item))
+
+        def _argument(key: str) -> ParserState:
+            if key == "list" and name != "error":
+                yield from self._array(_list_item)
+            else:
+                args[key] = yield from self._value()
+
+        yield from self._object(_argument)
+        yield from self._expect(",")
+        call_id = yield from self._value()
+        yield from self._expect("]")
+        self.method_responses.append((name, args, call_id))
+
+
+@functools.lru_cache(maxsize=None)
+def list_item_decoder(method_name: str) -> Callable[[Any], Any]:
+    # Items are decoded as the model type of the response "list" field, if
+    # the method response type is known
+    response_type = Response.response_types.get(method_name)
+    if response_type:
+        overrides = _user_overrides_or_exts(response_type)
+        for f in fields(response_type):
+            letter_case = overrides[f.name].letter_case
+            if (letter_case(f.name) if letter_case else f.name) != "list":
+                continue
+            item_type = next(
+                iter(get_args(get_type_hints(response_type)[f.name])), None
+            )
+            if isinstance(item_type, type) and issubclass(item_type, Model):
+                return item_type.from_dict
+    return lambda item: item
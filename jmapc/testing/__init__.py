@@ -0,0 +1,9 @@
+from .server import JMAPServer, ServerStats
+from .store import JMAPStore, MethodError
+
+__all__ = [
+    "JMAPServer",
+    "JMAPStore",
+    "MethodError",
+    "ServerStats",
+]
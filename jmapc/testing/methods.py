@@ -0,0 +1,516 @@
+from __future__ import annotations
+
+import itertools
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional
+
+from .store import JMAPStore, MethodError, match_filter, parse_utc_date
+
+MethodResponse = tuple[str, dict[str, Any], str]
+
+EMAIL_SORT_KEYS: dict[str, Callable[[dict[str, Any]], Any]] = {
+    "receivedAt": lambda e: e.get("receivedAt") or "",
+    "sentAt": lambda e: e.get("sentAt") or "",
+    "size": lambda e: e.get("size") or 0,
+    "subject": lambda e: (e.get("subject") or "").lower(),
+    "from": lambda e: _addresses(e.get("from")),
+    "to": lambda e: _addresses(e.get("to")),
+}
+MAILBOX_SORT_KEYS: dict[str, Callable[[dict[str, Any]], Any]] = {
+    "name": lambda m: m.get("name") or "",
+    "sortOrder": lambda m: m.get("sortOrder") or 0,
+}
+
+
+def _addresses(addresses: Optional[list[dict[str, Any]]]) -> str:
+    return " ".join(
+        f"{a.get('name') or ''} <{a.get('email') or ''}>"
+        for a in addresses or []
+    ).lower()
+
+
+def evaluate_pointer(value: Any, path: str) -> Any:
+    # Result reference paths may use "*" to map over arrays, per RFC 8620
+    # section 3.7
+    if not path:
+        return value
+    if not path.startswith("/"):
+        raise MethodError("invalidResultReference", f"Invalid path {path}")
+    segment, _, rest = path[1:].partition("/")
+    rest = f"/{rest}" if rest else ""
+    segment = segment.replace("~1", "/").replace("~0", "~")
+    if isinstance(value, list):
+        if segment == "*":
+            results = []
+            for item in value:
+                result = evaluate_pointer(item, rest)
+                results += result if isinstance(result, list) else [result]
+            return results
+        if segment.isdigit() and int(segment) < len(value):
+            return evaluate_pointer(value[int(segment)], rest)
+    elif isinstance(value, dict) and segment in value:
+        return evaluate_pointer(value[segment], rest)
+    raise MethodError("invalidResultReference", f"Path {path} not found")
+
+
+def match_email_condition(email: dict[str, Any], key: str, value: Any) -> bool:
+    mailbox_ids = email.get("mailboxIds") or {}
+    keywords = email.get("keywords") or {}
+    if key == "inMailbox":
+        return value in mailbox_ids
+    if key == "inMailboxOtherThan":
+        return any(m not in value for m in mailbox_ids)
+    if key == "before":
+        return parse_utc_date(email["receivedAt"]) < parse_utc_date(value)
+    if key == "after":
+        return parse_utc_date(email["receivedAt"]) >= parse_utc_date(value)
+    if key == "minSize":
+        return int(email.get("size") or 0) >= int(value)
+    if key == "maxSize":
+        return int(email.get("size") or 0) < int(value)
+    if key == "hasKeyword":
+        return bool(keywords.get(value))
+    if key == "notKeyword":
+        return not keywords.get(value)
+    if key == "hasAttachment":
+        return bool(email.get("hasAttachment")) is bool(value)
+    if key in ("from", "to"):
+        return value.lower() in _addresses(email.get(key))
+    if key == "subject":
+        return value.lower() in (email.get("subject") or "").lower()
+    if key == "text":
+        return any(
+            value.lower() in text
+            for text in (
+                (email.get("subject") or "").lower(),
+                (email.get("preview") or "").lower(),
+                _addresses(email.get("from")),
+                _addresses(email.get("to")),
+            )
+        )
+    raise MethodError("unsupportedFilter", f"Unsupported filter {key}")
+
+
+def match_mailbox_condition(
+    mailbox: dict[str, Any], key: str, value: Any
+) -> bool:
+    if key in ("parentId", "role", "isSubscribed"):
+        matches: bool = mailbox.get(key) == value
+        return matches
+    if key == "name":
+        return value.lower() in (mailbox.get("name") or "").lower()
+    if key == "hasAnyRole":
+        return (mailbox.get("role") is not None) is bool(value)
+    raise MethodError("unsupportedFilter", f"Unsupported filter {key}")
+
+
+def sort_items(
+    items: Iterable[dict[str, Any]],
+    sort: list[dict[str, Any]],
+    sort_keys: dict[str, Callable[[dict[str, Any]], Any]],
+) -> list[dict[str, Any]]:
+    result = list(items)
+    # Sorts are stable, so the last comparator is applied first
+    for comparator in reversed(sort):
+        key = sort_keys.get(comparator["property"])
+        if not key:
+            raise MethodError(
+                "unsupportedSort", f"Unsupported sort {comparator['property']}"
+            )
+        result.sort(key=key, reverse=not comparator.get("isAscending", True))
+    return result
+
+
+@dataclass
+class SetResult:
+    created: dict[str, Any] = field(default_factory=dict)
+    updated: dict[str, Any] = field(default_factory=dict)
+    destroyed: list[str] = field(default_factory=list)
+    not_created: dict[str, Any] = field(default_factory=dict)
+    not_updated: dict[str, Any] = field(default_factory=dict)
+    not_destroyed: dict[str, Any] = field(default_factory=dict)
+
+    def to_dict(self) -> dict[str, Any]:
+        # Empty results are null rather than empty
+        return {
+            "created": self.created or None,
+            "updated": self.updated or None,
+            "destroyed": self.destroyed or None,
+            "notCreated": self.not_created or None,
+            "notUpdated": self.not_updated or None,
+            "notDestroyed": self.not_destroyed or None,
+        }
+
+
+class JMAPMethods:
+    # Handles the method calls of a single API request
+    def __init__(
+        self,
+        store: JMAPStore,
+        max_objects_in_get: int,
+        max_objects_in_set: int,
+    ) -> None:
+        self.store = store
+        self.max_objects_in_get = max_objects_in_get
+        self.max_objects_in_set = max_objects_in_set
+        self.created_ids: dict[str, str] = {}
+        self.handlers: dict[
+            str, Callable[[dict[str, Any]], dict[str, Any]]
+        ] = {
+            "Core/echo": self.core_echo,
+            "Mailbox/get": self.mailbox_get,
+            "Mailbox/changes": self.mailbox_changes,
+            "Mailbox/query": self.mailbox_query,
+            "Mailbox/set": self.mailbox_set,
+            "Email/get": self.email_get,
+            "Email/changes": self.email_changes,
+            "Email/query": self.email_query,
+            "Email/set": self.email_set,
+            "Thread/get": self.thread_get,
+            "Thread/changes": self.thread_changes,
+        }
+
+    def call(
+        self, method_call: list[Any], responses: list[MethodResponse]
+    ) -> MethodResponse:
+        name, args, call_id = method_call
+        try:
+            handler = self.handlers.get(name)
+            if not handler:
+                raise MethodError("unknownMethod")
+            args = self.resolve_references(args, responses)
+            if name != "Core/echo" and args.get("accountId") != (
+                self.store.account_id
+            ):
+                raise MethodError("accountNotFound")
+            return (name, handler(args), call_id)
+        except MethodError as e:
+            return ("error", e.to_dict(), call_id)
+
+    def resolve_references(
+        self, value: Any, responses: list[MethodResponse]
+    ) -> Any:
+        # jmapc also sends references within filters, so they are resolved
+        # at any depth. Creation IDs used as update keys are not references.
+        if isinstance(value, list):
+            return [self.resolve_references(v, responses) for v in value]
+        if not isinstance(value, dict):
+            return value
+        resolved = {}
+        for key, item in value.items():
+            if (
+                key.startswith("#")
+                and isinstance(item, dict)
+                and "resultOf" in item
+            ):
+                response = next(
+                    (r for r in responses if r[2] == item.get("resultOf")),
+                    None,
+                )
+                if not response or response[0] != item.get("name"):
+                    raise MethodError(
+                        "invalidResultReference",
+                        f"No {item.get('name')} response for"
+                        f" {item.get('resultOf')}",
+                    )
+                resolved[key[1:]] = evaluate_pointer(
+                    response[1], item.get("path", "")
+                )
+            else:
+                resolved[key] = self.resolve_references(item, responses)
+        return resolved
+
+    def resolve_id(self, id: str) -> str:
+        # Creation IDs from earlier calls in the request may be referenced
+        if id.startswith("#"):
+            if id[1:] not in self.created_ids:
+                raise MethodError("notFound", f"Unknown creation ID {id}")
+            return self.created_ids[id[1:]]
+        return id
+
+    def core_echo(self, args: dict[str, Any]) -> dict[str, Any]:
+        return args
+
+    def _get(
+        self,
+        data_type: str,
+        args: dict[str, Any],
+        lookup: Callable[[str], Optional[dict[str, Any]]],
+        all_items: Callable[[], Iterator[dict[str, Any]]],
+    ) -> dict[str, Any]:
+        ids = args.get("ids")
+        if ids is None:
+            items = list(
+                itertools.islice(all_items(), self.max_objects_in_get + 1)
+            )
+            ids = [item["id"] for item in items]
+        if len(ids) > self.max_objects_in_get:
+            raise MethodError("requestTooLarge")
+        found = []
+        not_found = []
+        properties = args.get("properties")
+        for id in ids:
+            item = lookup(self.resolve_id(id))
+            if not item:
+                not_found.append(id)
+            elif properties is not None:
+                found.append(
+                    {"id": item["id"], **{p: item.get(p) for p in properties}}
+                )
+            else:
+                found.append(item)
+        return {
+            "accountId": self.store.account_id,
+            "state": self.store.state(data_type),
+            "list": found,
+            "notFound": not_found,
+        }
+
+    def _changes(self, data_type: str, args: dict[str, Any]) -> dict[str, Any]:
+        return {
+            "accountId": self.store.account_id,
+            **self.store.changes[data_type].since(
+                str(args.get("sinceState")), args.get("maxChanges")
+            ),
+        }
+
+    def _query(
+        self, data_type: str, args: dict[str, Any], ids: Iterator[str]
+    ) -> dict[str, Any]:
+        position = args.get("position") or 0
+        limit = args.get("limit")
+        if position < 0 or (limit is not None and limit < 0):
+            raise MethodError("invalidArguments", "Invalid position or limit")
+        if args.get("anchor"):
+            raise MethodError("invalidArguments", "Anchors are not supported")
+        end = position + limit if limit is not None else None
+        response: dict[str, Any] = {
+            "accountId": self.store.account_id,
+            "queryState": self.store.state(data_type),
+            "canCalculateChanges": False,
+            "position": position,
+        }
+        if args.get("calculateTotal"):
+            all_ids = list(ids)
+            response["ids"] = all_ids[position:end]
+            response["total"] = len(all_ids)
+        else:
+            response["ids"] = list(itertools.islice(ids, position, end))
+        if limit is not None:
+            response["limit"] = limit
+        return response
+
+    def _set_response(
+        self, data_type: str, old_state: str, result: SetResult
+    ) -> dict[str, Any]:
+        return {
+            "accountId": self.store.account_id,
+            "oldState": old_state,
+            "newState": self.store.state(data_type),
+            **result.to_dict(),
+        }
+
+    def _check_set_size(self, args: dict[str, Any]) -> None:
+        size = sum(
+            len(args.get(key) or ()) for key in ("create", "update", "destroy")
+        )
+        if size > self.max_objects_in_set:
+            raise MethodError("requestTooLarge")
+
+    def _check_state(self, data_type: str, args: dict[str, Any]) -> str:
+        state = self.store.state(data_type)
+        if args.get("ifInState") not in (None, state):
+            raise MethodError("stateMismatch")
+        return state
+
+    # Mailbox methods
+
+    def mailbox_get(self, args: dict[str, Any]) -> dict[str, Any]:
+        return self._get(
+            "Mailbox",
+            args,
+            self.store.mailbox,
+            lambda: filter(
+                None, map(self.store.mailbox, self.store.mailboxes)
+            ),
+        )
+
+    def mailbox_changes(self, args: dict[str, Any]) -> dict[str, Any]:
+        return dict(self._changes("Mailbox", args), updatedProperties=None)
+
+    def mailbox_query(self, args: dict[str, Any]) -> dict[str, Any]:
+        mailboxes = sort_items(
+            filter(None, map(self.store.mailbox, self.store.mailboxes)),
+            args.get("sort") or [],
+            MAILBOX_SORT_KEYS,
+        )
+        return self._query(
+            "Mailbox",
+            args,
+            (
+                m["id"]
+                for m in mailboxes
+                if match_filter(m, args.get("filter"), match_mailbox_condition)
+            ),
+        )
+
+    def mailbox_set(self, args: dict[str, Any]) -> dict[str, Any]:
+        store = self.store
+        self._check_set_size(args)
+        old_state = self._check_state("Mailbox", args)
+        result = SetResult()
+        changes: list[tuple[str, str]] = []
+        for creation_id, data in (args.get("create") or {}).items():
+            if not data.get("name"):
+                result.not_created[creation_id] = MethodError(
+                    "invalidProperties", "name is required"
+                ).to_dict()
+                continue
+            if data.get("parentId"):
+                data = dict(data, parentId=self.resolve_id(data["parentId"]))
+            mailbox = store.create_mailbox(data)
+            self.created_ids[creation_id] = mailbox["id"]
+            result.created[creation_id] = {"id": mailbox["id"]}
+            changes.append(("created", mailbox["id"]))
+        for id, patch in (args.get("update") or {}).items():
+            mailbox_id = self.resolve_id(id)
+            if mailbox_id not in store.mailboxes:
+                result.not_updated[id] = MethodError("notFound").to_dict()
+                continue
+            store.mailboxes[mailbox_id].update(patch)
+            result.updated[id] = None
+            changes.append(("updated", mailbox_id))
+        for id in args.get("destroy") or []:
+            mailbox_id = self.resolve_id(id)
+            existing = store.mailbox(mailbox_id)
+            if not existing:
+                result.not_destroyed[id] = MethodError("notFound").to_dict()
+            elif any(
+                m["parentId"] == mailbox_id for m in store.mailboxes.values()
+            ):
+                result.not_destroyed[id] = MethodError(
+                    "mailboxHasChild"
+                ).to_dict()
+            elif existing["totalEmails"]:
+                result.not_destroyed[id] = MethodError(
+                    "mailboxHasEmail"
+                ).to_dict()
+            else:
+                del store.mailboxes[mailbox_id]
+                result.destroyed.append(id)
+                changes.append(("destroyed", mailbox_id))
+        store.record_changes("Mailbox", changes)
+        return self._set_response("Mailbox", old_state, result)
+
+    # Email methods
+
+    def email_get(self, args: dict[str, Any]) -> dict[str, Any]:
+        return self._get("Email", args, self.store.email, self.store.emails)
+
+    def email_changes(self, args: dict[str, Any]) -> dict[str, Any]:
+        return self._changes("Email", args)
+
+    def email_query(self, args: dict[str, Any]) -> dict[str, Any]:
+        sort = args.get("sort") or []
+        query_filter = args.get("filter")
+        if not sort or [c["property"] for c in sort] == ["receivedAt"]:
+            # Emails are already stored in receivedAt order
+            ascending = bool(sort and sort[0].get("isAscending", True))
+            if not query_filter:
+                # Unfiltered queries are answered without loading emails
+                return self._query(
+                    "Email", args, self.store.email_ids(ascending)
+                )
+            emails: Iterable[dict[str, Any]] = self.store.emails(ascending)
+        else:
+            emails = sort_items(self.store.emails(), sort, EMAIL_SORT_KEYS)
+        return self._query(
+            "Email",
+            args,
+            (
+                e["id"]
+                for e in emails
+                if match_filter(e, query_filter, match_email_condition)
+            ),
+        )
+
+    def email_set(self, args: dict[str, Any]) -> dict[str, Any]:
+        store = self.store
+        self._check_set_size(args)
+        old_state = self._check_state("Email", args)
+        result = SetResult()
+        changes: list[tuple[str, str]] = []
+        thread_changes: list[tuple[str, str]] = []
+        mailbox_ids: set[str] = set()
+        for creation_id, data in (args.get("create") or {}).items():
+            try:
+                email = store.create_email(
+                    dict(
+                        data,
+                        mailboxIds={
+                            self.resolve_id(m): v
+                            for m, v in (data.get("mailboxIds") or {}).items()
+                        },
+                    )
+                )
+            except MethodError as e:
+                result.not_created[creation_id] = e.to_dict()
+                continue
+            self.created_ids[creation_id] = email["id"]
+            result.created[creation_id] = {
+                k: email[k] for k in ("id", "blobId", "threadId", "size")
+            }
+            changes.append(("created", email["id"]))
+            thread_changes.append(("created", email["threadId"]))
+            mailbox_ids.update(email["mailboxIds"])
+        for id, patch in (args.get("update") or {}).items():
+            try:
+                email_id = self.resolve_id(id)
+                before = store.email(email_id) or {}
+                store.update_email(email_id, patch)
+            except MethodError as e:
+                result.not_updated[id] = e.to_dict()
+                continue
+            result.updated[id] = None
+            changes.append(("updated", email_id))
+            mailbox_ids.update(before["mailboxIds"])
+            mailbox_ids.update((store.email(email_id) or {})["mailboxIds"])
+        for id in args.get("destroy") or []:
+            try:
+                email = store.destroy_email(self.resolve_id(id))
+            except MethodError as e:
+                result.not_destroyed[id] = e.to_dict()
+                continue
+            result.destroyed.append(id)
+            changes.append(("destroyed", email["id"]))
+            thread_changes.append(
+                (
+                    (
+                        "updated"
+                        if store.thread(email["threadId"])
+                        else "destroyed"
+                    ),
+                    email["threadId"],
+                )
+            )
+            mailbox_ids.update(email["mailboxIds"])
+        store.record_changes("Email", changes)
+        store.record_changes("Thread", thread_changes)
+        store.record_changes(
+            "Mailbox",
+            [
+                ("updated", m)
+                for m in sorted(mailbox_ids)
+                if m in store.mailboxes
+            ],
+        )
+        return self._set_response("Email", old_state, result)
+
+    # Thread methods
+
+    def thread_get(self, args: dict[str, Any]) -> dict[str, Any]:
+        return self._get("Thread", args, self.store.thread, self.store.threads)
+
+    def thread_changes(self, args: dict[str, Any]) -> dict[str, Any]:
+        return self._changes("Thread", args)
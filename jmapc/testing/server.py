@@ -0,0 +1,513 @@
+from __future__ import annotations
+
+import json
+import re
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import TracebackType
+from typing import Any, Optional
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from .. import constants
+from ..logging import log
+from .methods import JMAPMethods, MethodResponse
+from .store import DATA_TYPES, JMAPStore
+
+SESSION_STATE = "jmapc-test-server"
+DEFAULT_CORE_CAPABILITIES: dict[str, Any] = {
+    "maxSizeUpload": 50_000_000,
+    "maxConcurrentUpload": 4,
+    "maxSizeRequest": 10_000_000,
+    "maxConcurrentRequests": 4,
+    "maxCallsInRequest": 16,
+    "maxObjectsInGet": 500,
+    "maxObjectsInSet": 500,
+    "collationAlgorithms": ["i;ascii-numeric", "i;ascii-casemap", "i;octet"],
+}
+MAIL_CAPABILITIES: dict[str, Any] = {
+    "maxMailboxesPerEmail": None,
+    "maxMailboxDepth": None,
+    "maxSizeMailboxName": 490,
+    "maxSizeAttachmentsPerEmail": 50_000_000,
+    "emailQuerySortOptions": ["receivedAt", "sentAt", "size", "subject"],
+    "mayCreateTopLevelMailbox": True,
+}
+EVENT_POLL_INTERVAL = 0.25
+SHUTDOWN_POLL_INTERVAL = 0.05
+
+DOWNLOAD_PATH = re.compile(r"^/download/([^/]+)/([^/]+)/([^/]*)$")
+UPLOAD_PATH = re.compile(r"^/upload/([^/]+)/$")
+EVENTS_PATH = re.compile(r"^/events/([^/]+)/([^/]+)/([^/]+)$")
+RANGE_HEADER = re.compile(r"^bytes=(\d*)-(\d*)$")
+# Session capabilities limiting concurrent requests to each endpoint
+CONCURRENCY_LIMITS = {
+    "api": "maxConcurrentRequests",
+    "upload": "maxConcurrentUpload",
+}
+
+
+class RequestError(Exception):
+    # Request level errors are returned as RFC 7807 problem details
+    def __init__(self, status: int, type: str, detail: str = ""):
+        super().__init__(status, type, detail)
+        self.status = status
+        self.type = type
+        self.detail = detail
+
+    def __str__(self) -> str:
+        return self.detail or self.type
+
+
+@dataclass
+class ServerStats:
+    connections: int = 0
+    active_requests: int = 0
+    max_active_requests: int = 0
+    requests: Counter[str] = field(default_factory=Counter)
+    rejected_requests: Counter[str] = field(default_factory=Counter)
+    method_calls: Counter[str] = field(default_factory=Counter)
+    _active: Counter[str] = field(
+        default_factory=Counter, init=False, repr=False
+    )
+    _lock: threading.Lock = field(
+        default_factory=threading.Lock, init=False, repr=False
+    )
+
+    def connection(self) -> None:
+        with self._lock:
+            self.connections += 1
+
+    def request_started(
+        self, endpoint: str, limit: Optional[int] = None
+    ) -> bool:
+        # Returns False if the endpoint already has limit active requests
+        with self._lock:
+            self.requests[endpoint] += 1
+            if limit is not None and self._active[endpoint] >= limit:
+                self.rejected_requests[endpoint] += 1
+                return False
+            self._active[endpoint] += 1
+            self.active_requests += 1
+            self.max_active_requests = max(
+                self.max_active_requests, self.active_requests
+            )
+            return True
+
+    def request_finished(self, endpoint: str) -> None:
+        with self._lock:
+            self._active[endpoint] -= 1
+            self.active_requests -= 1
+
+
+class JMAPServer:
+    # A JMAP server backed by an in-memory store, for integration and load
+    # testing without network access. Clients connect with the server URL
+    # as their host, e.g. Client(host=server.url).
+    def __init__(
+        self,
+        store: Optional[JMAPStore] = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        core_capabilities: Optional[dict[str, Any]] = None,
+        latency: float = 0.0,
+    ) -> None:
+        self.store = store or JMAPStore()
+        self.core_capabilities = {
+            **DEFAULT_CORE_CAPABILITIES,
+            **(core_capabilities or {}),
+        }
+        # Simulated network latency added to each request
+        self.latency = latency
+        self.stats = ServerStats()
+        self.stopping = threading.Event()
+        self._httpd = _HTTPServer((host, port), _RequestHandler, self)
+        self._thread: Optional[threading.Thread] = None
+
+    def __enter__(self) -> JMAPServer:
+        self.start()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.stop()
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host!s}:{port}"
+
+    def start(self) -> None:
+        self._thread = threading.Thread(
+            target=self._httpd.serve_forever,
+            kwargs={"poll_interval": SHUTDOWN_POLL_INTERVAL},
+            daemon=True,
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self.stopping.set()
+        with self.store.changed:
+            self.store.changed.notify_all()
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def session(self) -> dict[str, Any]:
+        account_id = self.store.account_id
+        return {
+            "capabilities": {
+                constants.JMAP_URN_CORE: self.core_capabilities,
+                constants.JMAP_URN_MAIL: {},
+            },
+            "accounts": {
+                account_id: {
+                    "name": self.store.username,
+                    "isPersonal": True,
+                    "isReadOnly": False,
+                    "accountCapabilities": {
+                        constants.JMAP_URN_CORE: {},
+                        constants.JMAP_URN_MAIL: MAIL_CAPABILITIES,
+                    },
+                }
+            },
+            "primaryAccounts": {
+                constants.JMAP_URN_CORE: account_id,
+                constants.JMAP_URN_MAIL: account_id,
+            },
+            "username": self.store.username,
+            "apiUrl": f"{self.url}/api/",
+            "downloadUrl": (
+                f"{self.url}/download/{{accountId}}/{{blobId}}/{{name}}"
+                "?type={type}"
+            ),
+            "uploadUrl": f"{self.url}/upload/{{accountId}}/",
+            "eventSourceUrl": (
+                f"{self.url}/events/{{types}}/{{closeafter}}/{{ping}}"
+            ),
+            "state": SESSION_STATE,
+        }
+
+    def api_request(self, request: Any) -> dict[str, Any]:
+        if (
+            not isinstance(request, dict)
+            or not isinstance(request.get("using"), list)
+            or not isinstance(request.get("methodCalls"), list)
+        ):
+            raise RequestError(400, "urn:ietf:params:jmap:error:notRequest")
+        unknown = set(request["using"]) - set(self.session()["capabilities"])
+        if unknown:
+            raise RequestError(
+                400,
+                "urn:ietf:params:jmap:error:unknownCapability",
+                f"Unknown capabilities: {', '.join(sorted(unknown))}",
+            )
+        if (
+            len(request["methodCalls"])
+            > self.core_capabilities["maxCallsInRequest"]
+        ):
+            raise RequestError(
+                400, "urn:ietf:params:jmap:error:limit", "maxCallsInRequest"
+            )
+        methods = JMAPMethods(
+            self.store,
+            self.core_capabilities["maxObjectsInGet"],
+            self.core_capabilities["maxObjectsInSet"],
+        )
+        responses: list[MethodResponse] = []
+        with self.store.lock:
+            for method_call in request["methodCalls"]:
+                self.stats.method_calls[method_call[0]] += 1
+                responses.append(methods.call(method_call, responses))
+        response: dict[str, Any] = {
+            "methodResponses": responses,
+            "sessionState": SESSION_STATE,
+        }
+        if methods.created_ids:
+            response["createdIds"] = methods.created_ids
+        return response
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        server_address: tuple[str, int],
+        handler: type[BaseHTTPRequestHandler],
+        jmap_server: JMAPServer,
+    ) -> None:
+        self.jmap_server = jmap_server
+        super().__init__(server_address, handler)
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: _HTTPServer
+    # Endpoint of the request counted as active, until its response is sent
+    _active_endpoint: Optional[str] = None
+
+    @property
+    def jmap_server(self) -> JMAPServer:
+        return self.server.jmap_server
+
+    def setup(self) -> None:
+        super().setup()
+        self.jmap_server.stats.connection()
+
+    def log_message(self, format: str, *args: Any) -> None:
+        log.debug(f"JMAP test server: {format % args}")
+
+    def do_GET(self) -> None:  # noqa: N802
+        path = urlsplit(self.path).path
+        if path == "/.well-known/jmap":
+            self._handle("session", self._session)
+        elif DOWNLOAD_PATH.match(path):
+            self._handle("download", self._download)
+        elif EVENTS_PATH.match(path):
+            self._handle("events", self._events)
+        else:
+            self._send_error(RequestError(404, "about:blank", "Not found"))
+
+    def do_POST(self) -> None:  # noqa: N802
+        path = urlsplit(self.path).path
+        if path == "/api/":
+            self._handle("api", self._api)
+        elif UPLOAD_PATH.match(path):
+            self._handle("upload", self._upload)
+        else:
+            self._send_error(RequestError(404, "about:blank", "Not found"))
+
+    def _handle(self, endpoint: str, handler: Any) -> None:
+        stats = self.jmap_server.stats
+        limit_name = CONCURRENCY_LIMITS.get(endpoint)
+        limit = (
+            self.jmap_server.core_capabilities[limit_name]
+            if limit_name
+            else None
+        )
+        if not stats.request_started(endpoint, limit):
+            # The request body is left unread
+            self.close_connection = True
+            self._send_error(
+                RequestError(
+                    429, "urn:ietf:params:jmap:error:limit", str(limit_name)
+                )
+            )
+            return
+        self._active_endpoint = endpoint
+        try:
+            if self.jmap_server.latency:
+                time.sleep(self.jmap_server.latency)
+            handler()
+        except RequestError as e:
+            self._send_error(e)
+        finally:
+            self._request_finished()
+
+    def _request_finished(self) -> None:
+        # Called before the response is sent, so a client may start its next
+        # request as soon as it has the response without exceeding the limit
+        if self._active_endpoint:
+            self.jmap_server.stats.request_finished(self._active_endpoint)
+            self._active_endpoint = None
+
+    def _read_body(self, max_size: int) -> bytes:
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            chunks = []
+            size = 0
+            while True:
+                chunk_size = int(self.rfile.readline().split(b";")[0], 16)
+                if not chunk_size:
+                    # Skip trailers
+                    while self.rfile.readline().strip():
+                        pass
+                    break
+                size += chunk_size
+                if size > max_size:
+                    self.close_connection = True
+                    raise RequestError(413, "urn:ietf:params:jmap:error:limit")
+                chunks.append(self.rfile.read(chunk_size))
+                self.rfile.readline()
+            return b"".join(chunks)
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > max_size:
+            self.close_connection = True
+            raise RequestError(413, "urn:ietf:params:jmap:error:limit")
+        return self.rfile.read(length)
+
+    def _send(
+        self,
+        status: int,
+        body: bytes,
+        content_type: str = "application/json",
+        headers: Optional[dict[str, str]] = None,
+    ) -> None:
+        self._request_finished()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, data: Any, status: int = 200) -> None:
+        self._send(status, json.dumps(data).encode())
+
+    def _send_error(self, error: RequestError) -> None:
+        self._send(
+            error.status,
+            json.dumps(
+                {
+                    "type": error.type,
+                    "status": error.status,
+                    "detail": error.detail,
+                }
+            ).encode(),
+            content_type="application/problem+json",
+        )
+
+    def _session(self) -> None:
+        self._send_json(self.jmap_server.session())
+
+    def _api(self) -> None:
+        body = self._read_body(
+            self.jmap_server.core_capabilities["maxSizeRequest"]
+        )
+        try:
+            request = json.loads(body)
+        except ValueError as e:
+            raise RequestError(
+                400, "urn:ietf:params:jmap:error:notJSON", str(e)
+            ) from e
+        self._send_json(self.jmap_server.api_request(request))
+
+    def _check_account(self, account_id: str) -> None:
+        if unquote(account_id) != self.jmap_server.store.account_id:
+            raise RequestError(404, "about:blank", "Account not found")
+
+    def _upload(self) -> None:
+        match = UPLOAD_PATH.match(urlsplit(self.path).path)
+        assert match
+        self._check_account(match.group(1))
+        data = self._read_body(
+            self.jmap_server.core_capabilities["maxSizeUpload"]
+        )
+        with self.jmap_server.store.lock:
+            blob = self.jmap_server.store.upload(
+                data,
+                self.headers.get("Content-Type", "application/octet-stream"),
+            )
+        self._send_json(blob, status=201)
+
+    def _download(self) -> None:
+        url = urlsplit(self.path)
+        match = DOWNLOAD_PATH.match(url.path)
+        assert match
+        self._check_account(match.group(1))
+        with self.jmap_server.store.lock:
+            blob = self.jmap_server.store.blob(unquote(match.group(2)))
+        if not blob:
+            raise RequestError(404, "about:blank", "Blob not found")
+        data, content_type = blob
+        content_type = parse_qs(url.query).get("type", [content_type])[0]
+        headers = {
+            "Content-Disposition": (
+                f'attachment; filename="{unquote(match.group(3))}"'
+            ),
+            "Accept-Ranges": "bytes",
+        }
+        range_match = RANGE_HEADER.match(self.headers.get("Range", ""))
+        if not range_match or not any(range_match.groups()):
+            self._send(200, data, content_type, headers)
+            return
+        start_value, end_value = range_match.groups()
+        if start_value:
+            start = int(start_value)
+            end = min(int(end_value or len(data) - 1), len(data) - 1)
+        else:
+            start = max(0, len(data) - int(end_value))
+            end = len(data) - 1
+        if start >= len(data) or start > end:
+            self._send(
+                416,
+                b"",
+                content_type,
+                {"Content-Range": f"bytes */{len(data)}"},
+            )
+            return
+        headers["Content-Range"] = f"bytes {start}-{end}/{len(data)}"
+        body = data[start:end + 1]  # fmt: skip
+        self._send(206, body, content_type, headers)
+
+    def _events(self) -> None:
+        match = EVENTS_PATH.match(urlsplit(self.path).path)
+        assert match
+        types, closeafter, ping = (unquote(g) for g in match.groups())
+        data_types = [
+            t for t in DATA_TYPES if types == "*" or t in types.split(",")
+        ]
+        ping_interval = int(ping) if ping.isdigit() else 0
+        self.close_connection = True
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        store = self.jmap_server.store
+        sent: dict[str, str] = {}
+        event_id = 0
+        last_write = time.monotonic()
+        try:
+            while not self.jmap_server.stopping.is_set():
+                with store.changed:
+                    changed = {
+                        t: store.state(t)
+                        for t in data_types
+                        if sent.get(t) != store.state(t)
+                    }
+                    if not changed:
+                        store.changed.wait(EVENT_POLL_INTERVAL)
+                if not changed:
+                    if (
+                        ping_interval
+                        and time.monotonic() - last_write >= ping_interval
+                    ):
+                        self._write_event(
+                            "ping", None, {"interval": ping_interval}
+                        )
+                        last_write = time.monotonic()
+                    continue
+                sent.update(changed)
+                event_id += 1
+                self._write_event(
+                    "state",
+                    str(event_id),
+                    {
+                        "@type": "StateChange",
+                        "changed": {store.account_id: changed},
+                    },
+                )
+                last_write = time.monotonic()
+                if closeafter == "state":
+                    return
+        except (BrokenPipeError, ConnectionResetError):
+            return
+
+    def _write_event(
+        self, event: str, id: Optional[str], data: dict[str, Any]
+    ) -> None:
+        lines = [f"event: {event}"]
+        if id:
+            lines.append(f"id: {id}")
+        lines.append(f"data: {json.dumps(data)}")
+        self.wfile.write(("\n".join(lines) + "\n\n").encode())
+        self.wfile.flush()
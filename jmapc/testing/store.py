@@ -0,0 +1,402 @@
+from __future__ import annotations
+
+import copy
+import itertools
+import threading
+from collections import Counter
+from collections.abc import Iterable, Iterator, Sequence
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Optional
+
+# Synthetic emails are received one second apart from this time
+SEED_TIME = datetime(1994, 8, 24, 12, 0, 0, tzinfo=timezone.utc)
+EMAILS_PER_THREAD = 4
+DATA_TYPES = ("Mailbox", "Email", "Thread")
+
+
+class MethodError(Exception):
+    def __init__(self, type: str, description: Optional[str] = None):
+        super().__init__(type, description)
+        self.type = type
+        self.description = description
+
+    def __str__(self) -> str:
+        return self.description or self.type
+
+    def to_dict(self) -> dict[str, Any]:
+        error = {"type": self.type}
+        if self.description:
+            error["description"] = self.description
+        return error
+
+
+def utc_date(value: datetime) -> str:
+    return value.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def parse_utc_date(value: str) -> datetime:
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def apply_patch(obj: dict[str, Any], patch: dict[str, Any]) -> None:
+    # Keys are JSON pointers relative to the object, e.g. "keywords/$seen"
+    for path, value in patch.items():
+        *parents, key = [
+            p.replace("~1", "/").replace("~0", "~") for p in path.split("/")
+        ]
+        target = obj
+        for parent in parents:
+            target = target.setdefault(parent, {})
+        if value is None:
+            target.pop(key, None)
+        else:
+            target[key] = value
+
+
+class ChangeLog:
+    def __init__(self) -> None:
+        self.state = 0
+        self._entries: list[tuple[int, str, str]] = []
+
+    def record(self, changes: Iterable[tuple[str, str]]) -> None:
+        changes = list(changes)
+        if not changes:
+            return
+        self.state += 1
+        self._entries += [(self.state, kind, id) for kind, id in changes]
+
+    def since(
+        self, since_state: str, max_changes: Optional[int] = None
+    ) -> dict[str, Any]:
+        if not since_state.isdigit() or int(since_state) > self.state:
+            raise MethodError("cannotCalculateChanges")
+        entries = [e for e in self._entries if e[0] > int(since_state)]
+        has_more_changes = bool(max_changes and len(entries) > max_changes)
+        if has_more_changes:
+            entries = entries[:max_changes]
+        kinds: dict[str, str] = {}
+        for _, kind, id in entries:
+            previous = kinds.get(id)
+            if previous == "created" and kind == "destroyed":
+                del kinds[id]
+            elif previous != "created":
+                kinds[id] = kind
+        return {
+            "oldState": since_state,
+            "newState": str(entries[-1][0] if entries else since_state),
+            "hasMoreChanges": has_more_changes,
+            "created": [id for id, k in kinds.items() if k == "created"],
+            "updated": [id for id, k in kinds.items() if k == "updated"],
+            "destroyed": [id for id, k in kinds.items() if k == "destroyed"],
+        }
+
+
+class JMAPStore:
+    # In-memory data for one account. Seeded emails are generated on demand
+    # from their index, so millions can be seeded without storing them, and
+    # are only stored once modified.
+    def __init__(
+        self,
+        account_id: str = "u1138",
+        username: str = "ness@onett.example.net",
+    ) -> None:
+        self.account_id = account_id
+        self.username = username
+        self.lock = threading.RLock()
+        self.changed = threading.Condition(self.lock)
+        self.changes = {data_type: ChangeLog() for data_type in DATA_TYPES}
+        self.mailboxes: dict[str, dict[str, Any]] = {}
+        self.blobs: dict[str, tuple[bytes, str]] = {}
+        self._emails: dict[str, dict[str, Any]] = {}
+        self._created_emails: list[str] = []
+        self._created_threads: dict[str, list[str]] = {}
+        self._destroyed: set[str] = set()
+        self._seeded = 0
+        self._seed_mailboxes: list[str] = []
+        self._counts: dict[str, Counter[str]] = {}
+        self._ids = itertools.count(1)
+        self.create_mailbox({"name": "Inbox", "role": "inbox"})
+
+    def new_id(self, prefix: str) -> str:
+        return f"{prefix}{next(self._ids)}"
+
+    def state(self, data_type: str) -> str:
+        return str(self.changes[data_type].state)
+
+    def record_changes(
+        self, data_type: str, changes: Iterable[tuple[str, str]]
+    ) -> None:
+        with self.changed:
+            self.changes[data_type].record(changes)
+            self.changed.notify_all()
+
+    # Mailboxes
+
+    def create_mailbox(self, data: dict[str, Any]) -> dict[str, Any]:
+        mailbox = {
+            "parentId": None,
+            "role": None,
+            "sortOrder": 0,
+            "isSubscribed": True,
+            **data,
+            "id": self.new_id("MB"),
+        }
+        self.mailboxes[mailbox["id"]] = mailbox
+        self._counts[mailbox["id"]] = Counter()
+        return mailbox
+
+    def mailbox(self, id: str) -> Optional[dict[str, Any]]:
+        mailbox = self.mailboxes.get(id)
+        if not mailbox:
+            return None
+        counts = self._counts[id]
+        return {
+            **mailbox,
+            "totalEmails": counts["total"],
+            "unreadEmails": counts["unread"],
+            "myRights": {
+                right: True
+                for right in (
+                    "mayReadItems",
+                    "mayAddItems",
+                    "mayRemoveItems",
+                    "maySetSeen",
+                    "maySetKeywords",
+                    "mayCreateChild",
+                    "mayRename",
+                    "mayDelete",
+                    "maySubmit",
+                )
+            },
+        }
+
+    def mailbox_by_name(self, name: str) -> Optional[dict[str, Any]]:
+        return next(
+            (m for m in self.mailboxes.values() if m["name"] == name), None
+        )
+
+    def _count_email(self, email: dict[str, Any], delta: int) -> None:
+        unread = not email.get("keywords", {}).get("$seen")
+        for mailbox_id in email.get("mailboxIds", {}):
+            if mailbox_id in self._counts:
+                self._counts[mailbox_id]["total"] += delta
+                self._counts[mailbox_id]["unread"] += delta * unread
+
+    # Emails
+
+    def seed(self, count: int, mailboxes: Sequence[str] = ("Inbox",)) -> None:
+        # Seeded email i is in mailbox i % len(mailboxes), is in thread
+        # i // EMAILS_PER_THREAD, and is unread if i % 3 == 0
+        with self.lock:
+            if self._seeded:
+                raise ValueError("Store has already been seeded")
+            self._seed_mailboxes = [
+                (
+                    self.mailbox_by_name(name)
+                    or self.create_mailbox({"name": name})
+                )["id"]
+                for name in mailboxes
+            ]
+            self._seeded = count
+            for n, mailbox_id in enumerate(self._seed_mailboxes):
+                total = len(range(n, count, len(self._seed_mailboxes)))
+                unread = sum(
+                    1
+                    for i in range(n, count, len(self._seed_mailboxes))
+                    if i % 3 == 0
+                )
+                self._counts[mailbox_id].update(total=total, unread=unread)
+
+    def _seed_index(self, id: str) -> Optional[int]:
+        if id.startswith("M") and id[1:].isdigit():
+            index = int(id[1:])
+            if index < self._seeded:
+                return index
+        return None
+
+    def _seeded_email(self, i: int) -> dict[str, Any]:
+        received_at = utc_date(SEED_TIME + timedelta(seconds=i))
+        body_part = {
+            "partId": "1",
+            "blobId": f"G{i}",
+            "size": 256 + i % 1024,
+            "type": "text/plain",
+            "charset": "utf-8",
+        }
+        return {
+            "id": f"M{i}",
+            "blobId": f"G{i}",
+            "threadId": f"T{i // EMAILS_PER_THREAD}",
+            "mailboxIds": {
+                self._seed_mailboxes[i % len(self._seed_mailboxes)]: True
+            },
+            "keywords": {} if i % 3 == 0 else {"$seen": True},
+            "size": 1024 + i % 4096,
+            "receivedAt": received_at,
+            "sentAt": received_at,
+            "messageId": [f"M{i}@jmap.localhost"],
+            "from": [
+                {
+                    "name": f"Sender {i % 100}",
+                    "email": f"sender{i % 100}@twoson.example.net",
+                }
+            ],
+            "to": [{"name": None, "email": self.username}],
+            "subject": f"Synthetic message {i}",
+            "preview": f"Synthetic message {i} preview",
+            "hasAttachment": False,
+            "bodyStructure": body_part,
+            "textBody": [body_part],
+            "htmlBody": [body_part],
+            "attachments": [],
+            "bodyValues": {},
+        }
+
+    def email(self, id: str) -> Optional[dict[str, Any]]:
+        if id in self._emails:
+            return self._emails[id]
+        if id in self._destroyed:
+            return None
+        index = self._seed_index(id)
+        return self._seeded_email(index) if index is not None else None
+
+    def email_ids(self, ascending: bool = False) -> Iterator[str]:
+        # Emails are ordered by receivedAt, as created emails are always
+        # received after seeded emails
+        created = list(self._created_emails)
+        if ascending:
+            seeded = range(self._seeded)
+            ids = itertools.chain((f"M{i}" for i in seeded), created)
+        else:
+            seeded = range(self._seeded - 1, -1, -1)
+            ids = itertools.chain(reversed(created), (f"M{i}" for i in seeded))
+        return (id for id in ids if id not in self._destroyed)
+
+    def emails(self, ascending: bool = False) -> Iterator[dict[str, Any]]:
+        for id in self.email_ids(ascending):
+            email = self.email(id)
+            if email:
+                yield email
+
+    def create_email(self, data: dict[str, Any]) -> dict[str, Any]:
+        if not data.get("mailboxIds"):
+            raise MethodError("invalidProperties", "mailboxIds is required")
+        if any(m not in self.mailboxes for m in data["mailboxIds"]):
+            raise MethodError("invalidProperties", "Mailbox not found")
+        email = copy.deepcopy(data)
+        blob_id = email.get("blobId") or self.new_id("B")
+        if blob_id not in self.blobs:
+            self.blobs[blob_id] = (
+                f"Subject: {email.get('subject', '')}\r\n\r\n".encode(),
+                "message/rfc822",
+            )
+        email.update(
+            id=self.new_id("E"),
+            blobId=blob_id,
+            threadId=self.new_id("X"),
+            size=len(self.blobs[blob_id][0]),
+            receivedAt=email.get("receivedAt")
+            or utc_date(datetime.now(tz=timezone.utc)),
+        )
+        email.setdefault("keywords", {})
+        self._emails[email["id"]] = email
+        self._created_emails.append(email["id"])
+        self._created_threads[email["threadId"]] = [email["id"]]
+        self._count_email(email, 1)
+        return email
+
+    def update_email(self, id: str, patch: dict[str, Any]) -> None:
+        email = self.email(id)
+        if not email:
+            raise MethodError("notFound")
+        updated = copy.deepcopy(email)
+        apply_patch(updated, patch)
+        if not updated.get("mailboxIds") or any(
+            m not in self.mailboxes for m in updated["mailboxIds"]
+        ):
+            raise MethodError("invalidProperties", "Invalid mailboxIds")
+        self._count_email(email, -1)
+        self._count_email(updated, 1)
+        self._emails[id] = updated
+
+    def destroy_email(self, id: str) -> dict[str, Any]:
+        email = self.email(id)
+        if not email:
+            raise MethodError("notFound")
+        self._count_email(email, -1)
+        self._emails.pop(id, None)
+        self._destroyed.add(id)
+        if id in self._created_emails:
+            self._created_emails.remove(id)
+            del self._created_threads[email["threadId"]]
+        return email
+
+    # Threads
+
+    def thread(self, id: str) -> Optional[dict[str, Any]]:
+        if id in self._created_threads:
+            email_ids = self._created_threads[id]
+        elif id.startswith("T") and id[1:].isdigit():
+            start = int(id[1:]) * EMAILS_PER_THREAD
+            email_ids = [
+                f"M{i}"
+                for i in range(
+                    start, min(start + EMAILS_PER_THREAD, self._seeded)
+                )
+                if f"M{i}" not in self._destroyed
+            ]
+        else:
+            return None
+        return {"id": id, "emailIds": email_ids} if email_ids else None
+
+    def threads(self) -> Iterator[dict[str, Any]]:
+        ids = itertools.chain(
+            (f"T{i}" for i in range(-(-self._seeded // EMAILS_PER_THREAD))),
+            list(self._created_threads),
+        )
+        return filter(None, map(self.thread, ids))
+
+    # Blobs
+
+    def blob(self, id: str) -> Optional[tuple[bytes, str]]:
+        if id in self.blobs:
+            return self.blobs[id]
+        if id.startswith("G") and self._seed_index(f"M{id[1:]}") is not None:
+            email = self._seeded_email(int(id[1:]))
+            body = f"{email['preview']}\r\n" * 8
+            return (
+                f"Subject: {email['subject']}\r\n\r\n{body}".encode(),
+                "message/rfc822",
+            )
+        return None
+
+    def upload(self, data: bytes, content_type: str) -> dict[str, Any]:
+        blob_id = self.new_id("B")
+        self.blobs[blob_id] = (data, content_type)
+        return {
+            "accountId": self.account_id,
+            "blobId": blob_id,
+            "type": content_type,
+            "size": len(data),
+        }
+
+
+def match_filter(
+    obj: dict[str, Any],
+    filter: Optional[dict[str, Any]],
+    match_condition: Callable[[dict[str, Any], str, Any], bool],
+) -> bool:
+    if not filter:
+        return True
+    if "operator" in filter:
+        results = (
+            match_filter(obj, c, match_condition) for c in filter["conditions"]
+        )
+        if filter["operator"] == "AND":
+            return all(results)
+        if filter["operator"] == "OR":
+            return any(results)
+        if filter["operator"] == "NOT":
+            return not any(results)
+        raise MethodError("unsupportedFilter", filter["operator"])
+    return all(match_condition(obj, k, v) for k, v in filter.items())
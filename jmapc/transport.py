@@ -0,0 +1,398 @@
+from __future__ import annotations
+
+import base64
+import collections
+import gzip
+import http.client
+import json
+import threading
+import time
+from collections.abc import Mapping
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from typing import IO, Any, Callable, Optional, Union
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+ARCHIVE_VERSION = 1
+# Chunks received closer together than this are stored as a single chunk
+CHUNK_MERGE_INTERVAL = 0.01
+# Request headers that select between otherwise identical requests
+MATCH_HEADERS = ("Range", "Last-Event-ID")
+# Response headers that describe the original encoding of the body, or may
+# contain credentials
+OMIT_RESPONSE_HEADERS = frozenset(
+    h.lower()
+    for h in (
+        "Connection",
+        "Content-Encoding",
+        "Content-Length",
+        "Keep-Alive",
+        "Set-Cookie",
+        "Transfer-Encoding",
+    )
+)
+
+MatchKey = tuple[str, str, tuple[tuple[str, str], ...]]
+Redactor = Callable[["Exchange"], "Exchange"]
+
+
+class ReplayError(requests.RequestException):
+    pass
+
+
+@dataclass
+class Exchange:
+    method: str
+    url: str
+    request_headers: dict[str, str]
+    request_body: Optional[bytes]
+    status: int
+    headers: dict[str, str]
+    # Seconds from sending the request until response headers were received
+    elapsed: float
+    # Response body chunks with their arrival times relative to the request
+    chunks: list[tuple[float, bytes]] = field(default_factory=list)
+
+    @property
+    def body(self) -> bytes:
+        return b"".join(c for _, c in self.chunks)
+
+    def match_key(self) -> MatchKey:
+        return match_key(self.method, self.url, self.request_headers)
+
+    def to_dict(self) -> dict[str, Any]:
+        data: dict[str, Any] = {
+            "method": self.method,
+            "url": self.url,
+            "status": self.status,
+            "headers": self.headers,
+            "elapsed": round(self.elapsed, 6),
+        }
+        if self.request_headers:
+            data["requestHeaders"] = self.request_headers
+        try:
+            if self.request_body is not None:
+                data["requestBody"] = self.request_body.decode()
+            data["chunks"] = [
+                [round(t, 6), c.decode()] for t, c in self.chunks
+            ]
+        except UnicodeDecodeError:
+            # Binary bodies such as blob downloads are stored as base64
+            data["encoding"] = "base64"
+            if self.request_body is not None:
+                data["requestBody"] = base64.b64encode(
+                    self.request_body
+                ).decode()
+            data["chunks"] = [
+                [round(t, 6), base64.b64encode(c).decode()]
+                for t, c in self.chunks
+            ]
+        return data
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> Exchange:
+        decode: Callable[[str], bytes] = (
+            base64.b64decode
+            if data.get("encoding") == "base64"
+            else str.encode
+        )
+        request_body = data.get("requestBody")
+        return cls(
+            method=data["method"],
+            url=data["url"],
+            request_headers=data.get("requestHeaders") or {},
+            request_body=(
+                decode(request_body) if request_body is not None else None
+            ),
+            status=data["status"],
+            headers=data["headers"],
+            elapsed=data["elapsed"],
+            chunks=[(t, decode(c)) for t, c in data["chunks"]],
+        )
+
+
+def match_key(
+    method: str, url: str, request_headers: Mapping[str, str]
+) -> MatchKey:
+    return (method, url, tuple(sorted(request_headers.items())))
+
+
+def _request_headers(request: requests.PreparedRequest) -> dict[str, str]:
+    return {
+        h: request.headers[h] for h in MATCH_HEADERS if h in request.headers
+    }
+
+
+def _request_body(request: requests.PreparedRequest) -> Optional[bytes]:
+    # Streamed request bodies such as file uploads are not recorded
+    body = request.body
+    if isinstance(body, str):
+        return body.encode()
+    return body if isinstance(body, bytes) else None
+
+
+def replace_strings(replacements: Mapping[str, str]) -> Redactor:
+    # Replaces values such as account IDs and email addresses throughout
+    # recorded URLs, headers and bodies
+    def _replace_str(value: str) -> str:
+        for old, new in replacements.items():
+            value = value.replace(old, new)
+        return value
+
+    def _replace_bytes(value: bytes) -> bytes:
+        for old, new in replacements.items():
+            value = value.replace(old.encode(), new.encode())
+        return value
+
+    def _redact(exchange: Exchange) -> Exchange:
+        return replace(
+            exchange,
+            url=_replace_str(exchange.url),
+            request_body=(
+                _replace_bytes(exchange.request_body)
+                if exchange.request_body is not None
+                else None
+            ),
+            headers={k: _replace_str(v) for k, v in exchange.headers.items()},
+            chunks=[(t, _replace_bytes(c)) for t, c in exchange.chunks],
+        )
+
+    return _redact
+
+
+def read_archive(path: Union[str, Path]) -> list[Exchange]:
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        header = json.loads(f.readline())
+        if header.get("version") != ARCHIVE_VERSION:
+            raise ValueError(
+                f"Unsupported archive version {header.get('version')}"
+            )
+        return [Exchange.from_dict(json.loads(line)) for line in f]
+
+
+class _RecordingStream:
+    # Wraps a urllib3 response body to record chunks as they are read. Only
+    # read() is provided so that requests and sseclient read through it.
+    def __init__(
+        self,
+        raw: Any,
+        exchange: Exchange,
+        start: float,
+        finish: Callable[[_RecordingStream], None],
+    ) -> None:
+        self._raw = raw
+        self._read = getattr(raw, "read1", raw.read)
+        self.exchange = exchange
+        self._start = start
+        self._finish = finish
+        self._finished = False
+
+    def read(
+        self, amt: Optional[int] = None, decode_content: bool = True
+    ) -> bytes:
+        # Short reads are used so that streamed events are not delayed
+        chunk: bytes = self._read(amt, decode_content=decode_content)
+        if not chunk:
+            self.finish()
+            return chunk
+        now = time.perf_counter() - self._start
+        chunks = self.exchange.chunks
+        if chunks and now - chunks[-1][0] < CHUNK_MERGE_INTERVAL:
+            chunks[-1] = (chunks[-1][0], chunks[-1][1] + chunk)
+        else:
+            chunks.append((now, chunk))
+        return chunk
+
+    def finish(self) -> None:
+        if not self._finished:
+            self._finished = True
+            self._finish(self)
+
+    def close(self) -> None:
+        self._raw.close()
+        self.finish()
+
+    def release_conn(self) -> None:
+        self._raw.release_conn()
+
+
+class RecordingTransport(BaseAdapter):
+    # Records HTTP exchanges sent through another transport to a gzipped JSON
+    # lines archive. Exchanges are written once their responses have been
+    # read or closed, and may be redacted before they are written.
+    def __init__(
+        self,
+        path: Union[str, Path],
+        transport: Optional[BaseAdapter] = None,
+        redact: Optional[Redactor] = None,
+    ) -> None:
+        super().__init__()
+        self.transport = transport or HTTPAdapter()
+        self.redact = redact
+        self._lock = threading.Lock()
+        self._pending: set[_RecordingStream] = set()
+        self._file: Optional[IO[str]] = gzip.open(path, "wt", encoding="utf-8")
+        self._file.write(json.dumps({"version": ARCHIVE_VERSION}) + "\n")
+
+    def send(
+        self,
+        request: requests.PreparedRequest,
+        stream: bool = False,
+        timeout: Any = None,
+        verify: Union[bool, str] = True,
+        cert: Any = None,
+        proxies: Optional[Mapping[str, str]] = None,
+    ) -> requests.Response:
+        start = time.perf_counter()
+        response = self.transport.send(
+            request,
+            stream=stream,
+            timeout=timeout,
+            verify=verify,
+            cert=cert,
+            proxies=proxies,
+        )
+        exchange = Exchange(
+            method=str(request.method),
+            url=str(request.url),
+            request_headers=_request_headers(request),
+            request_body=_request_body(request),
+            status=response.status_code,
+            headers={
+                k: v
+                for k, v in response.headers.items()
+                if k.lower() not in OMIT_RESPONSE_HEADERS
+            },
+            elapsed=time.perf_counter() - start,
+        )
+        body = _RecordingStream(response.raw, exchange, start, self._write)
+        with self._lock:
+            self._pending.add(body)
+        response.raw = body
+        return response
+
+    def _write(self, stream: _RecordingStream) -> None:
+        exchange = stream.exchange
+        if self.redact:
+            exchange = self.redact(exchange)
+        line = json.dumps(exchange.to_dict(), separators=(",", ":"))
+        with self._lock:
+            self._pending.discard(stream)
+            if self._file:
+                self._file.write(line + "\n")
+
+    def close(self) -> None:
+        # Responses that were never fully read are written as received so far
+        for stream in list(self._pending):
+            stream.finish()
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+        self.transport.close()
+
+
+class _ReplayStream:
+    def __init__(
+        self,
+        chunks: list[tuple[float, bytes]],
+        start: float,
+        latency_scale: float,
+    ) -> None:
+        self._chunks = collections.deque(chunks)
+        self._start = start
+        self._latency_scale = latency_scale
+        self._buffer = b""
+
+    def read(self, amt: Optional[int] = None, **kwargs: Any) -> bytes:
+        if not self._buffer and self._chunks:
+            arrival, self._buffer = self._chunks.popleft()
+            if self._latency_scale:
+                delay = (
+                    self._start
+                    + arrival * self._latency_scale
+                    - time.perf_counter()
+                )
+                if delay > 0:
+                    time.sleep(delay)
+        if amt is None:
+            amt = len(self._buffer)
+        chunk, self._buffer = self._buffer[:amt], self._buffer[amt:]
+        return chunk
+
+    def close(self) -> None:
+        self._chunks.clear()
+        self._buffer = b""
+
+
+class ReplayTransport(BaseAdapter):
+    # Serves responses from an archive written by RecordingTransport.
+    # Requests are matched to recorded exchanges by method, URL and range,
+    # preferring exchanges with the same request body, in recorded order. Each
+    # exchange is replayed once. Original latencies are simulated when
+    # latency_scale is set, e.g. 1.0 for original speed.
+    def __init__(
+        self, path: Union[str, Path], latency_scale: float = 0.0
+    ) -> None:
+        super().__init__()
+        self.latency_scale = latency_scale
+        self._lock = threading.Lock()
+        self._exchanges: dict[MatchKey, list[Exchange]] = (
+            collections.defaultdict(list)
+        )
+        for exchange in read_archive(path):
+            self._exchanges[exchange.match_key()].append(exchange)
+
+    @property
+    def remaining(self) -> int:
+        return sum(len(exchanges) for exchanges in self._exchanges.values())
+
+    def _next_exchange(self, request: requests.PreparedRequest) -> Exchange:
+        key = match_key(
+            str(request.method), str(request.url), _request_headers(request)
+        )
+        body = _request_body(request)
+        with self._lock:
+            exchanges = self._exchanges.get(key)
+            if not exchanges:
+                raise ReplayError(
+                    f"No recorded response for {request.method} {request.url}",
+                    request=request,
+                )
+            index = next(
+                (i for i, e in enumerate(exchanges) if e.request_body == body),
+                0,
+            )
+            return exchanges.pop(index)
+
+    def send(
+        self,
+        request: requests.PreparedRequest,
+        stream: bool = False,
+        timeout: Any = None,
+        verify: Union[bool, str] = True,
+        cert: Any = None,
+        proxies: Optional[Mapping[str, str]] = None,
+    ) -> requests.Response:
+        start = time.perf_counter()
+        exchange = self._next_exchange(request)
+        if self.latency_scale:
+            time.sleep(exchange.elapsed * self.latency_scale)
+        response = requests.Response()
+        response.status_code = exchange.status
+        response.reason = http.client.responses.get(exchange.status, "")
+        response.headers = CaseInsensitiveDict(exchange.headers)
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.raw = _ReplayStream(
+            exchange.chunks, start, self.latency_scale
+        )
+        response.url = str(request.url)
+        response.request = request
+        return response
+
+    def close(self) -> None:
+        pass
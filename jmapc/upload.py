@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import contextlib
+import mimetypes
+import mmap
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+from pathlib import Path
+from typing import IO, Any, Optional, Union
+
+UploadData = Union[str, Path, bytes, memoryview, IO[bytes], Iterable[bytes]]
+# Bulk uploads take data, or data with its content type
+UploadItem = Union[UploadData, tuple[UploadData, str]]
+
+UPLOAD_MMAP_THRESHOLD = 1024 * 1024
+DEFAULT_CONTENT_TYPE = "application/octet-stream"
+
+
+@dataclass
+class UploadBody:
+    data: Any
+    content_type: str
+    size: Optional[int] = None
+
+
+def is_repeatable_upload(data: UploadData) -> bool:
+    # File objects and chunk iterators can only be sent once
+    return isinstance(data, (str, Path, bytes, memoryview))
+
+
+def upload_item(item: UploadItem) -> tuple[UploadData, Optional[str]]:
+    # Tuples of data chunks are told apart by their second item
+    if isinstance(item, tuple) and len(item) == 2 and isinstance(item[1], str):
+        return item[0], item[1]
+    return item, None
+
+
+@contextlib.contextmanager
+def upload_body(
+    data: UploadData, content_type: Optional[str] = None
+) -> Iterator[UploadBody]:
+    if isinstance(data, (str, Path)):
+        guessed_type, _ = mimetypes.guess_type(data)
+        content_type = content_type or guessed_type or DEFAULT_CONTENT_TYPE
+        with open(data, "rb") as f:
+            size = Path(data).stat().st_size
+            if size < UPLOAD_MMAP_THRESHOLD:
+                yield UploadBody(f, content_type, size)
+                return
+            # Large files are sent from a memory map of the file, which the
+            # HTTP client writes to the socket without an intermediate copy
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                view = memoryview(mapped)
+                try:
+                    yield UploadBody(view, content_type, size)
+                finally:
+                    view.release()
+        return
+    content_type = content_type or DEFAULT_CONTENT_TYPE
+    if isinstance(data, bytes):
+        yield UploadBody(data, content_type, len(data))
+    elif isinstance(data, memoryview):
+        yield UploadBody(data, content_type, data.nbytes)
+    else:
+        # File objects and chunk iterators are streamed as-is
+        yield UploadBody(data, content_type)
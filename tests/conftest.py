@@ -2,13 +2,14 @@ import json
 import logging
 import tempfile
 import time
-from pathlib import Path
 from collections.abc import Iterable
+from pathlib import Path
 
 import pytest
 import responses
+from aioresponses import aioresponses
 
-from jmapc import Client
+from jmapc import AsyncClient, Client
 from jmapc.logging import log
 
 from .data import make_session_response
@@ -38,6 +39,22 @@ def client() -> Iterable[Client]:
     yield Client(host="jmap-example.localhost", auth=("ness", "pk_fire"))
 
 
+@pytest.fixture
+def async_client() -> Iterable[AsyncClient]:
+    yield AsyncClient(host="jmap-example.localhost", auth=("ness", "pk_fire"))
+
+
+@pytest.fixture
+def aio_responses() -> Iterable[aioresponses]:
+    with aioresponses() as resp_mock:
+        resp_mock.get(
+            "https://jmap-example.localhost/.well-known/jmap",
+            payload=make_session_response(),
+            repeat=True,
+        )
+        yield resp_mock
+
+
 @pytest.fixture
 def http_responses_base() -> Iterable[responses.RequestsMock]:
     with responses.RequestsMock() as resp_mock:
@@ -0,0 +1,968 @@
+import asyncio
+import io
+import json
+from collections.abc import AsyncGenerator
+from pathlib import Path
+from typing import Any, Optional
+
+import aiohttp
+import pytest
+import requests
+from aiohttp import test_utils, web
+from aioresponses import CallbackResult, aioresponses
+from yarl import URL
+
+from jmapc import (
+    AsyncClient,
+    Blob,
+    ClientError,
+    Email,
+    EmailBodyPart,
+    Event,
+    EventSourceConfig,
+    MemorySessionCache,
+    RetryPolicy,
+    StateChange,
+    TypeState,
+)
+from jmapc import async_client as async_client_module
+from jmapc import errors
+from jmapc.auth import BearerAuth, auth_headers
+from jmapc.methods import (
+    CoreEcho,
+    CoreEchoResponse,
+    EmailGet,
+    InvocationResponseOrError,
+    MailboxGet,
+    MailboxGetResponse,
+)
+from jmapc.ref import Ref
+
+from .data import make_session_response
+from .utils import cached_session_key
+
+echo_test_data = dict(
+    who="Ness", goods=["Mr. Saturn coin", "Hall of Fame Bat"]
+)
+
+
+def expect_async_jmap_call(
+    aio_responses: aioresponses,
+    response: dict[str, Any],
+) -> None:
+    response.setdefault("sessionState", "test;session;state")
+    aio_responses.post("https://jmap-api.localhost/api", payload=response)
+
+
+def sent_requests(
+    aio_responses: aioresponses, method: str, url: str
+) -> list[Any]:
+    return [
+        json.loads(call.kwargs["data"])
+        for call in aio_responses.requests.get((method, URL(url)), [])
+    ]
+
+
+@pytest.mark.parametrize(
+    ["auth", "expected_headers"],
+    [
+        (None, {}),
+        (("ness", "pk_fire"), {"Authorization": "Basic bmVzczpwa19maXJl"}),
+        (
+            requests.auth.HTTPBasicAuth(username="ness", password="pk_fire"),
+            {"Authorization": "Basic bmVzczpwa19maXJl"},
+        ),
+        (
+            BearerAuth("ness__pk_fire"),
+            {"Authorization": "Bearer ness__pk_fire"},
+        ),
+    ],
+)
+def test_auth_headers(
+    auth: Optional[Any], expected_headers: dict[str, str]
+) -> None:
+    assert (
+        auth_headers(auth, "https://jmap-example.localhost/.well-known/jmap")
+        == expected_headers
+    )
+
+
+def test_jmap_session(
+    async_client: AsyncClient, aio_responses: aioresponses
+) -> None:
+    async def _test() -> None:
+        async with async_client:
+            session = await async_client.jmap_session()
+            assert session.username == "ness@onett.example.net"
+            assert await async_client.account_id() == "u1138"
+
+    asyncio.run(_test())
+
+
+def test_client_request(
+    async_client: AsyncClient, aio_responses: aioresponses
+) -> None:
+    response = {
+        "methodResponses": [
+            ["Core/echo", echo_test_data, "0.Core/echo"],
+            [
+                "Mailbox/get",
+                {
+                    "accountId": "u1138",
+                    "list": [],
+                    "not_found": [],
+                    "state": "1000",
+                },
+                "1.Mailbox/get",
+            ],
+        ],
+    }
+    expect_async_jmap_call(aio_responses, response)
+
+    async def _test() -> None:
+        async with async_client:
+            assert await async_client.request(
+                [CoreEcho(data=echo_test_data), MailboxGet(ids=Ref("/ids"))]
+            ) == [
+                InvocationResponseOrError(
+                    response=CoreEchoResponse(data=echo_test_data),
+                    id="0.Core/echo",
+                ),
+                InvocationResponseOrError(
+                    response=MailboxGetResponse(
+                        account_id="u1138",
+                        not_found=[],
+                        data=[],
+                        state="1000",
+                    ),
+                    id="1.Mailbox/get",
+                ),
+            ]
+
+    asyncio.run(_test())
+    assert sent_requests(
+        aio_responses, "POST", "https://jmap-api.localhost/api"
+    ) == [
+        {
+            "methodCalls": [
+                ["Core/echo", echo_test_data, "0.Core/echo"],
+                [
+                    "Mailbox/get",
+                    {
+                        "accountId": "u1138",
+                        "#ids": {
+                            "name": "Core/echo",
+                            "path": "/ids",
+                            "resultOf": "0.Core/echo",
+                        },
+                    },
+                    "1.Mailbox/get",
+                ],
+            ],
+            "using": [
+                "urn:ietf:params:jmap:core",
+                "urn:ietf:params:jmap:mail",
+            ],
+        }
+    ]
+
+
+def test_client_request_single_errors(
+    async_client: AsyncClient, aio_responses: aioresponses
+) -> None:
+    expect_async_jmap_call(
+        aio_responses,
+        {
+            "methodResponses": [
+                ["error", {"type": "serverFail"}, "single.Core/echo"],
+            ],
+        },
+    )
+
+    async def _test() -> None:
+        async with async_client:
+            with pytest.raises(ClientError) as e:
+                await async_client.request(
+                    CoreEcho(data=echo_test_data), raise_errors=True
+                )
+            assert str(e.value) == "Errors found in method responses"
+            with pytest.raises(ValueError):
+                await async_client.request(
+                    [CoreEcho(data=echo_test_data)],
+                    single_response=True,
+                )  # type: ignore
+
+    asyncio.run(_test())
+
+
+def test_client_request_lazy_responses(aio_responses: aioresponses) -> None:
+    expect_async_jmap_call(
+        aio_responses,
+        {
+            "methodResponses": [
+                ["Core/echo", echo_test_data, "0.Core/echo"],
+                ["error", {"type": "serverFail"}, "1.Core/echo"],
+            ],
+        },
+    )
+
+    async def _test() -> None:
+        async with AsyncClient(
+            host="jmap-example.localhost",
+            auth=("ness", "pk_fire"),
+            lazy_responses=True,
+        ) as client:
+            result = await client.request(
+                [CoreEcho(data=echo_test_data), CoreEcho(data=echo_test_data)]
+            )
+        assert [r.response_type for r in result] == [
+            CoreEchoResponse,
+            errors.Error,
+        ]
+        assert result == [
+            InvocationResponseOrError(
+                response=CoreEchoResponse(data=echo_test_data),
+                id="0.Core/echo",
+            ),
+            InvocationResponseOrError(
+                response=errors.ServerFail(), id="1.Core/echo"
+            ),
+        ]
+
+    asyncio.run(_test())
+
+
+def test_client_request_raw(
+    async_client: AsyncClient, aio_responses: aioresponses
+) -> None:
+    method_responses = [
+        ["Core/echo", echo_test_data, "0.Core/echo"],
+        ["Core/echo", echo_test_data, "1.Core/echo"],
+    ]
+    expect_async_jmap_call(
+        aio_responses, {"methodResponses": method_responses}
+    )
+
+    async def _test() -> None:
+        async with async_client:
+            assert await async_client.request(
+                [
+                    CoreEcho(data=echo_test_data),
+                    CoreEcho(data=echo_test_data),
+                ],
+                raw=True,
+            ) == [tuple(r) for r in method_responses]
+
+    asyncio.run(_test())
+
+
+def test_client_request_stream(
+    async_client: AsyncClient, aio_responses: aioresponses
+) -> None:
+    expect_async_jmap_call(
+        aio_responses,
+        {
+            "methodResponses": [
+                [
+                    "Email/get",
+                    {
+                        "accountId": "u1138",
+                        "list": [{"id": "f0001"}, {"id": "f0002"}],
+                        "notFound": [],
+                        "state": "2187",
+                    },
+                    "single.Email/get",
+                ],
+            ],
+        },
+    )
+    expect_async_jmap_call(
+        aio_responses,
+        {
+            "methodResponses": [
+                ["error", {"type": "serverFail"}, "single.Email/get"]
+            ]
+        },
+    )
+
+    async def _test() -> None:
+        async with async_client:
+            assert [
+                email
+                async for email in async_client.request_stream(
+                    EmailGet(ids=["f0001", "f0002"])
+                )
+            ] == [Email(id="f0001"), Email(id="f0002")]
+            with pytest.raises(ClientError) as e:
+                async for _ in async_client.request_stream(EmailGet(ids=None)):
+                    pass
+            assert e.value.result[0] == InvocationResponseOrError(
+                id="single.Email/get", response=errors.ServerFail()
+            )
+
+    asyncio.run(_test())
+
+
+def test_client_request_updated_session(
+    async_client: AsyncClient, aio_responses: aioresponses
+) -> None:
+    expect_async_jmap_call(
+        aio_responses,
+        {
+            "methodResponses": [
+                ["Core/echo", echo_test_data, "single.Core/echo"],
+            ],
+            "sessionState": "updated;state;value",
+        },
+    )
+
+    async def _test() -> None:
+        async with async_client:
+            assert await async_client.request(
+                CoreEcho(data=echo_test_data)
+            ) == CoreEchoResponse(data=echo_test_data)
+            assert async_client._jmap_session is None
+
+    asyncio.run(_test())
+
+
+def test_client_request_concurrent_session_fetch(
+    async_client: AsyncClient,
+) -> None:
+    session_state = "test;session;state"
+
+    async def _session_callback(url: URL, **kwargs: Any) -> CallbackResult:
+        # Responses are delayed so that the requests overlap
+        await asyncio.sleep(0.01)
+        return CallbackResult(
+            payload=dict(make_session_response(), state=session_state)
+        )
+
+    async def _api_callback(url: URL, **kwargs: Any) -> CallbackResult:
+        await asyncio.sleep(0.01)
+        return CallbackResult(
+            payload={
+                "methodResponses": [
+                    ["Core/echo", echo_test_data, "single.Core/echo"],
+                ],
+                "sessionState": session_state,
+            }
+        )
+
+    async def _requests() -> None:
+        await asyncio.gather(
+            *[
+                async_client.request(CoreEcho(data=echo_test_data))
+                for _ in range(20)
+            ]
+        )
+
+    async def _test() -> None:
+        nonlocal session_state
+        async with async_client:
+            await _requests()
+            assert async_client._jmap_session
+            # Every in-flight request sees the session state change, which
+            # invalidates the session once
+            session_state = "updated;state;value"
+            await _requests()
+            assert async_client._jmap_session is None
+            # Concurrent requests after the session is invalidated also
+            # share one session fetch
+            await _requests()
+            assert async_client._jmap_session
+
+    with aioresponses() as aio_responses:
+        aio_responses.get(
+            "https://jmap-example.localhost/.well-known/jmap",
+            callback=_session_callback,
+            repeat=True,
+        )
+        aio_responses.post(
+            "https://jmap-api.localhost/api",
+            callback=_api_callback,
+            repeat=True,
+        )
+        asyncio.run(_test())
+        session_requests = aio_responses.requests[
+            ("GET", URL("https://jmap-example.localhost/.well-known/jmap"))
+        ]
+        assert len(session_requests) == 2
+
+
+def test_client_request_background_session_refresh(
+    aio_responses: aioresponses,
+) -> None:
+    async_client = AsyncClient(
+        host="jmap-example.localhost",
+        auth=("ness", "pk_fire"),
+        background_session_refresh=True,
+    )
+    expect_async_jmap_call(
+        aio_responses,
+        {
+            "methodResponses": [
+                ["Core/echo", echo_test_data, "single.Core/echo"],
+            ],
+            "sessionState": "updated;state;value",
+        },
+    )
+
+    async def _test() -> None:
+        async with async_client:
+            session = await async_client.jmap_session()
+            await async_client.request(CoreEcho(data=echo_test_data))
+            # The previous session stays in use until the refresh completes
+            assert async_client._jmap_session is session
+            assert async_client._session_refresh_task
+            await async_client._session_refresh_task
+            assert async_client._jmap_session is not session
+
+    asyncio.run(_test())
+
+
+def test_error_unauthorized(
+    async_client: AsyncClient, aio_responses: aioresponses
+) -> None:
+    aio_responses.post("https://jmap-api.localhost/api", status=401)
+
+    async def _test() -> None:
+        async with async_client:
+            with pytest.raises(aiohttp.ClientResponseError) as e:
+                await async_client.request(CoreEcho(data=echo_test_data))
+            assert e.value.status == 401
+
+    asyncio.run(_test())
+
+
+def test_upload_blob(
+    async_client: AsyncClient, aio_responses: aioresponses, tempdir: Path
+) -> None:
+    blob_content = "test upload blob content"
+    source_file = tempdir / "upload.txt"
+    source_file.write_text(blob_content)
+    aio_responses.post(
+        "https://jmap-api.localhost/jmap/upload/u1138/",
+        payload={
+            "accountId": "u1138",
+            "blobId": "C2187",
+            "type": "text/plain",
+            "size": len(blob_content),
+        },
+    )
+
+    async def _test() -> None:
+        async with async_client:
+            assert await async_client.upload_blob(source_file) == Blob(
+                id="C2187", type="text/plain", size=len(blob_content)
+            )
+
+    asyncio.run(_test())
+
+
+def test_upload_blob_file_name_keyword(
+    async_client: AsyncClient, aio_responses: aioresponses, tempdir: Path
+) -> None:
+    blob_content = "test upload blob content"
+    source_file = tempdir / "upload.txt"
+    source_file.write_text(blob_content)
+    aio_responses.post(
+        "https://jmap-api.localhost/jmap/upload/u1138/",
+        payload={
+            "accountId": "u1138",
+            "blobId": "C2187",
+            "type": "text/plain",
+            "size": len(blob_content),
+        },
+    )
+
+    async def _test() -> None:
+        async with async_client:
+            assert await async_client.upload_blob(
+                file_name=source_file
+            ) == Blob(id="C2187", type="text/plain", size=len(blob_content))
+
+    asyncio.run(_test())
+
+
+def test_upload_blobs(
+    async_client: AsyncClient, aio_responses: aioresponses, tempdir: Path
+) -> None:
+    def _upload_callback(url: URL, **kwargs: Any) -> CallbackResult:
+        content = kwargs["data"].read()
+        if content == b"fail":
+            return CallbackResult(status=500, reason="Server Error")
+        return CallbackResult(
+            payload={
+                "accountId": "u1138",
+                "blobId": content.decode(),
+                "type": "text/plain",
+                "size": len(content),
+            }
+        )
+
+    aio_responses.post(
+        "https://jmap-api.localhost/jmap/upload/u1138/",
+        callback=_upload_callback,
+        repeat=True,
+    )
+    source_files = []
+    for content in ("C1", "fail"):
+        source_file = tempdir / f"{content}.txt"
+        source_file.write_text(content)
+        source_files.append(source_file)
+    oversized_file = tempdir / "oversized.txt"
+    with open(oversized_file, "wb") as f:
+        f.truncate(50_000_001)
+
+    async def _test() -> None:
+        async with async_client:
+            results = await async_client.upload_blobs(
+                [*source_files, oversized_file]
+            )
+            assert results[0] == Blob(id="C1", type="text/plain", size=2)
+            assert isinstance(results[1], aiohttp.ClientResponseError)
+            assert isinstance(results[2], ValueError)
+
+    asyncio.run(_test())
+
+
+def test_upload_blob_data(
+    async_client: AsyncClient, aio_responses: aioresponses, tempdir: Path
+) -> None:
+    uploaded: list[tuple[bytes, str]] = []
+
+    async def _upload_callback(url: URL, **kwargs: Any) -> CallbackResult:
+        data = kwargs["data"]
+        if isinstance(data, (bytes, memoryview)):
+            content = bytes(data)
+        else:
+            content = b"".join([chunk async for chunk in data])
+        uploaded.append((content, kwargs["headers"]["Content-Type"]))
+        return CallbackResult(
+            payload={
+                "accountId": "u1138",
+                "blobId": "C2187",
+                "type": kwargs["headers"]["Content-Type"],
+                "size": len(content),
+            }
+        )
+
+    aio_responses.post(
+        "https://jmap-api.localhost/jmap/upload/u1138/",
+        callback=_upload_callback,
+        repeat=True,
+    )
+    large_file = tempdir / "large.bin"
+    large_content = bytes(range(256)) * 8192
+    large_file.write_bytes(large_content)
+
+    async def _test() -> None:
+        async with async_client:
+            await async_client.upload_blob(b"bytes content")
+            await async_client.upload_blob(
+                iter([b"chunk ", b"iterator"]), content_type="text/plain"
+            )
+            await async_client.upload_blob(large_file)
+            blobs = await async_client.upload_blobs(
+                [(b"<p>Onett</p>", "text/html"), b"Twoson"]
+            )
+            assert [b.type for b in blobs if isinstance(b, Blob)] == [
+                "text/html",
+                "application/octet-stream",
+            ]
+
+    asyncio.run(_test())
+    assert uploaded[:3] == [
+        (b"bytes content", "application/octet-stream"),
+        (b"chunk iterator", "text/plain"),
+        (large_content, "application/octet-stream"),
+    ]
+    assert sorted(uploaded[3:]) == [
+        (b"<p>Onett</p>", "text/html"),
+        (b"Twoson", "application/octet-stream"),
+    ]
+
+
+def test_download_attachment(
+    async_client: AsyncClient, aio_responses: aioresponses, tempdir: Path
+) -> None:
+    blob_content = "test download blob content"
+    aio_responses.get(
+        "https://jmap-api.localhost/jmap/download"
+        "/u1138/C2187/download.txt?type=text/plain",
+        body=blob_content,
+    )
+    dest_file = tempdir / "download.txt"
+    attachment = EmailBodyPart(
+        name="download.txt", blob_id="C2187", type="text/plain"
+    )
+
+    async def _test() -> None:
+        async with async_client:
+            with pytest.raises(Exception) as e:
+                await async_client.download_attachment(attachment, "")
+            assert str(e.value) == "Destination file name is required"
+            await async_client.download_attachment(attachment, dest_file)
+
+    asyncio.run(_test())
+    assert dest_file.read_text() == blob_content
+
+
+def test_request_timeout_per_read(monkeypatch: pytest.MonkeyPatch) -> None:
+    # The timeout applies to each read rather than to the whole transfer
+    monkeypatch.setattr(async_client_module, "REQUEST_TIMEOUT", 0.5)
+
+    async def _slow_stream(request: web.Request) -> web.StreamResponse:
+        response = web.StreamResponse()
+        await response.prepare(request)
+        for _ in range(4):
+            await response.write(b"x" * 10)
+            await asyncio.sleep(0.2)
+        return response
+
+    app = web.Application()
+    app.router.add_get("/download", _slow_stream)
+
+    async def _test() -> None:
+        async with test_utils.TestServer(app) as server:
+            async with AsyncClient(host="jmap-example.localhost") as client:
+                async with client.aiohttp_session.get(
+                    server.make_url("/download")
+                ) as r:
+                    assert await r.read() == b"x" * 40
+
+    asyncio.run(_test())
+
+
+def test_event_source(aio_responses: aioresponses) -> None:
+    async_client = AsyncClient(
+        host="jmap-example.localhost",
+        auth=("ness", "pk_fire"),
+        last_event_id="7999",
+        event_source_config=EventSourceConfig(ping=30),
+    )
+    event_stream = "\r\n".join(
+        [
+            ": comment",
+            "id: 8001",
+            "event: state",
+            "data: " + json.dumps({"changed": {"u1138": {"Email": "1001"}}}),
+            "",
+            "id: 8001.5",
+            "event: ping",
+            "data: ignore-me",
+            "",
+            "event: state",
+            'data: {"changed": {"u1138":',
+            'data: {"Email": "2000", "Mailbox": "2222"}}}',
+            "",
+            "",
+        ]
+    )
+    aio_responses.get(
+        "https://jmap-api.localhost/events/*/no/30",
+        body=event_stream,
+        content_type="text/event-stream",
+    )
+
+    async def _collect(
+        events: AsyncGenerator[Event, None],
+    ) -> list[Event]:
+        return [event async for event in events]
+
+    async def _test() -> None:
+        async with async_client:
+            assert await _collect(async_client.events) == [
+                Event(
+                    id="8001",
+                    data=StateChange(
+                        changed={"u1138": TypeState(email="1001")}
+                    ),
+                ),
+                Event(
+                    id=None,
+                    data=StateChange(
+                        changed={
+                            "u1138": TypeState(email="2000", mailbox="2222")
+                        }
+                    ),
+                ),
+            ]
+
+    asyncio.run(_test())
+    (call,) = aio_responses.requests[
+        ("GET", URL("https://jmap-api.localhost/events/*/no/30"))
+    ]
+    assert call.kwargs["headers"]["Last-Event-ID"] == "7999"
+    assert async_client._last_event_id == "8001.5"
+
+
+def test_jmap_session_no_account() -> None:
+    session_response = make_session_response()
+    session_response["primaryAccounts"] = {}
+    async_client = AsyncClient.create_with_api_token(
+        "jmap-example.localhost", api_token="ness__pk_fire"
+    )
+
+    async def _test() -> None:
+        async with async_client:
+            with pytest.raises(Exception) as e:
+                await async_client.account_id()
+            assert str(e.value) == "No primary account ID found"
+
+    with aioresponses() as resp_mock:
+        resp_mock.get(
+            "https://jmap-example.localhost/.well-known/jmap",
+            payload=session_response,
+        )
+        asyncio.run(_test())
+
+
+def test_client_request_many(
+    async_client: AsyncClient, aio_responses: aioresponses
+) -> None:
+    def _echo_callback(url: URL, **kwargs: Any) -> CallbackResult:
+        method_calls = json.loads(kwargs["data"])["methodCalls"]
+        if method_calls[0][1] == {"n": 1}:
+            return CallbackResult(status=500, reason="Server Error")
+        return CallbackResult(
+            payload={
+                "methodResponses": method_calls,
+                "sessionState": "test;session;state",
+            }
+        )
+
+    aio_responses.post(
+        "https://jmap-api.localhost/api", callback=_echo_callback, repeat=True
+    )
+
+    async def _test() -> None:
+        async with async_client:
+            results = await async_client.request_many(
+                [
+                    CoreEcho(data={"n": 0}),
+                    CoreEcho(data={"n": 1}),
+                    [CoreEcho(data={"n": 2})],
+                ]
+            )
+            assert results[0] == CoreEchoResponse(data={"n": 0})
+            assert isinstance(results[1], aiohttp.ClientResponseError)
+            assert results[2] == [
+                InvocationResponseOrError(
+                    id="single.Core/echo",
+                    response=CoreEchoResponse(data={"n": 2}),
+                )
+            ]
+
+    asyncio.run(_test())
+
+
+def test_download_attachment_stream(
+    async_client: AsyncClient, aio_responses: aioresponses
+) -> None:
+    blob_content = b"test download blob content" * 100
+    aio_responses.get(
+        "https://jmap-api.localhost/jmap/download"
+        "/u1138/C2187/download.txt?type=text/plain",
+        body=blob_content,
+        repeat=True,
+    )
+    attachment = EmailBodyPart(
+        name="download.txt",
+        blob_id="C2187",
+        type="text/plain",
+        size=len(blob_content),
+    )
+    progress: list[tuple[int, Optional[int]]] = []
+    dest = io.BytesIO()
+
+    async def _test() -> None:
+        async with async_client:
+            await async_client.download_attachment(
+                attachment, dest, progress=lambda *args: progress.append(args)
+            )
+            chunks = [
+                chunk
+                async for chunk in async_client.stream_attachment(
+                    attachment, chunk_size=1000
+                )
+            ]
+            assert [len(c) for c in chunks] == [1000, 1000, 600]
+
+    asyncio.run(_test())
+    assert dest.getvalue() == blob_content
+    assert progress[-1] == (len(blob_content), len(blob_content))
+
+
+def test_session_cache(aio_responses: aioresponses) -> None:
+    cache = MemorySessionCache()
+    async_client = AsyncClient(
+        host="jmap-example.localhost",
+        auth=("ness", "pk_fire"),
+        session_cache=cache,
+    )
+    cache.set(cached_session_key(async_client), make_session_response())
+    expect_async_jmap_call(
+        aio_responses,
+        {
+            "methodResponses": [
+                ["Core/echo", echo_test_data, "single.Core/echo"],
+            ],
+            "sessionState": "updated;state;value",
+        },
+    )
+
+    async def _test() -> None:
+        async with async_client:
+            assert await async_client.account_id() == "u1138"
+            await async_client.request(CoreEcho(data=echo_test_data))
+
+    asyncio.run(_test())
+    assert not aio_responses.requests.get(
+        ("GET", URL("https://jmap-example.localhost/.well-known/jmap"))
+    )
+    assert cache.get(cached_session_key(async_client)) is None
+
+
+def test_session_cache_stale_urls(aio_responses: aioresponses) -> None:
+    cache = MemorySessionCache()
+
+    def _make_client() -> AsyncClient:
+        async_client = AsyncClient(
+            host="jmap-example.localhost",
+            auth=("ness", "pk_fire"),
+            session_cache=cache,
+        )
+        cache.set(
+            cached_session_key(async_client),
+            dict(
+                make_session_response(),
+                apiUrl="https://jmap-old.localhost/api",
+                uploadUrl="https://jmap-old.localhost/upload/{accountId}/",
+            ),
+        )
+        return async_client
+
+    aio_responses.post("https://jmap-old.localhost/api", status=404)
+    expect_async_jmap_call(
+        aio_responses,
+        {"methodResponses": [["Core/echo", {"n": 1}, "single.Core/echo"]]},
+    )
+    aio_responses.post("https://jmap-old.localhost/upload/u1138/", status=404)
+    aio_responses.post(
+        "https://jmap-api.localhost/jmap/upload/u1138/",
+        payload={
+            "accountId": "u1138",
+            "blobId": "C2187",
+            "type": "text/plain",
+            "size": 4,
+        },
+    )
+
+    async def _test() -> None:
+        # Requests with stale cached session URLs are retried with a
+        # refetched session
+        async with _make_client() as async_client:
+            assert await async_client.request(
+                CoreEcho(data={"n": 1})
+            ) == CoreEchoResponse(data={"n": 1})
+        assert cache.get(cached_session_key(async_client)) == (
+            make_session_response()
+        )
+        async with _make_client() as async_client:
+            assert await async_client.upload_blob(
+                b"test", "text/plain"
+            ) == Blob(id="C2187", type="text/plain", size=4)
+        assert cache.get(cached_session_key(async_client)) == (
+            make_session_response()
+        )
+
+    asyncio.run(_test())
+
+
+def test_retry_policy(aio_responses: aioresponses) -> None:
+    async_client = AsyncClient(
+        host="jmap-example.localhost",
+        auth=("ness", "pk_fire"),
+        retry_policy=RetryPolicy(backoff=0),
+    )
+    aio_responses.post(
+        "https://jmap-api.localhost/api",
+        status=429,
+        reason="Too Many Requests",
+        headers={"Retry-After": "0"},
+    )
+    aio_responses.post(
+        "https://jmap-api.localhost/api",
+        exception=aiohttp.ServerDisconnectedError(),
+    )
+    expect_async_jmap_call(
+        aio_responses,
+        {
+            "methodResponses": [
+                [
+                    "Mailbox/get",
+                    {
+                        "accountId": "u1138",
+                        "list": [],
+                        "notFound": [],
+                        "state": "1",
+                    },
+                    "0.Mailbox/get",
+                ],
+                ["error", {"type": "serverFail"}, "1.Mailbox/get"],
+            ],
+        },
+    )
+    expect_async_jmap_call(
+        aio_responses,
+        {
+            "methodResponses": [
+                [
+                    "Mailbox/get",
+                    {
+                        "accountId": "u1138",
+                        "list": [],
+                        "notFound": ["m1"],
+                        "state": "1",
+                    },
+                    "1.Mailbox/get",
+                ],
+            ],
+        },
+    )
+    aio_responses.post(
+        "https://jmap-api.localhost/api",
+        exception=aiohttp.ServerDisconnectedError(),
+    )
+
+    async def _test() -> None:
+        async with async_client:
+            result = await async_client.request(
+                [MailboxGet(ids=None), MailboxGet(ids=["m1"])]
+            )
+            assert result[1] == InvocationResponseOrError(
+                id="1.Mailbox/get",
+                response=MailboxGetResponse(
+                    account_id="u1138", data=[], not_found=["m1"], state="1"
+                ),
+            )
+            # Requests with non-idempotent calls are not retried after the
+            # request may have been processed
+            with pytest.raises(aiohttp.ServerDisconnectedError):
+                await async_client.request(CoreEcho(data=echo_test_data))
+
+    asyncio.run(_test())
+    assert [
+        [c[2] for c in request["methodCalls"]]
+        for request in sent_requests(
+            aio_responses, "POST", "https://jmap-api.localhost/api"
+        )
+    ] == [
+        ["0.Mailbox/get", "1.Mailbox/get"],
+        ["0.Mailbox/get", "1.Mailbox/get"],
+        ["0.Mailbox/get", "1.Mailbox/get"],
+        ["1.Mailbox/get"],
+        ["single.Core/echo"],
+    ]
@@ -0,0 +1,92 @@
+from pathlib import Path
+
+import pytest
+
+from benchmarks.runner import (
+    BENCHMARKS,
+    Benchmark,
+    Result,
+    compare_results,
+    format_report,
+    load_results,
+    run_benchmark,
+    save_results,
+)
+
+
+@pytest.mark.parametrize("benchmark", BENCHMARKS, ids=lambda b: b.name)
+def test_benchmark(benchmark: Benchmark) -> None:
+    result = run_benchmark(benchmark, scale=0.001, repeat=1)
+    assert result.name == benchmark.name
+    assert result.items >= 1
+    assert result.seconds > 0
+    assert result.peak_memory > 0
+    assert result.calibration > 0
+
+
+def test_compare_results(tempdir: Path) -> None:
+    baseline = [
+        Result(name="decode", items=10, seconds=1.0, peak_memory=1000),
+        Result(name="encode", items=10, seconds=1.0, peak_memory=1000),
+        Result(name="resized", items=10, seconds=1.0, peak_memory=1000),
+    ]
+    save_results(tempdir / "baseline.json", baseline)
+    assert list(load_results(tempdir / "baseline.json").values()) == baseline
+    results = [
+        Result(name="decode", items=10, seconds=1.1, peak_memory=1000),
+        Result(name="encode", items=10, seconds=1.0, peak_memory=1500),
+        Result(name="resized", items=20, seconds=9.0, peak_memory=9000),
+        Result(name="new", items=10, seconds=1.0, peak_memory=1000),
+    ]
+    comparisons = compare_results(
+        results, load_results(tempdir / "baseline.json"), threshold=0.2
+    )
+    assert [(c.result.name, c.regressed) for c in comparisons] == [
+        ("decode", False),
+        ("encode", True),
+    ]
+    report = format_report(results, comparisons).splitlines()
+    assert len(report) == 5
+    assert report[2].endswith("REGRESSED")
+    assert "REGRESSED" not in report[1]
+
+
+def test_compare_calibrated_results() -> None:
+    baseline = {
+        "decode": Result(
+            name="decode",
+            items=10,
+            seconds=1.0,
+            peak_memory=1000,
+            calibration=1.0,
+        ),
+        "encode": Result(
+            name="encode",
+            items=10,
+            seconds=1.0,
+            peak_memory=1000,
+            calibration=1.0,
+        ),
+    }
+    # Results from a machine that runs the calibration workload half as fast
+    results = [
+        Result(
+            name="decode",
+            items=10,
+            seconds=2.2,
+            peak_memory=1000,
+            calibration=2.0,
+        ),
+        Result(
+            name="encode",
+            items=10,
+            seconds=3.0,
+            peak_memory=1000,
+            calibration=2.0,
+        ),
+    ]
+    comparisons = compare_results(results, baseline, threshold=0.2)
+    assert [
+        (c.result.name, round(c.time_ratio, 2), c.regressed)
+        for c in comparisons
+    ] == [("decode", 1.1, False), ("encode", 1.5, True)]
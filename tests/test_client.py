@@ -1,15 +1,38 @@
+import gzip
+import io
 import json
 from pathlib import Path
+from typing import Any, Optional, cast
+from unittest import mock
 
 import pytest
 import requests
 import responses
 
-from jmapc import Blob, Client, ClientError, EmailBodyPart, constants
+from jmapc import (
+    Blob,
+    Client,
+    ClientError,
+    Email,
+    EmailBodyPart,
+    EmailQueryFilterCondition,
+    EmailQueryFilterOperator,
+    JSONCodec,
+    Mailbox,
+    Operator,
+    OrjsonJSONCodec,
+    StdlibJSONCodec,
+    constants,
+    errors,
+)
 from jmapc.auth import BearerAuth
 from jmapc.methods import (
     CoreEcho,
     CoreEchoResponse,
+    EmailGet,
+    EmailGetResponse,
+    EmailQuery,
+    EmailQueryResponse,
     Invocation,
     InvocationResponseOrError,
     MailboxGet,
@@ -23,6 +46,7 @@ from jmapc.session import (
     SessionCapabilitiesCore,
     SessionPrimaryAccount,
 )
+from jmapc.upload import UploadData
 
 from .data import make_session_response
 from .utils import expect_jmap_call
@@ -183,6 +207,55 @@ def test_client_request_updated_session(
     assert client.jmap_session.username == "paula@twoson.example.net"
 
 
+@pytest.mark.parametrize("refresh_succeeds", [True, False])
+def test_client_request_background_session_refresh(
+    http_responses: responses.RequestsMock, refresh_succeeds: bool
+) -> None:
+    client = Client(
+        host="jmap-example.localhost",
+        auth=("ness", "pk_fire"),
+        background_session_refresh=True,
+    )
+    assert client.jmap_session.username == "ness@onett.example.net"
+    new_session_response = make_session_response()
+    new_session_response.update(
+        {
+            "state": "updated;state;value",
+            "username": "paula@twoson.example.net",
+        }
+    )
+    http_responses.replace(
+        method_or_response=responses.GET,
+        url="https://jmap-example.localhost/.well-known/jmap",
+        body=json.dumps(new_session_response),
+        status=200 if refresh_succeeds else 500,
+    )
+    expect_jmap_call(
+        http_responses,
+        {
+            "methodCalls": [["Core/echo", echo_test_data, "single.Core/echo"]],
+            "using": ["urn:ietf:params:jmap:core"],
+        },
+        {
+            "methodResponses": [
+                ["Core/echo", echo_test_data, "single.Core/echo"]
+            ],
+            "sessionState": "updated;state;value",
+        },
+    )
+    original_session = client.jmap_session
+    assert client.request(CoreEcho(data=echo_test_data)) == CoreEchoResponse(
+        data=echo_test_data
+    )
+    assert client._session_refresh_thread
+    client._session_refresh_thread.join()
+    if refresh_succeeds:
+        assert client.jmap_session is not original_session
+        assert client.jmap_session.username == "paula@twoson.example.net"
+    else:
+        assert "jmap_session" not in client.__dict__
+
+
 @pytest.mark.parametrize(
     "method_params",
     [
@@ -276,6 +349,90 @@ def test_client_request(
     ]
 
 
+def test_client_request_filter_operator(
+    client: Client, http_responses: responses.RequestsMock
+) -> None:
+    expected_request = {
+        "methodCalls": [
+            [
+                "Email/query",
+                {
+                    "accountId": "u1138",
+                    "filter": {
+                        "operator": "AND",
+                        "conditions": [
+                            {"inMailbox": "MBX1"},
+                            {"text": "Onett"},
+                        ],
+                    },
+                },
+                "0.Email/query",
+            ],
+            [
+                "Email/get",
+                {
+                    "accountId": "u1138",
+                    "#ids": {
+                        "name": "Email/query",
+                        "path": "/ids",
+                        "resultOf": "0.Email/query",
+                    },
+                },
+                "1.Email/get",
+            ],
+        ],
+        "using": ["urn:ietf:params:jmap:core", "urn:ietf:params:jmap:mail"],
+    }
+    response = {
+        "methodResponses": [
+            [
+                "Email/query",
+                {
+                    "accountId": "u1138",
+                    "ids": ["M1"],
+                    "queryState": "1000",
+                    "canCalculateChanges": False,
+                    "position": 0,
+                },
+                "0.Email/query",
+            ],
+            [
+                "Email/get",
+                {
+                    "accountId": "u1138",
+                    "list": [{"id": "M1"}],
+                    "notFound": [],
+                    "state": "2000",
+                },
+                "1.Email/get",
+            ],
+        ],
+    }
+    expect_jmap_call(http_responses, expected_request, response)
+    query_response, get_response = client.request(
+        [
+            EmailQuery(
+                filter=EmailQueryFilterOperator(
+                    operator=Operator.AND,
+                    conditions=[
+                        EmailQueryFilterCondition(in_mailbox="MBX1"),
+                        EmailQueryFilterCondition(text="Onett"),
+                    ],
+                )
+            ),
+            EmailGet(ids=Ref("/ids")),
+        ]
+    )
+    assert isinstance(query_response.response, EmailQueryResponse)
+    assert query_response.response.ids == ["M1"]
+    assert get_response.response == EmailGetResponse(
+        account_id="u1138",
+        state="2000",
+        not_found=[],
+        data=[Email(id="M1")],
+    )
+
+
 @pytest.mark.parametrize("raise_errors", [True, False])
 def test_client_request_single(
     client: Client, http_responses: responses.RequestsMock, raise_errors: bool
@@ -314,6 +471,30 @@ def test_client_request_single(
         )
 
 
+@pytest.mark.parametrize("json_codec", [StdlibJSONCodec(), OrjsonJSONCodec()])
+def test_client_request_json_codec(
+    http_responses: responses.RequestsMock, json_codec: JSONCodec
+) -> None:
+    client = Client(
+        host="jmap-example.localhost",
+        auth=("ness", "pk_fire"),
+        json_codec=json_codec,
+    )
+    expected_request = {
+        "methodCalls": [["Core/echo", echo_test_data, "single.Core/echo"]],
+        "using": ["urn:ietf:params:jmap:core"],
+    }
+    response = {
+        "methodResponses": [
+            ["Core/echo", echo_test_data, "single.Core/echo"],
+        ],
+    }
+    expect_jmap_call(http_responses, expected_request, response)
+    assert client.request(CoreEcho(data=echo_test_data)) == CoreEchoResponse(
+        data=echo_test_data
+    )
+
+
 def test_client_request_single_with_multiple_responses(
     client: Client,
     http_responses: responses.RequestsMock,
@@ -394,6 +575,231 @@ def test_client_request_single_with_multiple_responses_error(
     ]
 
 
+@pytest.mark.parametrize("raise_errors", [True, False])
+def test_client_request_lazy_responses(
+    http_responses: responses.RequestsMock, raise_errors: bool
+) -> None:
+    client = Client(
+        host="jmap-example.localhost",
+        auth=("ness", "pk_fire"),
+        lazy_responses=True,
+    )
+    expected_request = {
+        "methodCalls": [
+            ["Core/echo", echo_test_data, "0.Core/echo"],
+            ["Mailbox/get", {"accountId": "u1138"}, "1.Mailbox/get"],
+        ],
+        "using": ["urn:ietf:params:jmap:core", "urn:ietf:params:jmap:mail"],
+    }
+    response = {
+        "methodResponses": [
+            ["Core/echo", echo_test_data, "0.Core/echo"],
+            [
+                "Mailbox/get",
+                {
+                    "accountId": "u1138",
+                    "list": [],
+                    "notFound": [],
+                    "state": "1000",
+                },
+                "1.Mailbox/get",
+            ],
+        ],
+    }
+    expect_jmap_call(http_responses, expected_request, response)
+    with mock.patch.object(
+        MailboxGetResponse,
+        "from_dict",
+        wraps=MailboxGetResponse.from_dict,
+    ) as from_dict:
+        calls: list[Request] = [
+            CoreEcho(data=echo_test_data),
+            MailboxGet(ids=None),
+        ]
+        result = (
+            client.request(calls, raise_errors=True)
+            if raise_errors
+            else client.request(calls)
+        )
+        assert [r.response_type for r in result] == [
+            CoreEchoResponse,
+            MailboxGetResponse,
+        ]
+        assert result[0].response == CoreEchoResponse(data=echo_test_data)
+        from_dict.assert_not_called()
+        expected_response = MailboxGetResponse(
+            account_id="u1138", not_found=[], data=[], state="1000"
+        )
+        assert result[1].response == expected_response
+        assert result[1].response == expected_response
+        from_dict.assert_called_once()
+
+
+def test_client_request_lazy_responses_error(
+    http_responses: responses.RequestsMock,
+) -> None:
+    client = Client(
+        host="jmap-example.localhost",
+        auth=("ness", "pk_fire"),
+        lazy_responses=True,
+    )
+    expected_request = {
+        "methodCalls": [["Core/echo", echo_test_data, "single.Core/echo"]],
+        "using": ["urn:ietf:params:jmap:core"],
+    }
+    response = {
+        "methodResponses": [
+            ["error", {"type": "serverFail"}, "single.Core/echo"],
+        ],
+    }
+    expect_jmap_call(http_responses, expected_request, response)
+    with pytest.raises(ClientError) as e:
+        client.request(CoreEcho(data=echo_test_data), raise_errors=True)
+    assert e.value.result == [
+        InvocationResponseOrError(
+            id="single.Core/echo", response=errors.ServerFail()
+        )
+    ]
+
+
+def test_client_request_raw(
+    client: Client, http_responses: responses.RequestsMock
+) -> None:
+    expected_request = {
+        "methodCalls": [
+            ["Core/echo", echo_test_data, "0.Core/echo"],
+            ["Mailbox/get", {"accountId": "u1138"}, "1.Mailbox/get"],
+        ],
+        "using": ["urn:ietf:params:jmap:core", "urn:ietf:params:jmap:mail"],
+    }
+    method_responses = [
+        ["Core/echo", echo_test_data, "0.Core/echo"],
+        [
+            "Mailbox/get",
+            {"accountId": "u1138", "list": [], "state": "1000"},
+            "1.Mailbox/get",
+        ],
+    ]
+    expect_jmap_call(
+        http_responses,
+        expected_request,
+        {"methodResponses": method_responses},
+    )
+    assert client.request(
+        [CoreEcho(data=echo_test_data), MailboxGet(ids=None)], raw=True
+    ) == [tuple(r) for r in method_responses]
+
+
+@pytest.mark.parametrize("single_response", [True, False])
+def test_client_request_raw_errors(
+    client: Client,
+    http_responses: responses.RequestsMock,
+    single_response: bool,
+) -> None:
+    expected_request = {
+        "methodCalls": [["Core/echo", echo_test_data, "single.Core/echo"]],
+        "using": ["urn:ietf:params:jmap:core"],
+    }
+    error = ["error", {"type": "serverFail"}, "single.Core/echo"]
+    expect_jmap_call(
+        http_responses, expected_request, {"methodResponses": [error]}
+    )
+    expect_jmap_call(
+        http_responses, expected_request, {"methodResponses": [error, error]}
+    )
+    assert client.request(CoreEcho(data=echo_test_data), raw=True) == tuple(
+        error
+    )
+    with pytest.raises(ClientError) as e:
+        client.request(
+            CoreEcho(data=echo_test_data),
+            raise_errors=not single_response,
+            single_response=single_response,
+            raw=True,
+        )
+    assert e.value.result[0] == InvocationResponseOrError(
+        id="single.Core/echo", response=errors.ServerFail()
+    )
+
+
+def test_client_request_stream(
+    client: Client, http_responses: responses.RequestsMock
+) -> None:
+    expected_request = {
+        "methodCalls": [
+            [
+                "Email/get",
+                {"accountId": "u1138", "ids": ["f0001", "f0002"]},
+                "0.Email/get",
+            ],
+            ["Mailbox/get", {"accountId": "u1138"}, "1.Mailbox/get"],
+        ],
+        "using": ["urn:ietf:params:jmap:core", "urn:ietf:params:jmap:mail"],
+    }
+    expect_jmap_call(
+        http_responses,
+        expected_request,
+        {
+            "methodResponses": [
+                [
+                    "Email/get",
+                    {
+                        "accountId": "u1138",
+                        "list": [{"id": "f0001"}, {"id": "f0002"}],
+                        "notFound": [],
+                        "state": "2187",
+                    },
+                    "0.Email/get",
+                ],
+                [
+                    "Mailbox/get",
+                    {
+                        "accountId": "u1138",
+                        "list": [{"id": "MBX1", "name": "Onett"}],
+                        "notFound": [],
+                        "state": "1000",
+                    },
+                    "1.Mailbox/get",
+                ],
+            ],
+        },
+    )
+    assert list(
+        client.request_stream(
+            [EmailGet(ids=["f0001", "f0002"]), MailboxGet(ids=None)]
+        )
+    ) == [
+        Email(id="f0001"),
+        Email(id="f0002"),
+        Mailbox(id="MBX1", name="Onett"),
+    ]
+
+
+def test_client_request_stream_errors(
+    client: Client, http_responses: responses.RequestsMock
+) -> None:
+    expected_request = {
+        "methodCalls": [
+            ["Email/get", {"accountId": "u1138"}, "single.Email/get"]
+        ],
+        "using": ["urn:ietf:params:jmap:core", "urn:ietf:params:jmap:mail"],
+    }
+    expect_jmap_call(
+        http_responses,
+        expected_request,
+        {
+            "methodResponses": [
+                ["error", {"type": "serverFail"}, "single.Email/get"]
+            ]
+        },
+    )
+    with pytest.raises(ClientError) as e:
+        list(client.request_stream(EmailGet(ids=None)))
+    assert e.value.result[0] == InvocationResponseOrError(
+        id="single.Email/get", response=errors.ServerFail()
+    )
+
+
 def test_client_invalid_single_response_argument(client: Client) -> None:
     with pytest.raises(ValueError):
         client.request(
@@ -438,6 +844,187 @@ def test_upload_blob(
     )
 
 
+def test_upload_blob_file_name_keyword(
+    client: Client, http_responses: responses.RequestsMock, tempdir: Path
+) -> None:
+    blob_content = "test upload blob content"
+    source_file = tempdir / "upload.txt"
+    source_file.write_text(blob_content)
+    http_responses.add(
+        method=responses.POST,
+        url="https://jmap-api.localhost/jmap/upload/u1138/",
+        body=json.dumps(
+            {
+                "accountId": "u1138",
+                "blobId": "C2187",
+                "type": "text/plain",
+                "size": len(blob_content),
+            }
+        ),
+    )
+    assert client.upload_blob(file_name=source_file) == Blob(
+        id="C2187", type="text/plain", size=len(blob_content)
+    )
+
+
+def test_upload_blobs(
+    client: Client, http_responses: responses.RequestsMock, tempdir: Path
+) -> None:
+    def _upload_callback(
+        request: requests.PreparedRequest,
+    ) -> tuple[int, dict[str, str], str]:
+        content = cast(bytes, request.body)
+        if content == b"fail":
+            return (500, {}, "")
+        return (
+            200,
+            {},
+            json.dumps(
+                {
+                    "accountId": "u1138",
+                    "blobId": content.decode(),
+                    "type": "text/plain",
+                    "size": len(content),
+                }
+            ),
+        )
+
+    http_responses.add_callback(
+        method=responses.POST,
+        url="https://jmap-api.localhost/jmap/upload/u1138/",
+        callback=_upload_callback,
+    )
+    source_files = []
+    for content in ("C1", "fail", "C2"):
+        source_file = tempdir / f"{content}.txt"
+        source_file.write_text(content)
+        source_files.append(source_file)
+    oversized_file = tempdir / "oversized.txt"
+    with open(oversized_file, "wb") as f:
+        f.truncate(50_000_001)
+    results = client.upload_blobs([*source_files, oversized_file])
+    assert results[0] == Blob(id="C1", type="text/plain", size=2)
+    assert isinstance(results[1], requests.exceptions.HTTPError)
+    assert results[2] == Blob(id="C2", type="text/plain", size=2)
+    assert isinstance(results[3], ValueError)
+    assert str(results[3]) == (
+        "Upload of 50000001 bytes is larger than the server"
+        " upload limit of 50000000 bytes"
+    )
+    assert len(http_responses.calls) == 4
+
+
+def test_upload_blobs_content_types(
+    client: Client, http_responses: responses.RequestsMock
+) -> None:
+    uploaded: list[tuple[bytes, str]] = []
+
+    def _upload_callback(
+        request: requests.PreparedRequest,
+    ) -> tuple[int, dict[str, str], str]:
+        body: Any = request.body
+        content = body if isinstance(body, bytes) else b"".join(body)
+        uploaded.append((content, request.headers["Content-Type"]))
+        return (
+            200,
+            {},
+            json.dumps(
+                {
+                    "accountId": "u1138",
+                    "blobId": content.decode(),
+                    "type": request.headers["Content-Type"],
+                    "size": len(content),
+                }
+            ),
+        )
+
+    http_responses.add_callback(
+        method=responses.POST,
+        url="https://jmap-api.localhost/jmap/upload/u1138/",
+        callback=_upload_callback,
+    )
+    results = client.upload_blobs(
+        [
+            (b"<p>Onett</p>", "text/html"),
+            b"Twoson",
+            iter([b"Three", b"ed"]),
+        ]
+    )
+    assert results == [
+        Blob(id="<p>Onett</p>", type="text/html", size=12),
+        Blob(id="Twoson", type="application/octet-stream", size=6),
+        Blob(id="Threeed", type="application/octet-stream", size=7),
+    ]
+    assert sorted(uploaded) == [
+        (b"<p>Onett</p>", "text/html"),
+        (b"Threeed", "application/octet-stream"),
+        (b"Twoson", "application/octet-stream"),
+    ]
+
+
+@pytest.mark.parametrize(
+    ["content_type", "expected_content_type"],
+    [(None, "application/octet-stream"), ("text/plain", "text/plain")],
+)
+def test_upload_blob_data(
+    client: Client,
+    http_responses: responses.RequestsMock,
+    tempdir: Path,
+    content_type: Optional[str],
+    expected_content_type: str,
+) -> None:
+    uploaded: list[tuple[bytes, str]] = []
+
+    def _upload_callback(
+        request: requests.PreparedRequest,
+    ) -> tuple[int, dict[str, str], str]:
+        body: Any = request.body
+        if isinstance(body, (bytes, memoryview)):
+            content = bytes(body)
+        elif hasattr(body, "read"):
+            content = body.read()
+        else:
+            content = b"".join(body)
+        uploaded.append((content, request.headers["Content-Type"]))
+        return (
+            200,
+            {},
+            json.dumps(
+                {
+                    "accountId": "u1138",
+                    "blobId": "C2187",
+                    "type": request.headers["Content-Type"],
+                    "size": len(content),
+                }
+            ),
+        )
+
+    http_responses.add_callback(
+        method=responses.POST,
+        url="https://jmap-api.localhost/jmap/upload/u1138/",
+        callback=_upload_callback,
+    )
+    large_file = tempdir / "large.bin"
+    large_content = bytes(range(256)) * 8192
+    large_file.write_bytes(large_content)
+    uploads: list[UploadData] = [
+        b"bytes content",
+        memoryview(b"memoryview content"),
+        io.BytesIO(b"file object content"),
+        iter([b"chunk ", b"iterator ", b"content"]),
+    ]
+    for data in uploads:
+        assert client.upload_blob(data, content_type=content_type).size > 0
+    client.upload_blob(large_file, content_type=content_type)
+    assert uploaded == [
+        (b"bytes content", expected_content_type),
+        (b"memoryview content", expected_content_type),
+        (b"file object content", expected_content_type),
+        (b"chunk iterator content", expected_content_type),
+        (large_content, expected_content_type),
+    ]
+
+
 def test_download_attachment(
     client: Client, http_responses: responses.RequestsMock, tempdir: Path
 ) -> None:
@@ -465,3 +1052,295 @@ def test_download_attachment(
         dest_file,
     )
     assert dest_file.read_text() == blob_content
+
+
+def test_client_request_split_oversized_get(
+    client: Client, http_responses: responses.RequestsMock
+) -> None:
+    ids = [f"M{i}" for i in range(1200)]
+    chunks = [ids[:500], ids[500:1000], ids[1000:]]
+    expected_request = {
+        "methodCalls": [
+            [
+                "Mailbox/get",
+                {"accountId": "u1138", "ids": chunk},
+                f"single.Mailbox/get#{n}",
+            ]
+            for n, chunk in enumerate(chunks)
+        ],
+        "using": ["urn:ietf:params:jmap:core", "urn:ietf:params:jmap:mail"],
+    }
+    response = {
+        "methodResponses": [
+            [
+                "Mailbox/get",
+                {
+                    "accountId": "u1138",
+                    "list": [{"id": i, "name": i} for i in chunk],
+                    "notFound": [],
+                    "state": "1000",
+                },
+                f"single.Mailbox/get#{n}",
+            ]
+            for n, chunk in enumerate(chunks)
+        ],
+    }
+    expect_jmap_call(http_responses, expected_request, response)
+    result = client.request(MailboxGet(ids=ids), split_oversized=True)
+    assert isinstance(result, MailboxGetResponse)
+    assert [m.id for m in result.data] == ids
+    assert result.not_found == []
+    assert result.state == "1000"
+
+
+def test_client_request_split_max_calls(
+    client: Client, http_responses: responses.RequestsMock
+) -> None:
+    calls = [CoreEcho(data={"n": n}) for n in range(20)]
+    for batch in (range(16), range(16, 20)):
+        expect_jmap_call(
+            http_responses,
+            {
+                "methodCalls": [
+                    ["Core/echo", {"n": n}, f"{n}.Core/echo"] for n in batch
+                ],
+                "using": ["urn:ietf:params:jmap:core"],
+            },
+            {
+                "methodResponses": [
+                    ["Core/echo", {"n": n}, f"{n}.Core/echo"] for n in batch
+                ],
+            },
+        )
+    assert client.request(calls) == [
+        InvocationResponseOrError(
+            id=f"{n}.Core/echo", response=CoreEchoResponse(data={"n": n})
+        )
+        for n in range(20)
+    ]
+
+
+def test_client_request_many(
+    client: Client, http_responses: responses.RequestsMock
+) -> None:
+    def _echo_callback(
+        request: requests.PreparedRequest,
+    ) -> tuple[int, dict[str, str], str]:
+        method_calls = json.loads(request.body or "{}")["methodCalls"]
+        if method_calls[0][1] == {"n": 1}:
+            return (500, {}, "")
+        return (
+            200,
+            {},
+            json.dumps(
+                {
+                    "methodResponses": method_calls,
+                    "sessionState": "test;session;state",
+                }
+            ),
+        )
+
+    http_responses.add_callback(
+        method=responses.POST,
+        url="https://jmap-api.localhost/api",
+        callback=_echo_callback,
+    )
+    results = client.request_many(
+        [
+            CoreEcho(data={"n": 0}),
+            CoreEcho(data={"n": 1}),
+            [CoreEcho(data={"n": 2}), CoreEcho(data={"n": 3})],
+        ]
+    )
+    assert results[0] == CoreEchoResponse(data={"n": 0})
+    assert isinstance(results[1], requests.exceptions.HTTPError)
+    assert results[2] == [
+        InvocationResponseOrError(
+            id=f"{i}.Core/echo", response=CoreEchoResponse(data={"n": n})
+        )
+        for i, n in enumerate((2, 3))
+    ]
+
+
+def test_download_attachment_stream(
+    client: Client, http_responses: responses.RequestsMock
+) -> None:
+    blob_content = b"test download blob content" * 100
+    http_responses.add(
+        method=responses.GET,
+        url=(
+            "https://jmap-api.localhost/jmap/download"
+            "/u1138/C2187/download.txt?type=text/plain"
+        ),
+        body=gzip.compress(blob_content),
+        headers={"Content-Encoding": "gzip"},
+    )
+    attachment = EmailBodyPart(
+        name="download.txt",
+        blob_id="C2187",
+        type="text/plain",
+        size=len(blob_content),
+    )
+    progress: list[tuple[int, Optional[int]]] = []
+    dest = io.BytesIO()
+    client.download_attachment(
+        attachment, dest, progress=lambda *args: progress.append(args)
+    )
+    assert dest.getvalue() == blob_content
+    assert progress[-1] == (len(blob_content), len(blob_content))
+    chunks = list(client.stream_attachment(attachment, chunk_size=1000))
+    assert [len(c) for c in chunks] == [1000, 1000, 600]
+    assert b"".join(chunks) == blob_content
+
+
+def add_ranged_blob_response(
+    http_responses: responses.RequestsMock,
+    blob_content: bytes,
+    requested_ranges: list[str],
+) -> None:
+    def _range_callback(
+        request: requests.PreparedRequest,
+    ) -> tuple[int, dict[str, str], bytes]:
+        range_header = request.headers["Range"]
+        requested_ranges.append(range_header)
+        start, end = (int(v) for v in range_header[6:].split("-"))
+        end = min(end, len(blob_content) - 1)
+        return (
+            206,
+            {"Content-Range": f"bytes {start}-{end}/{len(blob_content)}"},
+            blob_content[start : end + 1],  # noqa: E203
+        )
+
+    http_responses.add_callback(
+        method=responses.GET,
+        url=(
+            "https://jmap-api.localhost/jmap/download"
+            "/u1138/C2187/download.bin?type=application/octet-stream"
+        ),
+        callback=_range_callback,
+    )
+
+
+def test_download_blob_ranged(
+    client: Client, http_responses: responses.RequestsMock, tempdir: Path
+) -> None:
+    blob_content = bytes(range(256)) * 40
+    requested_ranges: list[str] = []
+    add_ranged_blob_response(http_responses, blob_content, requested_ranges)
+    attachment = EmailBodyPart(
+        name="download.bin",
+        blob_id="C2187",
+        type="application/octet-stream",
+        size=len(blob_content),
+    )
+    dest_file = tempdir / "download.bin"
+    progress: list[tuple[int, Optional[int]]] = []
+    client.download_blob(
+        attachment,
+        dest_file,
+        segment_size=4096,
+        progress=lambda *args: progress.append(args),
+    )
+    assert dest_file.read_bytes() == blob_content
+    assert sorted(requested_ranges) == [
+        "bytes=0-4095",
+        "bytes=4096-8191",
+        "bytes=8192-10239",
+    ]
+    assert max(progress) == (len(blob_content), len(blob_content))
+    assert not (tempdir / "download.bin.jmapc-download").exists()
+
+
+def test_download_blob_resume(
+    client: Client, http_responses: responses.RequestsMock, tempdir: Path
+) -> None:
+    blob_content = bytes(range(256)) * 40
+    requested_ranges: list[str] = []
+    add_ranged_blob_response(http_responses, blob_content, requested_ranges)
+    dest_file = tempdir / "download.bin"
+    # Simulate an interrupted download with the second segment complete
+    partial_content = bytearray(len(blob_content))
+    partial_content[4096:8192] = blob_content[4096:8192]
+    dest_file.write_bytes(partial_content)
+    (tempdir / "download.bin.jmapc-download").write_text(
+        json.dumps(
+            {
+                "blobId": "C2187",
+                "size": len(blob_content),
+                "segmentSize": 4096,
+                "completed": [1],
+            }
+        )
+    )
+    client.download_blob(
+        EmailBodyPart(
+            name="download.bin",
+            blob_id="C2187",
+            type="application/octet-stream",
+        ),
+        dest_file,
+        segment_size=4096,
+    )
+    assert dest_file.read_bytes() == blob_content
+    assert sorted(requested_ranges) == ["bytes=0-4095", "bytes=8192-10239"]
+
+
+@pytest.mark.parametrize("content_range", ["bytes */0", "bytes */10"])
+def test_download_blob_unsatisfiable_range(
+    client: Client,
+    http_responses: responses.RequestsMock,
+    tempdir: Path,
+    content_range: str,
+) -> None:
+    http_responses.add(
+        method=responses.GET,
+        url=(
+            "https://jmap-api.localhost/jmap/download"
+            "/u1138/C2187/download.bin?type=application/octet-stream"
+        ),
+        status=416,
+        headers={"Content-Range": content_range},
+    )
+    dest_file = tempdir / "download.bin"
+    dest_file.write_bytes(b"stale content")
+    attachment = EmailBodyPart(
+        name="download.bin", blob_id="C2187", type="application/octet-stream"
+    )
+    progress: list[tuple[int, Optional[int]]] = []
+    if content_range != "bytes */0":
+        with pytest.raises(requests.HTTPError):
+            client.download_blob(attachment, dest_file)
+        return
+    # Empty blobs are downloaded as an empty file
+    client.download_blob(
+        attachment, dest_file, progress=lambda *args: progress.append(args)
+    )
+    assert dest_file.read_bytes() == b""
+    assert progress == [(0, 0)]
+
+
+def test_download_blob_without_range_support(
+    client: Client, http_responses: responses.RequestsMock, tempdir: Path
+) -> None:
+    blob_content = b"test download blob content"
+    http_responses.add(
+        method=responses.GET,
+        url=(
+            "https://jmap-api.localhost/jmap/download"
+            "/u1138/C2187/download.txt?type=text/plain"
+        ),
+        body=blob_content,
+    )
+    dest_file = tempdir / "download.txt"
+    attachment = EmailBodyPart(
+        name="download.txt", blob_id="C2187", type="text/plain"
+    )
+    with pytest.raises(Exception) as e:
+        client.download_blob(attachment, "")
+    assert str(e.value) == "Destination file name is required"
+    progress: list[tuple[int, Optional[int]]] = []
+    client.download_blob(
+        attachment, dest_file, progress=lambda *args: progress.append(args)
+    )
+    assert dest_file.read_bytes() == blob_content
+    assert progress == [(len(blob_content), None)]
@@ -0,0 +1,46 @@
+from typing import Any, cast
+
+import pytest
+
+from jmapc import (
+    JSONCodec,
+    MsgspecJSONCodec,
+    Operator,
+    OrjsonJSONCodec,
+    StdlibJSONCodec,
+)
+
+
+def _msgspec_codec() -> JSONCodec:
+    pytest.importorskip("msgspec")
+    return MsgspecJSONCodec()
+
+
+@pytest.fixture(params=[StdlibJSONCodec, OrjsonJSONCodec, _msgspec_codec])
+def codec(request: Any) -> JSONCodec:
+    return cast(JSONCodec, request.param())
+
+
+def test_codec_dumps_compact(codec: JSONCodec) -> None:
+    data = {
+        "using": {"urn:ietf:params:jmap:core"},
+        "operator": Operator.AND,
+        "name": "Pokémon",
+        "ids": ["f0001", "f0002"],
+    }
+    raw = codec.dumps(data)
+    assert isinstance(raw, bytes)
+    assert b" " not in raw
+    assert codec.loads(raw) == {
+        "using": ["urn:ietf:params:jmap:core"],
+        "operator": "AND",
+        "name": "Pokémon",
+        "ids": ["f0001", "f0002"],
+    }
+
+
+def test_codec_loads(codec: JSONCodec) -> None:
+    assert codec.loads('{"list": [], "state": "1000"}') == {
+        "list": [],
+        "state": "1000",
+    }
@@ -0,0 +1,159 @@
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+import pytest
+from dataclasses_json.core import _decode_dataclass
+
+from jmapc import (
+    Delivered,
+    DeliveryStatus,
+    Displayed,
+    Email,
+    EmailAddress,
+    EmailBodyPart,
+    EmailHeader,
+    EmailSubmission,
+    UndoStatus,
+)
+from jmapc.decoders import compile_decoder, model_decoder
+from jmapc.serializer import Model
+from jmapc.session import SessionCapabilities
+
+EMAIL_DATA: dict[str, Any] = {
+    "id": "f0001",
+    "blobId": "blob0001",
+    "threadId": "t0001",
+    "mailboxIds": {"MBX1": True},
+    "keywords": {"$seen": True},
+    "size": 1024,
+    "receivedAt": "1994-08-24T12:01:02Z",
+    "messageId": ["first@ness.onett.example.net"],
+    "headers": [{"name": "Subject", "value": "I have the Franklin Badge"}],
+    "from": [{"name": "Paula", "email": "paula@twoson.example.net"}],
+    "to": [{"name": "Ness", "email": "ness@onett.example.net"}],
+    "cc": None,
+    "subject": "I have the Franklin Badge",
+    "bodyStructure": {
+        "partId": "0",
+        "type": "multipart/mixed",
+        "subParts": [
+            {"partId": "1", "blobId": "part1", "type": "text/plain"},
+            {
+                "partId": "2",
+                "type": "multipart/alternative",
+                "subParts": [{"partId": "3", "type": "text/html"}],
+            },
+        ],
+    },
+    "bodyValues": {
+        "1": {"value": "Come see me", "isEncodingProblem": False},
+    },
+    "textBody": [{"partId": "1", "type": "text/plain", "size": 11}],
+    "hasAttachment": False,
+    "preview": "Come see me",
+}
+
+
+def test_email_decode() -> None:
+    email = Email.from_dict(EMAIL_DATA)
+    assert email == _decode_dataclass(Email, EMAIL_DATA, False)
+    assert email.received_at == datetime(
+        1994, 8, 24, 12, 1, 2, tzinfo=timezone.utc
+    )
+    assert email.mail_from == [
+        EmailAddress(name="Paula", email="paula@twoson.example.net")
+    ]
+    assert email.headers == [
+        EmailHeader(name="Subject", value="I have the Franklin Badge")
+    ]
+    assert email.body_structure
+    assert email.body_structure.sub_parts
+    assert email.body_structure.sub_parts[1].sub_parts == [
+        EmailBodyPart(part_id="3", type="text/html")
+    ]
+
+
+def test_email_submission_decode() -> None:
+    data = {
+        "id": "S2000",
+        "undoStatus": "final",
+        "sendAt": "1994-08-24T12:01:02Z",
+        "deliveryStatus": {
+            "ness@onett.example.net": {
+                "smtpReply": "250 OK",
+                "delivered": "yes",
+                "displayed": "unknown",
+            }
+        },
+        "envelope": {"mailFrom": {"email": "paula@twoson.example.net"}},
+    }
+    submission = EmailSubmission.from_dict(data)
+    assert submission == _decode_dataclass(EmailSubmission, data, False)
+    assert submission.undo_status == UndoStatus.FINAL
+    assert submission.delivery_status == {
+        "ness@onett.example.net": DeliveryStatus(
+            smtp_reply="250 OK",
+            delivered=Delivered.YES,
+            displayed=Displayed.UNKNOWN,
+        )
+    }
+
+
+def test_field_name_key() -> None:
+    @dataclass
+    class TestModel(Model):
+        camel_case_key: str
+        other_key: Optional[int] = None
+
+    assert TestModel.from_dict({"camel_case_key": "fourside"}) == TestModel(
+        camel_case_key="fourside"
+    )
+
+
+def test_missing_required_field() -> None:
+    @dataclass
+    class TestModel(Model):
+        required_key: str
+
+    with pytest.raises(KeyError):
+        TestModel.from_dict({})
+
+
+def test_non_optional_none_warning() -> None:
+    @dataclass
+    class TestModel(Model):
+        required_key: str
+
+    with pytest.warns(RuntimeWarning):
+        assert TestModel.from_dict({"requiredKey": None}) == TestModel(
+            required_key=None  # type: ignore[arg-type]
+        )
+
+
+def test_catch_all_fallback() -> None:
+    data = {
+        "urn:ietf:params:jmap:core": {
+            "maxSizeUpload": 50_000_000,
+            "maxConcurrentUpload": 4,
+            "maxSizeRequest": 10_000_000,
+            "maxConcurrentRequests": 4,
+            "maxCallsInRequest": 16,
+            "maxObjectsInGet": 500,
+            "maxObjectsInSet": 500,
+            "collationAlgorithms": ["i;ascii-casemap"],
+        },
+        "urn:ietf:params:jmap:mail": {},
+    }
+    capabilities = SessionCapabilities.from_dict(data)
+    assert capabilities == _decode_dataclass(SessionCapabilities, data, False)
+    assert capabilities.extensions == {"urn:ietf:params:jmap:mail": {}}
+
+
+def test_decoded_value_passthrough() -> None:
+    email = Email.from_dict(EMAIL_DATA)
+    assert compile_decoder(Email)(email) is email
+
+
+def test_decoder_cache() -> None:
+    assert model_decoder(Email) is model_decoder(Email)
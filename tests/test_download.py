@@ -0,0 +1,55 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from jmapc.download import SegmentedDownload, parse_content_range
+
+
+def test_parse_content_range() -> None:
+    assert parse_content_range("bytes 0-99/1000") == (0, 99, 1000)
+    with pytest.raises(ValueError):
+        parse_content_range("bytes */1000")
+    with pytest.raises(ValueError):
+        parse_content_range(None)
+
+
+def test_segmented_download(tempdir: Path) -> None:
+    download = SegmentedDownload(
+        path=tempdir / "blob.bin", blob_id="C2187", size=10, segment_size=4
+    )
+    download.prepare()
+    assert download.path.stat().st_size == 10
+    assert download.pending == [0, 1, 2]
+    assert download.segment_range(2) == (8, 9)
+    assert download.write_segment(2, [b"i", b"j"]) == 2
+    assert download.completed_bytes() == 2
+    assert json.loads(download.state_path.read_text())["completed"] == [2]
+    with pytest.raises(ValueError):
+        download.write_segment(0, [b"abc"])
+    with pytest.raises(ValueError):
+        download.write_segment(0, [b"abcde"])
+    # A new download of the same blob resumes from the saved state
+    resumed = SegmentedDownload(
+        path=tempdir / "blob.bin", blob_id="C2187", size=10, segment_size=4
+    )
+    resumed.prepare()
+    assert resumed.pending == [0, 1]
+    resumed.write_segment(0, [b"abcd"])
+    resumed.write_segment(1, [b"efgh"])
+    resumed.finish()
+    assert download.path.read_bytes() == b"abcdefghij"
+    assert not download.state_path.exists()
+
+
+def test_segmented_download_state_mismatch(tempdir: Path) -> None:
+    download = SegmentedDownload(
+        path=tempdir / "blob.bin", blob_id="C2187", size=10, segment_size=4
+    )
+    download.prepare()
+    download.write_segment(0, [b"abcd"])
+    other = SegmentedDownload(
+        path=tempdir / "blob.bin", blob_id="C9999", size=10, segment_size=4
+    )
+    other.prepare()
+    assert other.pending == [0, 1, 2]
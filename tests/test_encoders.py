@@ -0,0 +1,164 @@
+from datetime import datetime, timezone
+from typing import Any
+
+import pytest
+from dataclasses_json.core import _asdict
+
+from jmapc import (
+    Comparator,
+    Email,
+    EmailAddress,
+    EmailBodyPart,
+    EmailHeader,
+    EmailQueryFilterCondition,
+    EmailQueryFilterOperator,
+    Operator,
+    Ref,
+    ResultReference,
+)
+from jmapc.api import APIRequest
+from jmapc.encoders import compile_encoder, model_encoder
+from jmapc.methods import (
+    CustomMethod,
+    EmailGet,
+    EmailQuery,
+    EmailSet,
+    Invocation,
+    MailboxGet,
+)
+from jmapc.serializer import Model, ModelToDictPostprocessor
+
+METHOD_CALLS_SLICE = [
+    Invocation(id="0.Mailbox/query", method=MailboxGet(ids=[])),
+    Invocation(id="1.Email/query", method=EmailQuery()),
+]
+
+
+def postprocessed_to_dict(model: Model) -> dict[str, Any]:
+    # Two-pass encoding the compiled encoders replace
+    todict = ModelToDictPostprocessor(METHOD_CALLS_SLICE)
+    return todict.postprocess(_asdict(model))
+
+
+@pytest.mark.parametrize(
+    "model",
+    [
+        EmailGet(
+            ids=Ref("/ids", method="1.Email/query"),
+            properties=["id", "subject"],
+            fetch_html_body_values=True,
+        ),
+        EmailGet(
+            ids=ResultReference(
+                name="Email/query", path="/ids", result_of="1.Email/query"
+            ),
+        ),
+        EmailQuery(
+            filter=EmailQueryFilterOperator(
+                operator=Operator.OR,
+                conditions=[
+                    EmailQueryFilterCondition(in_mailbox="MBX1"),
+                    EmailQueryFilterCondition(in_mailbox=Ref("/ids/0")),
+                ],
+            ),
+            sort=[Comparator(property="receivedAt", is_ascending=False)],
+        ),
+        EmailQuery(
+            filter=EmailQueryFilterCondition(
+                in_mailbox=Ref("/ids/0", method=0),
+                after=datetime(1994, 8, 24, 12, 1, 2, tzinfo=timezone.utc),
+            ),
+        ),
+        EmailSet(
+            create={
+                "draft": Email(
+                    mail_from=[
+                        EmailAddress(
+                            name="Paula", email="paula@twoson.example.net"
+                        )
+                    ],
+                    headers=[
+                        EmailHeader(name="X-Onett", value="Ness"),
+                        EmailHeader(name="X-Twoson", value="Paula"),
+                    ],
+                    body_structure=EmailBodyPart(
+                        type="multipart/mixed",
+                        headers=[EmailHeader(name="X-Part", value="0")],
+                        sub_parts=[
+                            EmailBodyPart(
+                                part_id="1",
+                                headers=[
+                                    EmailHeader(name="X-Part", value="1")
+                                ],
+                            )
+                        ],
+                    ),
+                    keywords={"$draft": True},
+                    mailbox_ids={"MBX1": True},
+                )
+            },
+            update={"f0001": {"keywords/$seen": True}},
+            destroy=Ref("/ids"),
+        ),
+    ],
+)
+def test_encoder_matches_postprocessed_dict(model: Model) -> None:
+    todict = ModelToDictPostprocessor(METHOD_CALLS_SLICE)
+    assert model_encoder(type(model))(model, todict) == postprocessed_to_dict(
+        model
+    )
+
+
+def test_encoder_rewrites_fields() -> None:
+    email = Email(
+        subject="I have the Franklin Badge",
+        headers=[EmailHeader(name="X-Onett", value="Ness")],
+    )
+    assert email.to_dict() == {
+        "subject": "I have the Franklin Badge",
+        "header:X-Onett": "Ness",
+    }
+    method = EmailGet(ids=Ref("/ids", method=1))
+    assert method.to_dict(
+        account_id="u1138", method_calls_slice=METHOD_CALLS_SLICE
+    ) == {
+        "accountId": "u1138",
+        "#ids": {
+            "name": "Email/query",
+            "path": "/ids",
+            "resultOf": "1.Email/query",
+        },
+    }
+
+
+def test_encoder_unexpected_value_type() -> None:
+    # Values not matching their field types are encoded by dataclasses_json
+    email = Email(to=Ref("/ids"))  # type: ignore[arg-type]
+    todict = ModelToDictPostprocessor(METHOD_CALLS_SLICE)
+    assert model_encoder(Email)(email, todict) == postprocessed_to_dict(email)
+
+
+def test_encoder_untyped_field() -> None:
+    method = CustomMethod(data={"ids": ["f0001"]})
+    todict = ModelToDictPostprocessor(METHOD_CALLS_SLICE)
+    assert compile_encoder(CustomMethod)(method, todict) == (
+        postprocessed_to_dict(method)
+    )
+    assert model_encoder(Email) is model_encoder(Email)
+
+
+def test_api_request_to_dict() -> None:
+    api_request = APIRequest.from_calls(
+        "u1138",
+        [
+            EmailQuery(filter=EmailQueryFilterCondition(in_mailbox="MBX1")),
+            EmailSet(create={"draft": Email(subject="Franklin Badge")}),
+        ],
+    )
+    data = api_request.to_dict()
+    assert data == _asdict(api_request)
+    assert data == api_request.to_dict(encode_json=True)
+    # Method call arguments are encoded once, when the request is built
+    method_calls = data["methodCalls"]
+    assert isinstance(method_calls, list)
+    assert method_calls[1][1] is api_request.method_calls[1][1]
@@ -89,6 +89,7 @@ def test_event_source_url(
             expected_call_url,
             auth=("ness", "pk_fire"),
             last_id=None,
+            session=client.requests_session,
         )
 
 
@@ -179,4 +180,5 @@ def test_event_source(
         "https://jmap-api.localhost/events/*/no/0",
         auth=("ness", "pk_fire"),
         last_id=None,
+        session=client.requests_session,
     )
@@ -0,0 +1,158 @@
+import asyncio
+import json
+import logging
+from typing import Any
+
+import pytest
+import requests
+import responses
+from aioresponses import aioresponses
+
+from jmapc import (
+    AsyncClient,
+    Client,
+    Email,
+    RequestHooks,
+    RequestInfo,
+    ResponseInfo,
+    RetryPolicy,
+)
+from jmapc.methods import CoreEcho, CoreEchoResponse, EmailGet
+
+api_url = "https://jmap-api.localhost/api"
+echo_response = {
+    "methodResponses": [["Core/echo", {"n": 1}, "single.Core/echo"]],
+    "sessionState": "test;session;state",
+}
+
+
+class RecordingHooks(RequestHooks):
+    def __init__(self) -> None:
+        self.calls: list[tuple[str, Any]] = []
+
+    def before_request(self, info: RequestInfo) -> None:
+        self.calls.append(("before_request", info))
+
+    def after_response(self, info: ResponseInfo) -> None:
+        self.calls.append(("after_response", info))
+
+    def on_error(
+        self, info: RequestInfo, error: BaseException, duration: float
+    ) -> None:
+        assert duration >= 0
+        self.calls.append(("on_error", error))
+
+
+def test_hooks(http_responses: responses.RequestsMock) -> None:
+    hooks = RecordingHooks()
+    client = Client(
+        host="jmap-example.localhost",
+        auth=("ness", "pk_fire"),
+        retry_policy=RetryPolicy(backoff=0, jitter=False),
+        hooks=hooks,
+    )
+    http_responses.add(method=responses.POST, url=api_url, status=429)
+    http_responses.add(
+        method=responses.POST, url=api_url, body=json.dumps(echo_response)
+    )
+    assert client.request(CoreEcho(data={"n": 1})) == CoreEchoResponse(
+        data={"n": 1}
+    )
+    assert [name for name, _ in hooks.calls] == [
+        "before_request",
+        "on_error",
+        "before_request",
+        "after_response",
+    ]
+    request_info = hooks.calls[0][1]
+    assert request_info.url == api_url
+    assert request_info.method_names == ["Core/echo"]
+    assert request_info.attempt == 1
+    assert request_info.request_bytes == len(request_info.request_body)
+    assert isinstance(hooks.calls[1][1], requests.HTTPError)
+    response_info = hooks.calls[3][1]
+    assert response_info.request.attempt == 2
+    assert response_info.status == 200
+    assert response_info.response_bytes == len(json.dumps(echo_response))
+    assert response_info.duration >= 0
+    assert json.loads(response_info.response_body or b"") == echo_response
+
+
+def test_hooks_request_stream(http_responses: responses.RequestsMock) -> None:
+    hooks = RecordingHooks()
+    client = Client(
+        host="jmap-example.localhost", auth=("ness", "pk_fire"), hooks=hooks
+    )
+    response = {
+        "methodResponses": [
+            [
+                "Email/get",
+                {"list": [{"id": "f0001"}], "notFound": [], "state": "2187"},
+                "single.Email/get",
+            ]
+        ],
+        "sessionState": "test;session;state",
+    }
+    http_responses.add(
+        method=responses.POST, url=api_url, body=json.dumps(response)
+    )
+    http_responses.add(method=responses.POST, url=api_url, status=500)
+    assert list(client.request_stream(EmailGet(ids=["f0001"]))) == [
+        Email(id="f0001")
+    ]
+    with pytest.raises(requests.HTTPError):
+        list(client.request_stream(EmailGet(ids=["f0001"])))
+    assert [name for name, _ in hooks.calls] == [
+        "before_request",
+        "after_response",
+        "before_request",
+        "on_error",
+    ]
+    response_info = hooks.calls[1][1]
+    assert response_info.request.method_names == ["Email/get"]
+    assert response_info.response_bytes == len(json.dumps(response))
+    assert response_info.response_body is None
+
+
+def test_hooks_async(aio_responses: aioresponses) -> None:
+    hooks = RecordingHooks()
+    aio_responses.post(api_url, payload=echo_response)
+
+    async def _test() -> None:
+        async with AsyncClient(
+            host="jmap-example.localhost",
+            auth=("ness", "pk_fire"),
+            hooks=hooks,
+        ) as client:
+            assert await client.request(
+                CoreEcho(data={"n": 1})
+            ) == CoreEchoResponse(data={"n": 1})
+
+    asyncio.run(_test())
+    assert [name for name, _ in hooks.calls] == [
+        "before_request",
+        "after_response",
+    ]
+    assert hooks.calls[1][1].status == 200
+
+
+def test_debug_logging(
+    client: Client,
+    http_responses: responses.RequestsMock,
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    http_responses.add(
+        method=responses.POST, url=api_url, body=json.dumps(echo_response)
+    )
+    http_responses.add(
+        method=responses.POST, url=api_url, body=json.dumps(echo_response)
+    )
+    with caplog.at_level(logging.INFO, logger="jmapc"):
+        client.request(CoreEcho(data={"n": 1}))
+    assert not caplog.records
+    with caplog.at_level(logging.DEBUG, logger="jmapc"):
+        client.request(CoreEcho(data={"n": 1}))
+    assert [r.getMessage().split(" {")[0] for r in caplog.records] == [
+        "Sending JMAP request",
+        "Received JMAP response",
+    ]
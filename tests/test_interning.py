@@ -0,0 +1,193 @@
+import json
+from collections.abc import Iterable
+from typing import Any
+
+import pytest
+
+from jmapc import Client, Email, SlottedEmail, StringInterner
+from jmapc.interning import (
+    ADDRESSES,
+    COMMON,
+    THREAD_IDS,
+    current_interner,
+    interning,
+)
+from jmapc.methods import EmailGet, EmailGetResponse
+from jmapc.testing import JMAPServer, JMAPStore
+
+EMAIL_JSON = json.dumps(
+    {
+        "id": "f0001",
+        "threadId": "t0001",
+        "mailboxIds": {"MBX1": True, "MBX2": True},
+        "keywords": {"$seen": True},
+        "from": [{"name": "Paula", "email": "paula@twoson.example.net"}],
+        "headers": [{"name": "Subject", "value": "Franklin Badge"}],
+        "subject": "Franklin Badge",
+        "textBody": [
+            {
+                "partId": "1",
+                "type": "text/plain",
+                "charset": "utf-8",
+                "language": ["en"],
+            }
+        ],
+    }
+)
+
+
+@pytest.fixture
+def server() -> Iterable[JMAPServer]:
+    store = JMAPStore()
+    store.seed(10)
+    with JMAPServer(store) as server:
+        yield server
+
+
+def common_values(email: Any) -> list[str]:
+    body = email.text_body[0]
+    return [
+        *email.mailbox_ids,
+        *email.keywords,
+        email.headers[0].name,
+        body.type,
+        body.charset,
+        body.language[0],
+    ]
+
+
+def opt_in_values(email: Any) -> list[str]:
+    return [
+        email.thread_id,
+        email.mail_from[0].name,
+        email.mail_from[0].email,
+    ]
+
+
+def test_string_interner() -> None:
+    interner = StringInterner(max_size=2)
+    a = interner.intern("".join(["a", "b"]))
+    assert interner.intern("".join(["a", "b"])) is a
+    assert interner.intern("cd") == "cd"
+    assert len(interner) == 2
+    # New strings are not stored once the interner is full
+    e = "".join(["e", "f"])
+    assert interner.intern(e) is e
+    assert interner.intern("".join(["e", "f"])) is not e
+    assert "ef" not in interner
+    interner.clear()
+    assert len(interner) == 0
+
+
+def test_interning_context() -> None:
+    interner = StringInterner()
+    assert current_interner() is None
+    with interning(interner):
+        assert current_interner() is interner
+    assert current_interner() is None
+
+
+@pytest.mark.parametrize("model", [Email, SlottedEmail])
+def test_decode_interned_fields(model: Any) -> None:
+    interner = StringInterner()
+    with interning(interner):
+        first = model.from_dict(json.loads(EMAIL_JSON))
+        second = model.from_dict(json.loads(EMAIL_JSON))
+    assert first == second
+    for a, b in zip(common_values(first), common_values(second)):
+        assert a is b
+        assert a in interner
+    # Thread IDs and addresses are only interned on request
+    for a, b in zip(opt_in_values(first), opt_in_values(second)):
+        assert a == b
+        assert a is not b
+        assert a not in interner
+    # Fields with high-cardinality values are not interned
+    assert first.subject == second.subject
+    assert first.subject is not second.subject
+    assert "Franklin Badge" not in interner
+
+
+def test_decode_interned_opt_in_fields() -> None:
+    interner = StringInterner(categories={COMMON, THREAD_IDS, ADDRESSES})
+    with interning(interner):
+        first = Email.from_dict(json.loads(EMAIL_JSON))
+        second = Email.from_dict(json.loads(EMAIL_JSON))
+    for a, b in zip(opt_in_values(first), opt_in_values(second)):
+        assert a is b
+        assert a in interner
+
+
+def test_client_interner(server: JMAPServer) -> None:
+    interner = StringInterner()
+    client = Client(
+        host=server.url, auth=("ness", "pk_fire"), interner=interner
+    )
+    response = client.request(EmailGet(ids=["M0", "M1"]))
+    assert isinstance(response, EmailGetResponse)
+    streamed = list(client.request_stream(EmailGet(ids=["M0", "M1"])))
+    emails = [*response.data, *streamed]
+    assert len(emails) == 4
+    for email in emails:
+        for value in [
+            *email.mailbox_ids,
+            email.text_body[0].type,
+            email.text_body[0].charset,
+        ]:
+            assert interner.intern(value) is value
+    assert emails[0].text_body[0].type is emails[3].text_body[0].type
+    assert current_interner() is None
+
+
+def test_client_interner_lazy_responses(server: JMAPServer) -> None:
+    interner = StringInterner()
+    client = Client(
+        host=server.url,
+        auth=("ness", "pk_fire"),
+        lazy_responses=True,
+        interner=interner,
+    )
+    response = client.request(EmailGet(ids=["M0"]))
+    # Lazily decoded responses use the interner of the client
+    assert isinstance(response, EmailGetResponse)
+    text_body = response.data[0].text_body
+    assert text_body
+    assert text_body[0].type in interner
+
+
+def test_client_without_interner(server: JMAPServer) -> None:
+    # Strings are only interned for clients with an interner
+    client = Client(host=server.url, auth=("ness", "pk_fire"))
+    first, second = (Email.from_dict(json.loads(EMAIL_JSON)) for _ in range(2))
+    for a, b in zip(common_values(first), common_values(second)):
+        assert a == b
+        assert a is not b
+    response = client.request(EmailGet(ids=["M0", "M1"]))
+    assert isinstance(response, EmailGetResponse)
+    types = [e.text_body[0].type for e in response.data if e.text_body]
+    assert types[0] == types[1]
+    assert types[0] is not types[1]
+
+
+def test_client_interner_max_size(server: JMAPServer) -> None:
+    interner = StringInterner(max_size=2)
+    client = Client(
+        host=server.url, auth=("ness", "pk_fire"), interner=interner
+    )
+    response = client.request(EmailGet(ids=["M0", "M1"]))
+    assert isinstance(response, EmailGetResponse)
+    # Only the first strings decoded are interned once the interner is full
+    assert sorted(interner._strings) == ["MB1", "text/plain"]
+    first, second = (e.text_body[0] for e in response.data if e.text_body)
+    assert first.type is second.type
+    assert first.charset == second.charset
+    assert first.charset is not second.charset
+    assert first.charset not in interner
+    # Clearing the interner makes room for new strings
+    interner.clear()
+    interner.intern("utf-8")
+    response = client.request(EmailGet(ids=["M0", "M1"]))
+    assert isinstance(response, EmailGetResponse)
+    first, second = (e.text_body[0] for e in response.data if e.text_body)
+    assert first.charset is second.charset
+    assert len(interner) == 2
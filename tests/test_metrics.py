@@ -0,0 +1,179 @@
+import asyncio
+import json
+import time
+
+import responses
+from aioresponses import aioresponses
+
+from jmapc import (
+    AsyncClient,
+    Client,
+    PrometheusExporter,
+    RequestMetrics,
+)
+from jmapc.methods import CoreEcho, CoreEchoResponse, MailboxGet
+from jmapc.metrics import PHASES, Histogram
+
+api_url = "https://jmap-api.localhost/api"
+echo_response = {
+    "methodResponses": [
+        ["Core/echo", {"n": 1}, "0.Core/echo"],
+        ["Core/echo", {"n": 2}, "1.Core/echo"],
+        [
+            "Mailbox/get",
+            {"accountId": "u1138", "list": [], "notFound": [], "state": "1"},
+            "2.Mailbox/get",
+        ],
+    ],
+    "sessionState": "test;session;state",
+}
+echo_calls = [
+    CoreEcho(data={"n": 1}),
+    CoreEcho(data={"n": 2}),
+    MailboxGet(ids=None),
+]
+
+
+def test_histogram() -> None:
+    histogram = Histogram([10, 1, 5])
+    for value in (0.5, 1, 3, 7, 100):
+        histogram.observe(value)
+    assert histogram.buckets == (1, 5, 10)
+    assert histogram.counts == [2, 1, 1, 1]
+    assert histogram.cumulative_counts() == [
+        (1, 2),
+        (5, 3),
+        (10, 4),
+        (float("inf"), 5),
+    ]
+    assert histogram.sum == 111.5
+    assert histogram.count == 5
+
+
+def test_nested_phase_time() -> None:
+    metrics = RequestMetrics()
+    with metrics.time("prepare"), metrics.time("encode"):
+        time.sleep(0.1)
+    assert metrics.phases["encode"].sum >= 0.1
+    assert metrics.phases["prepare"].sum < 0.05
+
+
+def assert_request_metrics(metrics: RequestMetrics) -> None:
+    assert metrics.requests == 1
+    assert metrics.http_requests == 1
+    assert metrics.methods == {"Core/echo": 2, "Mailbox/get": 1}
+    assert metrics.method_calls.sum == 3
+    assert {phase: h.count for phase, h in metrics.phases.items()} == {
+        phase: 1 for phase in PHASES
+    }
+    assert metrics.request_bytes.count == 1
+    assert metrics.response_bytes.count == 1
+
+
+def test_client_metrics(http_responses: responses.RequestsMock) -> None:
+    metrics = RequestMetrics()
+    client = Client(
+        host="jmap-example.localhost",
+        auth=("ness", "pk_fire"),
+        metrics=metrics,
+    )
+    http_responses.add(
+        method=responses.POST, url=api_url, body=json.dumps(echo_response)
+    )
+    assert client.request(echo_calls)[0].response == CoreEchoResponse(
+        data={"n": 1}
+    )
+    assert_request_metrics(metrics)
+    assert metrics.response_bytes.sum == len(json.dumps(echo_response))
+
+
+def test_client_metrics_split_request(
+    http_responses: responses.RequestsMock,
+) -> None:
+    metrics = RequestMetrics()
+    client = Client(
+        host="jmap-example.localhost",
+        auth=("ness", "pk_fire"),
+        metrics=metrics,
+    )
+    client.jmap_session.capabilities.core.max_calls_in_request = 2
+    for method_responses in (
+        echo_response["methodResponses"][:2],
+        echo_response["methodResponses"][2:],
+    ):
+        http_responses.add(
+            method=responses.POST,
+            url=api_url,
+            body=json.dumps(
+                dict(echo_response, methodResponses=method_responses)
+            ),
+        )
+    assert len(client.request(echo_calls)) == 3
+    # Request counts and method calls are for the request as made, while
+    # sizes are for each HTTP request
+    assert metrics.requests == 1
+    assert metrics.method_calls.count == 1
+    assert metrics.http_requests == 2
+    assert metrics.request_bytes.count == 2
+    assert metrics.response_bytes.count == 2
+
+
+def test_async_client_metrics(aio_responses: aioresponses) -> None:
+    metrics = RequestMetrics()
+    aio_responses.post(api_url, payload=echo_response)
+
+    async def _test() -> None:
+        async with AsyncClient(
+            host="jmap-example.localhost",
+            auth=("ness", "pk_fire"),
+            metrics=metrics,
+        ) as client:
+            await client.request(echo_calls)
+
+    asyncio.run(_test())
+    assert_request_metrics(metrics)
+
+
+def test_prometheus_exporter() -> None:
+    metrics = RequestMetrics(
+        duration_buckets=[0.1, 1], size_buckets=[1024], count_buckets=[1]
+    )
+    metrics.observe_phase("network", 0.5)
+    metrics.observe_sizes(100, 2048)
+    metrics.methods.update(["Core/echo", "Core/echo", "Mailbox/get"])
+    metrics.method_calls.observe(3)
+    metrics.requests = 1
+    output = metrics.export(PrometheusExporter(prefix="test")).splitlines()
+    assert output[:11] == [
+        "# HELP test_requests_total JMAP API requests",
+        "# TYPE test_requests_total counter",
+        "test_requests_total 1",
+        "# HELP test_http_requests_total JMAP API HTTP requests, after"
+        " splitting large requests",
+        "# TYPE test_http_requests_total counter",
+        "test_http_requests_total 1",
+        "# HELP test_method_calls_total JMAP method calls by method",
+        "# TYPE test_method_calls_total counter",
+        'test_method_calls_total{method="Core/echo"} 2',
+        'test_method_calls_total{method="Mailbox/get"} 1',
+        "# HELP test_phase_duration_seconds Request phase durations",
+    ]
+    assert [
+        'test_phase_duration_seconds_bucket{phase="network",le="0.1"} 0',
+        'test_phase_duration_seconds_bucket{phase="network",le="1"} 1',
+        'test_phase_duration_seconds_bucket{phase="network",le="+Inf"} 1',
+        'test_phase_duration_seconds_sum{phase="network"} 0.5',
+        'test_phase_duration_seconds_count{phase="network"} 1',
+    ] == [line for line in output if 'phase="network"' in line]
+    assert output[-10:] == [
+        'test_response_bytes_bucket{le="1024"} 0',
+        'test_response_bytes_bucket{le="+Inf"} 1',
+        "test_response_bytes_sum 2048.0",
+        "test_response_bytes_count 1",
+        "# HELP test_request_method_calls Method calls per request",
+        "# TYPE test_request_method_calls histogram",
+        'test_request_method_calls_bucket{le="1"} 0',
+        'test_request_method_calls_bucket{le="+Inf"} 1',
+        "test_request_method_calls_sum 3.0",
+        "test_request_method_calls_count 1",
+    ]
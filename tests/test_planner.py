@@ -0,0 +1,644 @@
+from typing import Any, Optional
+
+import pytest
+
+from jmapc.api import APIRequest, decode_api_response
+from jmapc.codec import StdlibJSONCodec
+from jmapc.errors import Forbidden, RequestTooLarge
+from jmapc.methods import (
+    CoreEcho,
+    CoreEchoResponse,
+    EmailGet,
+    EmailGetResponse,
+    EmailQuery,
+    EmailSet,
+    EmailSetResponse,
+    EmailSubmissionSet,
+    EmailSubmissionSetResponse,
+    InvocationResponseOrError,
+    MailboxSet,
+    MailboxSetResponse,
+    ThreadGet,
+)
+from jmapc.models import (
+    Email,
+    EmailQueryFilterCondition,
+    EmailQueryFilterOperator,
+    EmailSubmission,
+    Mailbox,
+    Operator,
+    SetError,
+)
+from jmapc.planner import (
+    RequestPlan,
+    call_dependencies,
+    chunked,
+    result_references,
+    split_method_calls,
+)
+from jmapc.ref import Ref
+
+
+def test_chunked() -> None:
+    assert list(chunked(range(7), 3)) == [[0, 1, 2], [3, 4, 5], [6]]
+    assert list(chunked([], 3)) == []
+
+
+def test_result_references() -> None:
+    args = {
+        "accountId": "u1138",
+        "filter": {
+            "conditions": [
+                {"#inMailbox": {"resultOf": "0", "name": "x", "path": "/"}}
+            ]
+        },
+        "#ids": {"resultOf": "1", "name": "y", "path": "/ids"},
+    }
+    assert sorted(result_references(args)) == ["0", "1"]
+
+
+def make_get_response(ids: list[str], not_found: list[str]) -> dict[str, Any]:
+    return {
+        "accountId": "u1138",
+        "list": [{"id": i} for i in ids],
+        "notFound": not_found,
+        "state": "2000",
+    }
+
+
+def test_plan_without_limits() -> None:
+    api_request = APIRequest.from_calls("u1138", EmailGet(ids=["a", "b"]))
+    plan = RequestPlan.from_request(api_request)
+    assert plan.requests == [api_request]
+    assert plan.chunked_calls == {}
+    plan = RequestPlan.from_request(api_request, max_objects_in_get=2)
+    assert plan.requests == [api_request]
+
+
+def test_plan_split_get() -> None:
+    api_request = APIRequest.from_calls(
+        "u1138",
+        [
+            CoreEcho(data={"hello": "world"}),
+            EmailGet(ids=["a", "b", "c", "d", "e"], properties=["id"]),
+            ThreadGet(ids=["t1", "t2", "t3"]),
+            EmailGet(ids=Ref("/list/*/emailIds")),
+        ],
+    )
+    plan = RequestPlan.from_request(api_request, max_objects_in_get=2)
+    assert plan.requests[0].using == api_request.using
+    assert [
+        (c[0], c[1].get("ids"), c[2]) for c in plan.requests[0].method_calls
+    ] == [
+        ("Core/echo", None, "0.Core/echo"),
+        ("Email/get", ["a", "b"], "1.Email/get#0"),
+        ("Email/get", ["c", "d"], "1.Email/get#1"),
+        ("Email/get", ["e"], "1.Email/get#2"),
+        # Referenced by the following call, so not split
+        ("Thread/get", ["t1", "t2", "t3"], "2.Thread/get"),
+        ("Email/get", None, "3.Email/get"),
+    ]
+    assert plan.requests[0].method_calls[2][1]["properties"] == ["id"]
+    api_response = decode_api_response(
+        plan.combine_responses(
+            [
+                {
+                    "methodResponses": [
+                        ["Core/echo", {"hello": "world"}, "0.Core/echo"],
+                        [
+                            "Email/get",
+                            make_get_response(["a"], ["b"]),
+                            "1.Email/get#0",
+                        ],
+                        [
+                            "Email/get",
+                            make_get_response(["c", "d"], []),
+                            "1.Email/get#1",
+                        ],
+                        [
+                            "Email/get",
+                            make_get_response(["e"], []),
+                            "1.Email/get#2",
+                        ],
+                        [
+                            "Thread/get",
+                            {
+                                "accountId": "u1138",
+                                "list": [],
+                                "notFound": [],
+                                "state": "1",
+                            },
+                            "2.Thread/get",
+                        ],
+                        [
+                            "Email/get",
+                            make_get_response([], []),
+                            "3.Email/get",
+                        ],
+                    ],
+                    "sessionState": "test;session;state",
+                }
+            ]
+        )
+    )
+    assert [r.id for r in api_response.method_responses] == [
+        "0.Core/echo",
+        "1.Email/get",
+        "2.Thread/get",
+        "3.Email/get",
+    ]
+    assert api_response.method_responses[1] == InvocationResponseOrError(
+        id="1.Email/get",
+        response=EmailGetResponse(
+            account_id="u1138",
+            state="2000",
+            not_found=["b"],
+            data=[Email(id="a"), Email(id="c"), Email(id="d"), Email(id="e")],
+        ),
+    )
+
+
+@pytest.mark.parametrize("error_chunk", [0, 1])
+def test_plan_split_get_error(error_chunk: int) -> None:
+    api_request = APIRequest.from_calls("u1138", EmailGet(ids=["a", "b"]))
+    plan = RequestPlan.from_request(api_request, max_objects_in_get=1)
+    method_responses: list[Any] = [
+        ["Email/get", make_get_response(["a"], []), "single.Email/get#0"],
+        ["Email/get", make_get_response(["b"], []), "single.Email/get#1"],
+    ]
+    method_responses[error_chunk] = [
+        "error",
+        {"type": "requestTooLarge"},
+        f"single.Email/get#{error_chunk}",
+    ]
+    api_response = decode_api_response(
+        plan.combine_responses(
+            [{"methodResponses": method_responses, "sessionState": "1"}]
+        )
+    )
+    assert api_response.method_responses == [
+        InvocationResponseOrError(
+            id="single.Email/get", response=RequestTooLarge()
+        )
+    ]
+
+
+def test_plan_split_set() -> None:
+    api_request = APIRequest.from_calls(
+        "u1138",
+        MailboxSet(
+            if_in_state="1000",
+            create={
+                "new1": Mailbox(name="Onett"),
+                "new2": Mailbox(name="Twoson"),
+            },
+            update={"MB1": {"name": "Threed"}},
+            destroy=["MB2", "MB3"],
+            on_destroy_remove_emails=True,
+        ),
+    )
+    plan = RequestPlan.from_request(api_request, max_objects_in_set=2)
+    assert plan.requests[0].method_calls == [
+        (
+            "Mailbox/set",
+            {
+                "accountId": "u1138",
+                "ifInState": "1000",
+                "create": {
+                    "new1": {
+                        "name": "Onett",
+                        "isSubscribed": False,
+                        "sortOrder": 0,
+                    },
+                    "new2": {
+                        "name": "Twoson",
+                        "isSubscribed": False,
+                        "sortOrder": 0,
+                    },
+                },
+                "onDestroyRemoveEmails": True,
+            },
+            "single.Mailbox/set#0",
+        ),
+        (
+            "Mailbox/set",
+            {
+                "accountId": "u1138",
+                "update": {"MB1": {"name": "Threed"}},
+                "destroy": ["MB2"],
+                "onDestroyRemoveEmails": True,
+            },
+            "single.Mailbox/set#1",
+        ),
+        (
+            "Mailbox/set",
+            {
+                "accountId": "u1138",
+                "destroy": ["MB3"],
+                "onDestroyRemoveEmails": True,
+            },
+            "single.Mailbox/set#2",
+        ),
+    ]
+    api_response = decode_api_response(
+        plan.combine_responses(
+            [
+                {
+                    "methodResponses": [
+                        [
+                            "Mailbox/set",
+                            {
+                                "accountId": "u1138",
+                                "oldState": "1000",
+                                "newState": "1001",
+                                "created": {"new1": {"id": "MB4"}},
+                                "notCreated": {
+                                    "new2": {"type": "invalidProperties"}
+                                },
+                                "updated": None,
+                                "destroyed": None,
+                            },
+                            "single.Mailbox/set#0",
+                        ],
+                        [
+                            "error",
+                            {"type": "serverUnavailable"},
+                            "single.Mailbox/set#1",
+                        ],
+                        [
+                            "Mailbox/set",
+                            {
+                                "accountId": "u1138",
+                                "oldState": "1001",
+                                "newState": "1002",
+                                "created": None,
+                                "updated": None,
+                                "destroyed": ["MB3"],
+                            },
+                            "single.Mailbox/set#2",
+                        ],
+                    ],
+                    "sessionState": "test;session;state",
+                }
+            ]
+        )
+    )
+    assert api_response.method_responses == [
+        InvocationResponseOrError(
+            id="single.Mailbox/set",
+            response=MailboxSetResponse(
+                account_id="u1138",
+                old_state="1000",
+                new_state="1002",
+                created={"new1": Mailbox(id="MB4")},
+                updated=None,
+                destroyed=["MB3"],
+                not_created={"new2": SetError(type="invalidProperties")},
+                not_updated={"MB1": SetError(type="serverUnavailable")},
+                not_destroyed={"MB2": SetError(type="serverUnavailable")},
+            ),
+        )
+    ]
+
+
+def test_plan_split_set_all_chunks_failed() -> None:
+    api_request = APIRequest.from_calls(
+        "u1138", EmailSet(destroy=["M1", "M2"])
+    )
+    plan = RequestPlan.from_request(api_request, max_objects_in_set=1)
+    api_response = decode_api_response(
+        plan.combine_responses(
+            [
+                {
+                    "methodResponses": [
+                        ["error", {"type": "forbidden"}, "single.Email/set#0"],
+                        ["error", {"type": "forbidden"}, "single.Email/set#1"],
+                    ],
+                    "sessionState": "test;session;state",
+                }
+            ]
+        )
+    )
+    assert api_response.method_responses == [
+        InvocationResponseOrError(id="single.Email/set", response=Forbidden())
+    ]
+
+
+def test_plan_split_set_on_success() -> None:
+    api_request = APIRequest.from_calls(
+        "u1138",
+        EmailSubmissionSet(
+            create={
+                "s1": EmailSubmission(email_id="M1", identity_id="I1"),
+                "s2": EmailSubmission(email_id="M2", identity_id="I1"),
+            },
+            on_success_update_email={
+                "#s1": {"keywords/$draft": None},
+                "#s2": {"keywords/$draft": None},
+            },
+            on_success_destroy_email=["#s2"],
+        ),
+    )
+    plan = RequestPlan.from_request(api_request, max_objects_in_set=1)
+    # Each chunk is sent the actions for the submissions it creates
+    assert [c[1] for c in plan.requests[0].method_calls] == [
+        {
+            "accountId": "u1138",
+            "create": {"s1": {"identityId": "I1", "emailId": "M1"}},
+            "onSuccessUpdateEmail": {"#s1": {"keywords/$draft": None}},
+        },
+        {
+            "accountId": "u1138",
+            "create": {"s2": {"identityId": "I1", "emailId": "M2"}},
+            "onSuccessUpdateEmail": {"#s2": {"keywords/$draft": None}},
+            "onSuccessDestroyEmail": ["#s2"],
+        },
+    ]
+    # Implicit Email/set responses are merged separately
+    data = plan.combine_responses(
+        [
+            {
+                "methodResponses": [
+                    [
+                        "EmailSubmission/set",
+                        {
+                            "accountId": "u1138",
+                            "oldState": "1",
+                            "newState": "2",
+                            "created": {"s1": {"id": "S1"}},
+                        },
+                        "single.EmailSubmission/set#0",
+                    ],
+                    [
+                        "Email/set",
+                        {
+                            "accountId": "u1138",
+                            "oldState": "10",
+                            "newState": "11",
+                            "updated": {"M1": None},
+                        },
+                        "single.EmailSubmission/set#0",
+                    ],
+                    [
+                        "EmailSubmission/set",
+                        {
+                            "accountId": "u1138",
+                            "oldState": "2",
+                            "newState": "3",
+                            "created": {"s2": {"id": "S2"}},
+                        },
+                        "single.EmailSubmission/set#1",
+                    ],
+                    [
+                        "Email/set",
+                        {
+                            "accountId": "u1138",
+                            "oldState": "11",
+                            "newState": "12",
+                            "destroyed": ["M2"],
+                        },
+                        "single.EmailSubmission/set#1",
+                    ],
+                ],
+                "sessionState": "test;session;state",
+            }
+        ]
+    )
+    api_response = decode_api_response(data)
+    assert api_response.method_responses == [
+        InvocationResponseOrError(
+            id="single.EmailSubmission/set",
+            response=EmailSubmissionSetResponse(
+                account_id="u1138",
+                old_state="1",
+                new_state="3",
+                created={
+                    "s1": EmailSubmission(id="S1"),
+                    "s2": EmailSubmission(id="S2"),
+                },
+                updated=None,
+                destroyed=None,
+                not_created=None,
+                not_updated=None,
+                not_destroyed=None,
+            ),
+        ),
+        InvocationResponseOrError(
+            id="single.EmailSubmission/set",
+            response=EmailSetResponse(
+                account_id="u1138",
+                old_state="10",
+                new_state="12",
+                created=None,
+                updated={"M1": None},
+                destroyed=["M2"],
+                not_created=None,
+                not_updated=None,
+                not_destroyed=None,
+            ),
+        ),
+    ]
+
+
+def test_plan_split_set_within_limit() -> None:
+    api_request = APIRequest.from_calls(
+        "u1138", EmailSet(destroy=["M1", "M2"])
+    )
+    plan = RequestPlan.from_request(
+        api_request, max_objects_in_get=1, max_objects_in_set=2
+    )
+    assert plan.requests == [api_request]
+
+
+def make_call(
+    call_id: str, args: Optional[dict[str, Any]] = None
+) -> tuple[str, dict[str, Any], str]:
+    return ("Test/call", args or {}, call_id)
+
+
+def ref(call_id: str) -> dict[str, str]:
+    return {"resultOf": call_id, "name": "Test/call", "path": "/ids"}
+
+
+def test_call_dependencies() -> None:
+    assert call_dependencies(
+        [
+            make_call("a", {"create": {"k1": {}}}),
+            make_call("b", {"#ids": ref("a")}),
+            make_call("c"),
+            make_call("d", {"update": {"#k1": {"x": 1}}}),
+            make_call("e", {"#ids": ref("unknown")}),
+        ]
+    ) == [0, 0, 2, 0, 4]
+
+
+@pytest.mark.parametrize(
+    ["max_calls", "max_size", "expected_batches"],
+    [
+        (None, None, [["a", "b", "c", "d", "e", "f"]]),
+        (2, None, [["a", "b"], ["c"], ["d", "e"], ["f"]]),
+        (3, None, [["a", "b", "c"], ["d", "e", "f"]]),
+        (1, None, [["a", "b"], ["c"], ["d", "e"], ["f"]]),
+        (None, 100, [["a", "b"], ["c"], ["d", "e"], ["f"]]),
+        (None, 130, [["a", "b"], ["c", "d", "e"], ["f"]]),
+    ],
+)
+def test_split_method_calls(
+    max_calls: Optional[int],
+    max_size: Optional[int],
+    expected_batches: list[list[str]],
+) -> None:
+    method_calls = [
+        make_call("a", {"create": {"k1": {}}}),
+        make_call("b", {"#ids": ref("a")}),
+        make_call("c"),
+        make_call("d"),
+        make_call("e", {"#ids": ref("d")}),
+        make_call("f"),
+    ]
+    batches = split_method_calls(
+        method_calls, max_calls_in_request=max_calls, max_size=max_size
+    )
+    assert [[c[2] for c in batch] for batch in batches] == expected_batches
+
+
+def test_plan_split_requests() -> None:
+    api_request = APIRequest.from_calls(
+        "u1138",
+        [CoreEcho(data={"n": n}) for n in range(3)]
+        + [EmailGet(ids=[f"M{n}" for n in range(3)])],
+    )
+    plan = RequestPlan.from_request(
+        api_request, max_objects_in_get=2, max_calls_in_request=2
+    )
+    assert [[c[2] for c in r.method_calls] for r in plan.requests] == [
+        ["0.Core/echo", "1.Core/echo"],
+        ["2.Core/echo", "3.Email/get#0"],
+        ["3.Email/get#1"],
+    ]
+    assert all(r.using == api_request.using for r in plan.requests)
+    api_response = decode_api_response(
+        plan.combine_responses(
+            [
+                {
+                    "methodResponses": [
+                        ["Core/echo", {"n": 0}, "0.Core/echo"],
+                        ["Core/echo", {"n": 1}, "1.Core/echo"],
+                    ],
+                    "sessionState": "1",
+                },
+                {
+                    "methodResponses": [
+                        ["Core/echo", {"n": 2}, "2.Core/echo"],
+                        [
+                            "Email/get",
+                            make_get_response(["M0", "M1"], []),
+                            "3.Email/get#0",
+                        ],
+                    ],
+                    "sessionState": "1",
+                },
+                {
+                    "methodResponses": [
+                        [
+                            "Email/get",
+                            make_get_response(["M2"], []),
+                            "3.Email/get#1",
+                        ],
+                    ],
+                    "sessionState": "2",
+                },
+            ]
+        )
+    )
+    assert api_response.session_state == "2"
+    assert api_response.method_responses == [
+        InvocationResponseOrError(
+            id=f"{n}.Core/echo", response=CoreEchoResponse(data={"n": n})
+        )
+        for n in range(3)
+    ] + [
+        InvocationResponseOrError(
+            id="3.Email/get",
+            response=EmailGetResponse(
+                account_id="u1138",
+                state="2000",
+                not_found=[],
+                data=[Email(id="M0"), Email(id="M1"), Email(id="M2")],
+            ),
+        )
+    ]
+
+
+class CountingJSONCodec(StdlibJSONCodec):
+    def __init__(self) -> None:
+        self.encoded: list[Any] = []
+
+    def dumps(self, obj: Any) -> bytes:
+        self.encoded.append(obj)
+        return super().dumps(obj)
+
+
+def test_plan_within_request_limits() -> None:
+    api_request = APIRequest.from_calls(
+        "u1138", [CoreEcho(data={"n": n}) for n in range(3)]
+    )
+    json_codec = CountingJSONCodec()
+    plan = RequestPlan.from_request(
+        api_request,
+        max_calls_in_request=3,
+        max_size_request=10_000,
+        json_codec=json_codec,
+    )
+    assert plan.requests == [api_request]
+    # The request is encoded once as a whole, and sent as encoded
+    assert json_codec.encoded == [api_request.to_dict()]
+    assert plan.raw_requests == {
+        0: StdlibJSONCodec().dumps(api_request.to_dict())
+    }
+
+
+def test_plan_exceeds_request_limits() -> None:
+    api_request = APIRequest.from_calls(
+        "u1138", [CoreEcho(data={"n": n}) for n in range(3)]
+    )
+    json_codec = CountingJSONCodec()
+    plan = RequestPlan.from_request(
+        api_request,
+        max_calls_in_request=2,
+        max_size_request=10_000,
+        json_codec=json_codec,
+    )
+    assert [len(r.method_calls) for r in plan.requests] == [2, 1]
+    assert plan.raw_requests == {}
+    # Requests with too many calls are not encoded as a whole
+    assert api_request.to_dict() not in json_codec.encoded
+
+
+@pytest.mark.parametrize("max_size_request", [10_000, 200])
+def test_plan_filter_operator(max_size_request: int) -> None:
+    # Enum values in method call arguments are sized with the request codec
+    api_request = APIRequest.from_calls(
+        "u1138",
+        [
+            EmailQuery(
+                filter=EmailQueryFilterOperator(
+                    operator=Operator.AND,
+                    conditions=[
+                        EmailQueryFilterCondition(in_mailbox="MBX1"),
+                        EmailQueryFilterCondition(text="Onett"),
+                    ],
+                )
+            ),
+            EmailGet(ids=Ref("/ids")),
+            CoreEcho(data={"n": 0}),
+        ],
+    )
+    plan = RequestPlan.from_request(
+        api_request, max_size_request=max_size_request
+    )
+    assert [[c[2] for c in r.method_calls] for r in plan.requests] == (
+        [["0.Email/query", "1.Email/get", "2.Core/echo"]]
+        if max_size_request > 1000
+        else [["0.Email/query", "1.Email/get"], ["2.Core/echo"]]
+    )
@@ -0,0 +1,338 @@
+import json
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from typing import Any, Optional
+
+import pytest
+import requests
+import responses
+from urllib3 import HTTPConnectionPool
+from urllib3.connection import HTTPConnection
+from urllib3.exceptions import MaxRetryError, NewConnectionError
+
+from jmapc import Client, RetryBudget, RetryPolicy
+from jmapc.api import APIRequest
+from jmapc.methods import (
+    CoreEcho,
+    CoreEchoResponse,
+    EmailGet,
+    EmailGetResponse,
+    EmailSet,
+    InvocationResponse,
+    MailboxGet,
+    MailboxGetResponse,
+)
+from jmapc.ref import Ref
+from jmapc.retry import merge_retried_responses, parse_retry_after
+
+
+def make_request(*method_calls: Any) -> APIRequest:
+    return APIRequest(account_id="u1138", method_calls=list(method_calls))
+
+
+@pytest.mark.parametrize(
+    ["value", "expected"],
+    [
+        (None, None),
+        ("", None),
+        ("5", 5.0),
+        ("not a date", None),
+        ("Wed, 21 Oct 2015 07:28:00 GMT", 0.0),
+        ("Wed, 21 Oct 2015 07:28:00 -0000", 0.0),
+    ],
+)
+def test_parse_retry_after(
+    value: Optional[str], expected: Optional[float]
+) -> None:
+    assert parse_retry_after(value) == expected
+
+
+def test_parse_retry_after_date() -> None:
+    retry_at = datetime.now(tz=timezone.utc) + timedelta(seconds=60)
+    delay = parse_retry_after(format_datetime(retry_at, usegmt=True))
+    assert delay and 50 < delay <= 60
+
+
+def test_retry_policy_delay() -> None:
+    policy = RetryPolicy(backoff=1, max_backoff=5, jitter=False)
+    assert [policy.delay(attempt) for attempt in range(1, 5)] == [1, 2, 4, 5]
+    assert policy.delay(1, retry_after=3) == 3
+    # Server requested waits are capped to max_backoff
+    assert policy.delay(1, retry_after=86400) == 5
+    jittered = RetryPolicy(backoff=1, max_backoff=5)
+    assert all(0 <= jittered.delay(4) <= 5 for _ in range(100))
+
+
+def test_retry_budget() -> None:
+    budget = RetryBudget(ratio=0.5, reserve=2)
+    policy = RetryPolicy(max_attempts=10, budget=budget)
+    assert policy.acquire(1)
+    assert policy.acquire(1)
+    assert not policy.acquire(1)
+    policy.record_request()
+    assert not policy.acquire(1)
+    policy.record_request()
+    assert policy.acquire(1)
+    assert not RetryPolicy(max_attempts=2, budget=None).acquire(2)
+
+
+def test_retry_policy_statuses() -> None:
+    policy = RetryPolicy()
+    get_request = make_request(["Email/get", {"ids": ["e1"]}, "0"])
+    set_request = make_request(["Email/set", {"destroy": ["e1"]}, "0"])
+    assert policy.should_retry_status(429, set_request)
+    assert policy.should_retry_status(503, get_request)
+    assert policy.should_retry_status(504, get_request)
+    assert not policy.should_retry_status(503, set_request)
+    assert not policy.should_retry_status(504, set_request)
+    assert not policy.should_retry_status(500, get_request)
+    # Retrying changes on 503 is opt-in
+    policy = RetryPolicy(non_idempotent_retry_statuses=(429, 503))
+    assert policy.should_retry_status(503, set_request)
+
+
+def test_retryable_calls() -> None:
+    request = make_request(
+        ["Email/query", {}, "0"],
+        ["Email/get", {"#ids": {"resultOf": "0", "path": "/ids"}}, "1"],
+        ["Mailbox/get", {}, "2"],
+        ["Email/set", {"destroy": ["e1"]}, "3"],
+        ["Thread/get", {}, "4"],
+        ["Identity/get", {}, "5"],
+        ["Email/get", {"ids": ["#draft"]}, "6"],
+    )
+    response = {
+        "methodResponses": [
+            ["error", {"type": "serverUnavailable"}, "0"],
+            ["error", {"type": "serverFail"}, "1"],
+            ["error", {"type": "serverFail"}, "2"],
+            ["error", {"type": "serverFail"}, "3"],
+            ["error", {"type": "invalidArguments"}, "4"],
+            ["Identity/get", {}, "5"],
+            ["error", {"type": "serverFail"}, "6"],
+        ]
+    }
+    assert RetryPolicy().retryable_calls(request, response) == [
+        ["Mailbox/get", {}, "2"]
+    ]
+    assert (
+        RetryPolicy().retryable_calls(request, {"methodResponses": []}) == []
+    )
+
+
+def test_merge_retried_responses() -> None:
+    assert merge_retried_responses(
+        {
+            "methodResponses": [
+                ["Mailbox/get", {"list": []}, "0"],
+                ["error", {"type": "serverFail"}, "1"],
+            ],
+            "sessionState": "1",
+        },
+        {"methodResponses": [["Email/get", {"list": []}, "1"]]},
+    ) == {
+        "methodResponses": [
+            ["Mailbox/get", {"list": []}, "0"],
+            ["Email/get", {"list": []}, "1"],
+        ],
+        "sessionState": "1",
+    }
+
+
+@pytest.fixture
+def retry_client() -> Client:
+    return Client(
+        host="jmap-example.localhost",
+        auth=("ness", "pk_fire"),
+        retry_policy=RetryPolicy(backoff=0),
+    )
+
+
+def test_retry_http_status(
+    retry_client: Client, http_responses: responses.RequestsMock
+) -> None:
+    http_responses.add(
+        method=responses.POST,
+        url="https://jmap-api.localhost/api",
+        status=429,
+        headers={"Retry-After": "0"},
+    )
+    http_responses.add(
+        method=responses.POST,
+        url="https://jmap-api.localhost/api",
+        body=json.dumps(
+            {
+                "methodResponses": [
+                    ["Core/echo", {"n": 1}, "single.Core/echo"]
+                ],
+                "sessionState": "test;session;state",
+            }
+        ),
+    )
+    assert retry_client.request(CoreEcho(data={"n": 1})) == CoreEchoResponse(
+        data={"n": 1}
+    )
+    assert len(http_responses.calls) == 3
+
+
+def test_retry_max_attempts(
+    retry_client: Client, http_responses: responses.RequestsMock
+) -> None:
+    http_responses.add(
+        method=responses.POST, url="https://jmap-api.localhost/api", status=429
+    )
+    with pytest.raises(requests.HTTPError):
+        retry_client.request(CoreEcho(data={"n": 1}))
+    assert len(http_responses.calls) == 4
+
+
+@pytest.mark.parametrize(
+    ["method", "error", "expected_calls"],
+    [
+        (EmailGet(ids=["e1"]), requests.ReadTimeout("timed out"), 3),
+        (EmailSet(destroy=["e1"]), requests.ReadTimeout("timed out"), 1),
+        (EmailSet(destroy=["e1"]), requests.ConnectTimeout("timed out"), 3),
+        (
+            EmailSet(destroy=["e1"]),
+            requests.ConnectionError(
+                MaxRetryError(
+                    HTTPConnectionPool("jmap-api.localhost"),
+                    "/api",
+                    NewConnectionError(
+                        HTTPConnection("jmap-api.localhost"),
+                        "Connection refused",
+                    ),
+                )
+            ),
+            3,
+        ),
+        (
+            EmailSet(destroy=["e1"]),
+            requests.ConnectionError(
+                NewConnectionError(
+                    HTTPConnection("jmap-api.localhost"), "Connection refused"
+                )
+            ),
+            3,
+        ),
+        (
+            EmailSet(destroy=["e1"]),
+            requests.ConnectionError("Connection reset by peer"),
+            1,
+        ),
+    ],
+)
+def test_retry_transport_error(
+    retry_client: Client,
+    http_responses: responses.RequestsMock,
+    method: Any,
+    error: requests.RequestException,
+    expected_calls: int,
+) -> None:
+    http_responses.add(
+        method=responses.POST, url="https://jmap-api.localhost/api", body=error
+    )
+    with pytest.raises(type(error)):
+        retry_client.request(method)
+    assert len(http_responses.calls) == expected_calls + 1
+
+
+def test_retry_method_errors(
+    retry_client: Client, http_responses: responses.RequestsMock
+) -> None:
+    sent: list[Any] = []
+    replies = [
+        [
+            [
+                "Mailbox/get",
+                {
+                    "accountId": "u1138",
+                    "list": [],
+                    "notFound": [],
+                    "state": "1",
+                },
+                "0.Mailbox/get",
+            ],
+            ["error", {"type": "serverUnavailable"}, "1.Email/get"],
+        ],
+        [
+            [
+                "Email/get",
+                {
+                    "accountId": "u1138",
+                    "list": [],
+                    "notFound": ["e1"],
+                    "state": "2",
+                },
+                "1.Email/get",
+            ]
+        ],
+    ]
+
+    def _callback(
+        request: requests.PreparedRequest,
+    ) -> tuple[int, dict[str, str], str]:
+        sent.append(json.loads(request.body or "{}")["methodCalls"])
+        return (
+            200,
+            {},
+            json.dumps(
+                {
+                    "methodResponses": replies.pop(0),
+                    "sessionState": "test;session;state",
+                }
+            ),
+        )
+
+    http_responses.add_callback(
+        method=responses.POST,
+        url="https://jmap-api.localhost/api",
+        callback=_callback,
+    )
+    assert retry_client.request(
+        [MailboxGet(ids=None), EmailGet(ids=["e1"])], raise_errors=True
+    ) == [
+        InvocationResponse(
+            id="0.Mailbox/get",
+            response=MailboxGetResponse(
+                account_id="u1138", data=[], not_found=[], state="1"
+            ),
+        ),
+        InvocationResponse(
+            id="1.Email/get",
+            response=EmailGetResponse(
+                account_id="u1138", data=[], not_found=["e1"], state="2"
+            ),
+        ),
+    ]
+    assert sent == [
+        [
+            ["Mailbox/get", {"accountId": "u1138"}, "0.Mailbox/get"],
+            [
+                "Email/get",
+                {"accountId": "u1138", "ids": ["e1"]},
+                "1.Email/get",
+            ],
+        ],
+        [["Email/get", {"accountId": "u1138", "ids": ["e1"]}, "1.Email/get"]],
+    ]
+
+
+def test_no_retry_for_referenced_calls(
+    retry_client: Client, http_responses: responses.RequestsMock
+) -> None:
+    http_responses.add(
+        method=responses.POST,
+        url="https://jmap-api.localhost/api",
+        body=json.dumps(
+            {
+                "methodResponses": [
+                    ["error", {"type": "serverFail"}, "0.Mailbox/get"],
+                    ["error", {"type": "serverFail"}, "1.Email/get"],
+                ],
+                "sessionState": "test;session;state",
+            }
+        ),
+    )
+    retry_client.request([MailboxGet(ids=None), EmailGet(ids=Ref("/ids"))])
+    assert len(http_responses.calls) == 2
@@ -1,12 +1,28 @@
-from dataclasses import dataclass, field
+import copy
+import importlib.util
+import pickle
+import typing
+from dataclasses import (
+    FrozenInstanceError,
+    dataclass,
+    field,
+    replace,
+)
 from datetime import datetime, timezone
 from typing import Any, Optional
 
 import pytest
 from dataclasses_json import config
 
-from jmapc import EmailHeader, ResultReference
+from jmapc import (
+    Email,
+    EmailHeader,
+    FrozenEmail,
+    ResultReference,
+    SlottedEmail,
+)
 from jmapc.models import ListOrRef
+from jmapc.models import email as email_module
 from jmapc.serializer import Model, datetime_decode, datetime_encode
 
 
@@ -110,3 +126,77 @@ def test_serialize_datetime(
     assert to_dict == expected_dict
     from_dict = TestModel.from_dict(to_dict)
     assert from_dict == d
+
+
+EMAIL_DATA = {
+    "id": "M1",
+    "receivedAt": "1994-08-24T12:00:00Z",
+    "headers": [{"name": "X-Onett", "value": "Ness"}],
+    "from": [{"name": "Paula", "email": "paula@twoson.example.net"}],
+    "bodyStructure": {
+        "partId": "1",
+        "subParts": [{"partId": "2", "type": "text/plain"}],
+    },
+    "bodyValues": {"2": {"value": "Franklin Badge", "isTruncated": False}},
+}
+
+
+@pytest.mark.parametrize("cls", [SlottedEmail, FrozenEmail])
+def test_slotted_models(cls: type[SlottedEmail]) -> None:
+    email = cls.from_dict(EMAIL_DATA)
+    assert not hasattr(email, "__dict__")
+    assert not isinstance(email, Email)
+    assert email.mail_from and email.body_structure and email.body_values
+    assert not hasattr(email.mail_from[0], "__dict__")
+    assert email.mail_from[0].email == "paula@twoson.example.net"
+    assert email.body_values["2"].value == "Franklin Badge"
+    assert email.body_structure.sub_parts
+    sub_part = email.body_structure.sub_parts[0]
+    assert type(sub_part).__name__ == f"{cls.__name__}BodyPart"
+    assert not hasattr(sub_part, "__dict__")
+    assert email.to_dict() == Email.from_dict(EMAIL_DATA).to_dict()
+    assert cls.from_model(Email.from_dict(EMAIL_DATA)) == email
+    assert pickle.loads(pickle.dumps(email)) == email
+    assert copy.deepcopy(email) == email
+
+
+def test_slotted_models_mutability() -> None:
+    email = SlottedEmail.from_dict(EMAIL_DATA)
+    email.subject = "Onett"
+    assert email.subject == "Onett"
+    with pytest.raises(AttributeError):
+        email.unknown = True  # type: ignore[attr-defined]
+    frozen = FrozenEmail.from_dict(EMAIL_DATA)
+    with pytest.raises(FrozenInstanceError):
+        frozen.subject = "Onett"
+    assert replace(frozen, subject="Onett").subject == "Onett"
+    with pytest.raises(TypeError, match="FrozenEmail"):
+        hash(FrozenEmail(id="M1"))
+
+
+def test_slotted_models_type_checking_stubs(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    # Variants are declared for type checkers as subclasses of the models
+    # they are created from
+    monkeypatch.setattr(typing, "TYPE_CHECKING", True)
+    spec = importlib.util.spec_from_file_location(
+        email_module.__name__, email_module.__file__
+    )
+    assert spec and spec.loader
+    stubs = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(stubs)
+    for prefix in ("Slotted", "Frozen"):
+        for model in email_module.COMPACT_MODELS:
+            name = f"{prefix}{model.__name__}"
+            assert [b.__name__ for b in getattr(stubs, name).__bases__] == [
+                "SlottedModel",
+                model.__name__,
+            ], name
+
+
+def test_slotted_models_dataclasses_json() -> None:
+    email = SlottedEmail.from_dict({"id": "M1"}, infer_missing=True)
+    assert email == SlottedEmail(id="M1")
+    assert not hasattr(email, "__dict__")
+    assert email.to_dict(encode_json=True) == {"id": "M1"}
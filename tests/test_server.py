@@ -0,0 +1,584 @@
+import asyncio
+import pickle
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from pathlib import Path
+from typing import Any
+
+import pytest
+import requests
+
+from jmapc import (
+    AsyncClient,
+    Blob,
+    Client,
+    Comparator,
+    EmailBodyPart,
+    EmailQueryFilter,
+    EmailQueryFilterCondition,
+    EmailQueryFilterOperator,
+    EventSourceConfig,
+    Mailbox,
+    MailboxQueryFilterCondition,
+    Operator,
+    Ref,
+)
+from jmapc.methods import (
+    CoreEcho,
+    CoreEchoResponse,
+    EmailChanges,
+    EmailChangesResponse,
+    EmailGet,
+    EmailGetResponse,
+    EmailQuery,
+    EmailQueryResponse,
+    EmailSet,
+    EmailSetResponse,
+    MailboxGet,
+    MailboxGetResponse,
+    MailboxQuery,
+    MailboxQueryResponse,
+    MailboxSet,
+    MailboxSetResponse,
+    ThreadGet,
+    ThreadGetResponse,
+)
+from jmapc.session import session_url
+from jmapc.testing import JMAPServer, JMAPStore, MethodError
+from jmapc.testing.server import RequestError
+from jmapc.testing.store import SEED_TIME
+
+
+@pytest.fixture
+def server() -> Iterable[JMAPServer]:
+    store = JMAPStore()
+    store.seed(100, mailboxes=["Inbox", "Archive"])
+    with JMAPServer(store) as server:
+        yield server
+
+
+@pytest.fixture
+def server_client(server: JMAPServer) -> Iterable[Client]:
+    yield Client(host=server.url, auth=("ness", "pk_fire"))
+
+
+def test_session_url() -> None:
+    assert (
+        session_url("jmap-example.localhost")
+        == "https://jmap-example.localhost/.well-known/jmap"
+    )
+    assert (
+        session_url("http://127.0.0.1:8080")
+        == "http://127.0.0.1:8080/.well-known/jmap"
+    )
+
+
+def test_server_session(server: JMAPServer, server_client: Client) -> None:
+    assert server_client.account_id == "u1138"
+    assert server_client.jmap_session.api_url == f"{server.url}/api/"
+    assert server_client.request(CoreEcho(data=dict(a=1))) == CoreEchoResponse(
+        data=dict(a=1)
+    )
+
+
+def test_server_query_get(server_client: Client) -> None:
+    results = server_client.request(
+        [
+            MailboxGet(ids=None),
+            EmailQuery(
+                filter=EmailQueryFilterCondition(text="message 4"),
+                sort=[Comparator(property="receivedAt", is_ascending=True)],
+                limit=5,
+            ),
+            EmailGet(ids=Ref("/ids"), properties=["id", "subject"]),
+        ]
+    )
+    mailboxes = results[0].response
+    assert isinstance(mailboxes, MailboxGetResponse)
+    assert [(m.name, m.total_emails) for m in mailboxes.data] == [
+        ("Inbox", 50),
+        ("Archive", 50),
+    ]
+    query = results[1].response
+    assert isinstance(query, EmailQueryResponse)
+    assert query.ids == ["M4", "M40", "M41", "M42", "M43"]
+    emails = results[2].response
+    assert isinstance(emails, EmailGetResponse)
+    assert [e.subject for e in emails.data] == [
+        f"Synthetic message {i}" for i in (4, 40, 41, 42, 43)
+    ]
+
+
+def test_server_email_set_changes(server_client: Client) -> None:
+    emails = server_client.request(EmailGet(ids=[]))
+    assert isinstance(emails, EmailGetResponse)
+    results = server_client.request(
+        [
+            EmailSet(
+                create=dict(
+                    draft=dict(  # type: ignore[dict-item]
+                        mailboxIds={"MB1": True}, subject="Hello"
+                    )
+                ),
+                update={"M1": {"keywords/$flagged": True}},
+                destroy=["M2", "M9999"],
+            ),
+            EmailChanges(since_state=str(emails.state)),
+        ]
+    )
+    email_set = results[0].response
+    assert isinstance(email_set, EmailSetResponse)
+    draft = email_set.created and email_set.created["draft"]
+    assert draft
+    assert email_set.updated == {"M1": None}
+    assert email_set.destroyed == ["M2"]
+    assert email_set.not_destroyed and "M9999" in email_set.not_destroyed
+    changes = results[1].response
+    assert isinstance(changes, EmailChangesResponse)
+    assert changes.created == [draft.id]
+    assert changes.updated == ["M1"]
+    assert changes.destroyed == ["M2"]
+    thread = server_client.request(ThreadGet(ids=["T0"]))
+    assert isinstance(thread, ThreadGetResponse)
+    assert thread.data[0].email_ids == ["M0", "M1", "M3"]
+
+
+@pytest.mark.parametrize(
+    ["query_filter", "expected_ids"],
+    [
+        (EmailQueryFilterCondition(in_mailbox="MB2"), [1, 3, 5, 7, 9, 11]),
+        (
+            EmailQueryFilterCondition(in_mailbox_other_than=["MB2"]),
+            [0, 2, 4, 6, 8, 10],
+        ),
+        (
+            EmailQueryFilterOperator(
+                operator=Operator.AND,
+                conditions=[
+                    EmailQueryFilterCondition(in_mailbox="MB1"),
+                    EmailQueryFilterCondition(not_keyword="$seen"),
+                ],
+            ),
+            [0, 6],
+        ),
+        (
+            EmailQueryFilterOperator(
+                operator=Operator.OR,
+                conditions=[
+                    EmailQueryFilterCondition(has_keyword="$seen"),
+                    EmailQueryFilterCondition(
+                        after=SEED_TIME + timedelta(seconds=9)
+                    ),
+                ],
+            ),
+            [1, 2, 4, 5, 7, 8, 9, 10, 11],
+        ),
+        (
+            EmailQueryFilterOperator(
+                operator=Operator.NOT,
+                conditions=[
+                    EmailQueryFilterCondition(
+                        mail_from="sender1@twoson.example.net"
+                    )
+                ],
+            ),
+            [0, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11],
+        ),
+        (EmailQueryFilterCondition(min_size=1030, max_size=1032), [6, 7]),
+        (
+            EmailQueryFilterCondition(before=SEED_TIME + timedelta(seconds=2)),
+            [0, 1],
+        ),
+        (EmailQueryFilterCondition(text="MESSAGE 1"), [1, 10, 11]),
+        (EmailQueryFilterCondition(to="ness@onett"), list(range(12))),
+        (EmailQueryFilterCondition(has_attachment=True), []),
+    ],
+)
+def test_server_email_filters(
+    query_filter: EmailQueryFilter, expected_ids: list[int]
+) -> None:
+    store = JMAPStore()
+    store.seed(12, mailboxes=["Inbox", "Archive"])
+    with JMAPServer(store) as server:
+        client = Client(host=server.url, auth=("ness", "pk_fire"))
+        query = client.request(
+            EmailQuery(
+                filter=query_filter,
+                sort=[Comparator(property="size", is_ascending=True)],
+            )
+        )
+    assert isinstance(query, EmailQueryResponse)
+    assert query.ids == [f"M{i}" for i in expected_ids]
+
+
+def test_server_mailbox_set_query(server_client: Client) -> None:
+    results = server_client.request(
+        [
+            MailboxSet(
+                create=dict(
+                    parent=Mailbox(name="Onett"),
+                    child=Mailbox(name="Twoson", parent_id="#parent"),
+                    invalid=Mailbox(),
+                ),
+                update={"#parent": {"name": "Threed"}, "MB999": {}},
+                destroy=["#parent", "MB1", "#child", "MB999"],
+            ),
+            MailboxQuery(
+                filter=MailboxQueryFilterCondition(has_any_role=False),
+                sort=[Comparator(property="name")],
+            ),
+            MailboxQuery(filter=MailboxQueryFilterCondition(name="threed")),
+        ]
+    )
+    mailbox_set = results[0].response
+    assert isinstance(mailbox_set, MailboxSetResponse)
+    parent = mailbox_set.created and mailbox_set.created["parent"]
+    assert parent
+    parent_id = parent.id
+    assert mailbox_set.not_created and list(mailbox_set.not_created) == [
+        "invalid"
+    ]
+    assert mailbox_set.updated == {"#parent": None}
+    assert mailbox_set.destroyed == ["#child"]
+    assert mailbox_set.not_destroyed and {
+        id: e.type for id, e in mailbox_set.not_destroyed.items()
+    } == {
+        "#parent": "mailboxHasChild",
+        "MB1": "mailboxHasEmail",
+        "MB999": "notFound",
+    }
+    query = results[1].response
+    assert isinstance(query, MailboxQueryResponse)
+    assert query.ids == ["MB2", parent_id]
+    query = results[2].response
+    assert isinstance(query, MailboxQueryResponse)
+    assert query.ids == [parent_id]
+
+
+@pytest.mark.parametrize(
+    ["method", "path", "kwargs", "expected_status", "expected_type"],
+    [
+        ("post", "/api/", dict(data=b"{"), 400, "notJSON"),
+        ("post", "/api/", dict(json=[]), 400, "notRequest"),
+        (
+            "post",
+            "/api/",
+            dict(json=dict(using=["urn:unknown"], methodCalls=[])),
+            400,
+            "unknownCapability",
+        ),
+        (
+            "post",
+            "/api/",
+            dict(
+                json=dict(using=[], methodCalls=[["Core/echo", {}, "0"]] * 17)
+            ),
+            400,
+            "limit",
+        ),
+        ("post", "/upload/u1138/", dict(data=b"x" * 101), 413, "limit"),
+        ("post", "/upload/u0/", dict(data=b""), 404, "about:blank"),
+        ("post", "/unknown", {}, 404, "about:blank"),
+        ("get", "/unknown", {}, 404, "about:blank"),
+        ("get", "/download/u1138/B0/x", {}, 404, "about:blank"),
+    ],
+)
+def test_server_request_errors(
+    method: str,
+    path: str,
+    kwargs: dict[str, Any],
+    expected_status: int,
+    expected_type: str,
+) -> None:
+    with JMAPServer(core_capabilities=dict(maxSizeUpload=100)) as server:
+        r = requests.request(method, f"{server.url}{path}", **kwargs)
+    assert r.status_code == expected_status
+    assert r.json()["type"].endswith(expected_type)
+
+
+def test_server_method_errors(server: JMAPServer) -> None:
+    r = requests.post(
+        f"{server.url}/api/",
+        json=dict(
+            using=["urn:ietf:params:jmap:core"],
+            methodCalls=[
+                ["Unknown/method", {}, "0"],
+                ["Mailbox/get", {"accountId": "u0"}, "1"],
+                [
+                    "Email/get",
+                    {
+                        "accountId": "u1138",
+                        "#ids": {
+                            "resultOf": "0",
+                            "name": "Email/query",
+                            "path": "/ids",
+                        },
+                    },
+                    "2",
+                ],
+                [
+                    "Email/query",
+                    {"accountId": "u1138", "filter": {"header": ["X"]}},
+                    "3",
+                ],
+                [
+                    "Email/query",
+                    {"accountId": "u1138", "sort": [{"property": "cc"}]},
+                    "4",
+                ],
+                ["Email/query", {"accountId": "u1138", "limit": -1}, "5"],
+                [
+                    "Email/set",
+                    {"accountId": "u1138", "ifInState": "100"},
+                    "6",
+                ],
+                [
+                    "Email/get",
+                    {"accountId": "u1138", "ids": ["M0"] * 501},
+                    "7",
+                ],
+                [
+                    "Email/set",
+                    {
+                        "accountId": "u1138",
+                        "update": {"M0": {"keywords/$seen": True}},
+                        "destroy": [f"M{i}" for i in range(1, 501)],
+                    },
+                    "8",
+                ],
+                [
+                    "Mailbox/set",
+                    {
+                        "accountId": "u1138",
+                        "create": {f"c{i}": {"name": i} for i in range(501)},
+                    },
+                    "9",
+                ],
+            ],
+        ),
+    )
+    assert [
+        (name, args.get("type"))
+        for name, args, _ in r.json()["methodResponses"]
+    ] == [
+        ("error", "unknownMethod"),
+        ("error", "accountNotFound"),
+        ("error", "invalidResultReference"),
+        ("error", "unsupportedFilter"),
+        ("error", "unsupportedSort"),
+        ("error", "invalidArguments"),
+        ("error", "stateMismatch"),
+        ("error", "requestTooLarge"),
+        ("error", "requestTooLarge"),
+        ("error", "requestTooLarge"),
+    ]
+
+
+def test_server_download_range(server: JMAPServer) -> None:
+    url = f"{server.url}/download/u1138/G1/msg.eml?type=message/rfc822"
+    r = requests.get(url)
+    assert r.status_code == 200
+    assert r.headers["Content-Type"] == "message/rfc822"
+    data = r.content
+    r = requests.get(url, headers={"Range": "bytes=-10"})
+    assert r.status_code == 206
+    assert r.content == data[-10:]
+    assert r.headers["Content-Range"] == (
+        f"bytes {len(data) - 10}-{len(data) - 1}/{len(data)}"
+    )
+    r = requests.get(url, headers={"Range": f"bytes={len(data)}-"})
+    assert r.status_code == 416
+
+
+def test_server_large_seed() -> None:
+    store = JMAPStore()
+    store.seed(1_000_000)
+    with JMAPServer(store) as server:
+        client = Client(host=server.url, auth=("ness", "pk_fire"))
+        query = client.request(
+            EmailQuery(calculate_total=True, position=10, limit=3)
+        )
+    assert isinstance(query, EmailQueryResponse)
+    assert query.total == 1_000_000
+    assert query.ids == ["M999989", "M999988", "M999987"]
+
+
+def test_server_split_oversized() -> None:
+    store = JMAPStore()
+    store.seed(25)
+    with JMAPServer(store, core_capabilities=dict(maxObjectsInGet=10)) as s:
+        client = Client(host=s.url, auth=("ness", "pk_fire"))
+        ids = [f"M{i}" for i in range(25)]
+        response = client.request(
+            EmailGet(ids=ids, properties=["id"]), split_oversized=True
+        )
+        assert isinstance(response, EmailGetResponse)
+        assert [e.id for e in response.data] == ids
+        assert s.stats.method_calls["Email/get"] == 3
+        # Requests are made over a single persistent connection
+        assert s.stats.connections == 1
+
+
+def test_server_blobs(
+    server: JMAPServer, server_client: Client, tempdir: Path
+) -> None:
+    data = bytes(range(256)) * 64
+    blob = server_client.upload_blob(data, "application/octet-stream")
+    assert blob.size == len(data)
+    attachment = EmailBodyPart(
+        blob_id=blob.id,
+        name="data.bin",
+        type="application/octet-stream",
+        size=blob.size,
+    )
+    server_client.download_blob(
+        attachment, tempdir / "data.bin", segment_size=4096
+    )
+    assert (tempdir / "data.bin").read_bytes() == data
+    assert server.stats.requests["download"] == 4
+
+
+def test_server_download_blob_connections(
+    server: JMAPServer,
+    server_client: Client,
+    tempdir: Path,
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    data = bytes(range(256)) * 64
+    blob = server_client.upload_blob(data, "application/octet-stream")
+    attachment = EmailBodyPart(
+        blob_id=blob.id,
+        name="data.bin",
+        type="application/octet-stream",
+        size=blob.size,
+    )
+    server.latency = 0.05
+    server_client.download_blob(
+        attachment, tempdir / "data.bin", segment_size=512, max_workers=16
+    )
+    assert (tempdir / "data.bin").read_bytes() == data
+    assert "Connection pool is full" not in caplog.text
+
+
+def test_server_empty_blob(server_client: Client, tempdir: Path) -> None:
+    blob = server_client.upload_blob(b"", "application/octet-stream")
+    attachment = EmailBodyPart(
+        blob_id=blob.id, name="empty.bin", type="application/octet-stream"
+    )
+    server_client.download_blob(attachment, tempdir / "empty.bin")
+    server_client.download_attachment(attachment, tempdir / "attachment.bin")
+    assert (tempdir / "empty.bin").read_bytes() == b""
+    assert (tempdir / "attachment.bin").read_bytes() == b""
+
+
+def test_server_events(server: JMAPServer) -> None:
+    client = Client(
+        host=server.url,
+        auth=("ness", "pk_fire"),
+        event_source_config=EventSourceConfig(closeafter="state"),
+    )
+    event = next(client.events)
+    assert event.data.changed["u1138"].to_dict() == {
+        "Email": "0",
+        "Mailbox": "0",
+        "Thread": "0",
+    }
+
+
+def test_server_async_client(server: JMAPServer) -> None:
+    async def _test() -> list[str]:
+        async with AsyncClient(
+            host=server.url, auth=("ness", "pk_fire")
+        ) as client:
+            results = await client.request_many(
+                [EmailGet(ids=[f"M{i}"], properties=["id"]) for i in range(8)]
+            )
+        return [
+            str(r.data[0].id)
+            for r in results
+            if isinstance(r, EmailGetResponse) and r.data
+        ]
+
+    assert asyncio.run(_test()) == [f"M{i}" for i in range(8)]
+
+
+def test_server_request_many_connections(
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    with JMAPServer(
+        core_capabilities={"maxConcurrentRequests": 32}, latency=0.05
+    ) as server:
+        client = Client(host=server.url, auth=("ness", "pk_fire"))
+        for _ in range(2):
+            results = client.request_many(
+                [CoreEcho(data={"n": i}) for i in range(32)]
+            )
+            assert results == [
+                CoreEchoResponse(data={"n": i}) for i in range(32)
+            ]
+        # Connections opened for the first requests are all reused
+        assert server.stats.connections <= 33
+    assert "Connection pool is full" not in caplog.text
+
+
+def test_server_upload_blobs_connections(
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    with JMAPServer(
+        core_capabilities={"maxConcurrentUpload": 16}, latency=0.05
+    ) as server:
+        client = Client(host=server.url, auth=("ness", "pk_fire"))
+        for _ in range(2):
+            data = [f"blob{i}".encode() for i in range(16)]
+            blobs = client.upload_blobs([(d, "text/plain") for d in data])
+            assert [b.size for b in blobs if isinstance(b, Blob)] == [
+                len(d) for d in data
+            ]
+        # Connections opened for the first uploads are all reused
+        assert server.stats.connections <= 17
+    assert "Connection pool is full" not in caplog.text
+
+
+def test_server_concurrent_requests_limit() -> None:
+    with JMAPServer(
+        core_capabilities={"maxConcurrentRequests": 2}, latency=0.2
+    ) as server:
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            responses = list(
+                executor.map(
+                    lambda _: requests.post(
+                        f"{server.url}/api/",
+                        json=dict(using=[], methodCalls=[]),
+                    ),
+                    range(4),
+                )
+            )
+        assert sorted(r.status_code for r in responses) == [
+            200,
+            200,
+            429,
+            429,
+        ]
+        assert {
+            r.json()["detail"] for r in responses if r.status_code == 429
+        } == {"maxConcurrentRequests"}
+        assert server.stats.rejected_requests["api"] == 2
+        # Clients limit their concurrency to the session capability
+        client = Client(host=server.url, auth=("ness", "pk_fire"))
+        results = client.request_many(
+            [CoreEcho(data={"n": i}) for i in range(6)]
+        )
+        assert results == [CoreEchoResponse(data={"n": i}) for i in range(6)]
+        assert server.stats.rejected_requests["api"] == 2
+
+
+def test_server_errors_pickle() -> None:
+    method_error = pickle.loads(pickle.dumps(MethodError("notFound")))
+    assert (method_error.type, method_error.description) == ("notFound", None)
+    assert str(method_error) == "notFound"
+    request_error = pickle.loads(
+        pickle.dumps(RequestError(404, "about:blank", "Not found"))
+    )
+    assert (request_error.status, request_error.type) == (404, "about:blank")
+    assert str(request_error) == "Not found"
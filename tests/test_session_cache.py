@@ -0,0 +1,310 @@
+import json
+from pathlib import Path
+from typing import Callable, Optional
+
+import pytest
+import requests
+import responses
+
+from jmapc import Blob, Client, FileSessionCache, MemorySessionCache
+from jmapc.auth import BearerAuth
+from jmapc.methods import CoreEcho, CoreEchoResponse
+from jmapc.session_cache import session_cache_key
+
+from .data import make_session_response
+from .utils import cached_session_key, expect_jmap_call
+
+
+def test_session_cache_key() -> None:
+    secret = b"secret"
+    key = session_cache_key(
+        "jmap-example.localhost", ("ness", "pk_fire"), secret
+    )
+    assert key == session_cache_key(
+        "jmap-example.localhost", ("ness", "pk_fire"), secret
+    )
+    assert key and "pk_fire" not in key
+    assert key != session_cache_key(
+        "jmap-example.localhost", ("ness", "pk_fire"), b"other"
+    )
+    assert key != session_cache_key(
+        "jmap-example.localhost", ("paula", "pk_freeze"), secret
+    )
+    assert key != session_cache_key(
+        "jmap-other.localhost", ("ness", "pk_fire"), secret
+    )
+    assert session_cache_key(
+        "jmap-example.localhost", BearerAuth("ness__pk_fire"), secret
+    )
+
+
+class CookieAuth(requests.auth.AuthBase):
+    def __init__(self, cookie: str):
+        self.cookie = cookie
+
+    def __call__(
+        self, request: requests.PreparedRequest
+    ) -> requests.PreparedRequest:
+        request.headers["Cookie"] = f"session={self.cookie}"
+        return request
+
+
+class QueryAuth(requests.auth.AuthBase):
+    def __init__(self, token: str):
+        self.token = token
+
+    def __call__(
+        self, request: requests.PreparedRequest
+    ) -> requests.PreparedRequest:
+        request.prepare_url(request.url, {"token": self.token})
+        return request
+
+
+class NoOpAuth(requests.auth.AuthBase):
+    def __call__(
+        self, request: requests.PreparedRequest
+    ) -> requests.PreparedRequest:
+        return request
+
+
+@pytest.mark.parametrize("auth_type", [CookieAuth, QueryAuth])
+def test_session_cache_key_without_authorization_header(
+    auth_type: Callable[[str], requests.auth.AuthBase],
+) -> None:
+    # Users are told apart by credentials sent in other ways too
+    key = session_cache_key("jmap-example.localhost", auth_type("ness"), b"s")
+    assert key
+    assert key != session_cache_key(
+        "jmap-example.localhost", auth_type("paula"), b"s"
+    )
+
+
+@pytest.mark.parametrize("auth", [None, NoOpAuth()])
+def test_session_cache_key_without_credentials(
+    auth: Optional[requests.auth.AuthBase],
+) -> None:
+    assert session_cache_key("jmap-example.localhost", auth, b"s") is None
+    cache = MemorySessionCache()
+    client = Client(
+        host="jmap-example.localhost", auth=auth, session_cache=cache
+    )
+    with responses.RequestsMock() as http_responses:
+        http_responses.add(
+            method=responses.GET,
+            url="https://jmap-example.localhost/.well-known/jmap",
+            body=json.dumps(make_session_response()),
+        )
+        assert client.account_id == "u1138"
+    assert cache._sessions == {}
+
+
+def test_file_session_cache(tempdir: Path) -> None:
+    cache = FileSessionCache(tempdir / "sessions")
+    assert cache.get("abc") is None
+    cache.set("abc", {"state": "1"})
+    assert cache.get("abc") == {"state": "1"}
+    assert [p.name for p in (tempdir / "sessions").iterdir()] == ["abc.json"]
+    (tempdir / "sessions" / "abc.json").write_text("{invalid")
+    assert cache.get("abc") is None
+    cache.delete("abc")
+    cache.delete("abc")
+    assert cache.get("abc") is None
+
+
+def test_file_session_cache_secret(tempdir: Path) -> None:
+    cache = FileSessionCache(tempdir / "sessions")
+    secret = cache.secret()
+    assert len(secret) == 32
+    assert cache.secret() == secret
+    key_file = tempdir / "sessions" / "secret.key"
+    assert key_file.read_bytes() == secret
+    assert key_file.stat().st_mode & 0o777 == 0o600
+    # The key is shared by caches in the same directory
+    assert FileSessionCache(tempdir / "sessions").secret() == secret
+    assert FileSessionCache(tempdir / "other").secret() != secret
+    assert MemorySessionCache().secret() != MemorySessionCache().secret()
+
+
+def test_file_session_cache_default_directory(
+    tempdir: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tempdir))
+    assert FileSessionCache().directory == tempdir / "jmapc" / "sessions"
+
+
+def test_client_session_cache(
+    http_responses_base: responses.RequestsMock, tempdir: Path
+) -> None:
+    def _make_client() -> Client:
+        return Client(
+            host="jmap-example.localhost",
+            auth=("ness", "pk_fire"),
+            session_cache=FileSessionCache(tempdir),
+        )
+
+    http_responses_base.add(
+        method=responses.GET,
+        url="https://jmap-example.localhost/.well-known/jmap",
+        body=json.dumps(make_session_response()),
+    )
+    assert _make_client().account_id == "u1138"
+    # A warm start loads the session from the cache without a request
+    http_responses_base.calls.reset()
+    client = _make_client()
+    assert client.jmap_session.state == "test;session;state"
+    assert len(http_responses_base.calls) == 0
+    # A changed session state invalidates the cached session
+    expect_jmap_call(
+        http_responses_base,
+        {
+            "methodCalls": [["Core/echo", {"n": 1}, "single.Core/echo"]],
+            "using": ["urn:ietf:params:jmap:core"],
+        },
+        {
+            "methodResponses": [["Core/echo", {"n": 1}, "single.Core/echo"]],
+            "sessionState": "updated;state;value",
+        },
+    )
+    assert client.request(CoreEcho(data={"n": 1})) == CoreEchoResponse(
+        data={"n": 1}
+    )
+    assert [p.name for p in tempdir.iterdir()] == ["secret.key"]
+
+
+def test_client_session_cache_invalid_data() -> None:
+    cache = MemorySessionCache()
+    client = Client(
+        host="jmap-example.localhost",
+        auth=("ness", "pk_fire"),
+        session_cache=cache,
+    )
+    cache.set(cached_session_key(client), {"state": "incomplete"})
+    with responses.RequestsMock() as http_responses:
+        http_responses.add(
+            method=responses.GET,
+            url="https://jmap-example.localhost/.well-known/jmap",
+            body=json.dumps(make_session_response()),
+        )
+        assert client.jmap_session.state == "test;session;state"
+    assert cache.get(cached_session_key(client)) == make_session_response()
+
+
+@pytest.mark.parametrize("api_url_changed", [True, False])
+def test_client_session_cache_stale_api_url(api_url_changed: bool) -> None:
+    cache = MemorySessionCache()
+    client = Client(
+        host="jmap-example.localhost",
+        auth=("ness", "pk_fire"),
+        session_cache=cache,
+    )
+    stale_api_url = (
+        "https://jmap-old.localhost/api"
+        if api_url_changed
+        else "https://jmap-api.localhost/api"
+    )
+    cache.set(
+        cached_session_key(client),
+        dict(make_session_response(), apiUrl=stale_api_url),
+    )
+    with responses.RequestsMock() as http_responses:
+        http_responses.add(
+            method=responses.POST, url=stale_api_url, status=404
+        )
+        http_responses.add(
+            method=responses.GET,
+            url="https://jmap-example.localhost/.well-known/jmap",
+            body=json.dumps(make_session_response()),
+        )
+        if api_url_changed:
+            # The request is retried with the refetched session
+            expect_jmap_call(
+                http_responses,
+                {
+                    "methodCalls": [
+                        ["Core/echo", {"n": 1}, "single.Core/echo"]
+                    ],
+                    "using": ["urn:ietf:params:jmap:core"],
+                },
+                {
+                    "methodResponses": [
+                        ["Core/echo", {"n": 1}, "single.Core/echo"]
+                    ],
+                },
+            )
+            assert client.request(CoreEcho(data={"n": 1})) == CoreEchoResponse(
+                data={"n": 1}
+            )
+        else:
+            with pytest.raises(requests.HTTPError):
+                client.request(CoreEcho(data={"n": 1}))
+    assert cache.get(cached_session_key(client)) == make_session_response()
+    assert client.jmap_session.api_url == "https://jmap-api.localhost/api"
+
+
+@pytest.mark.parametrize("status", [429, 503])
+def test_client_session_cache_rejected_request(status: int) -> None:
+    cache = MemorySessionCache()
+    client = Client(
+        host="jmap-example.localhost",
+        auth=("ness", "pk_fire"),
+        session_cache=cache,
+    )
+    cache.set(cached_session_key(client), make_session_response())
+    with responses.RequestsMock() as http_responses:
+        # The session is not refetched when the server rejects the request
+        http_responses.add(
+            method=responses.POST,
+            url="https://jmap-api.localhost/api",
+            status=status,
+        )
+        with pytest.raises(requests.HTTPError):
+            client.request(CoreEcho(data={"n": 1}))
+    assert cache.get(cached_session_key(client)) == make_session_response()
+
+
+@pytest.mark.parametrize("repeatable", [True, False])
+def test_client_session_cache_stale_upload_url(repeatable: bool) -> None:
+    cache = MemorySessionCache()
+    client = Client(
+        host="jmap-example.localhost",
+        auth=("ness", "pk_fire"),
+        session_cache=cache,
+    )
+    cache.set(
+        cached_session_key(client),
+        dict(
+            make_session_response(),
+            uploadUrl="https://jmap-old.localhost/upload/{accountId}/",
+        ),
+    )
+    blob = {
+        "accountId": "u1138",
+        "blobId": "C2187",
+        "type": "text/plain",
+        "size": 4,
+    }
+    with responses.RequestsMock() as http_responses:
+        http_responses.add(
+            method=responses.POST,
+            url="https://jmap-old.localhost/upload/u1138/",
+            status=404,
+        )
+        http_responses.add(
+            method=responses.GET,
+            url="https://jmap-example.localhost/.well-known/jmap",
+            body=json.dumps(make_session_response()),
+        )
+        if repeatable:
+            http_responses.add(
+                method=responses.POST,
+                url="https://jmap-api.localhost/jmap/upload/u1138/",
+                body=json.dumps(blob),
+            )
+            assert client.upload_blob(b"test", "text/plain") == Blob(
+                id="C2187", type="text/plain", size=4
+            )
+        else:
+            # Streamed data cannot be sent again
+            with pytest.raises(requests.HTTPError):
+                client.upload_blob(iter([b"test"]), "text/plain")
+    assert cache.get(cached_session_key(client)) == make_session_response()
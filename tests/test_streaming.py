@@ -0,0 +1,112 @@
+import functools
+import io
+import json
+from typing import Any
+
+import pytest
+
+from jmapc import Email, Mailbox
+from jmapc.streaming import StreamingResponseParser, list_item_decoder
+
+test_response = {
+    "methodResponses": [
+        [
+            "Email/get",
+            {
+                "accountId": "u1138",
+                "list": [
+                    {"id": "f0001", "subject": "I have the Franklin Badge"},
+                    {"id": "f0002", "size": 1994, "keywords": {"$seen": True}},
+                ],
+                "notFound": [],
+                "state": "2187",
+            },
+            "0.Email/get",
+        ],
+        [
+            "Mailbox/get",
+            {"accountId": "u1138", "list": [], "state": "1000"},
+            "1.Mailbox/get",
+        ],
+        ["error", {"type": "serverFail", "list": [1]}, "2.Core/echo"],
+    ],
+    "sessionState": "test;session;state",
+}
+
+
+def parse(data: bytes, chunk_size: int) -> tuple[list[Any], Any]:
+    parser = StreamingResponseParser()
+    items = []
+    stream = io.BytesIO(data)
+    for chunk in iter(functools.partial(stream.read, chunk_size), b""):
+        items += parser.feed(chunk)
+    items += parser.close()
+    return items, parser.response
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 64, 1 << 20])
+@pytest.mark.parametrize("indent", [None, 4])
+def test_streaming_parser(chunk_size: int, indent: Any) -> None:
+    data = json.dumps(test_response, indent=indent).encode()
+    items, response = parse(data, chunk_size)
+    assert items == [
+        ("Email/get", {"id": "f0001", "subject": "I have the Franklin Badge"}),
+        (
+            "Email/get",
+            {"id": "f0002", "size": 1994, "keywords": {"$seen": True}},
+        ),
+    ]
+    assert response == {
+        "methodResponses": [
+            (
+                "Email/get",
+                {"accountId": "u1138", "notFound": [], "state": "2187"},
+                "0.Email/get",
+            ),
+            (
+                "Mailbox/get",
+                {"accountId": "u1138", "state": "1000"},
+                "1.Mailbox/get",
+            ),
+            ("error", {"type": "serverFail", "list": [1]}, "2.Core/echo"),
+        ],
+        "sessionState": "test;session;state",
+    }
+
+
+def test_streaming_parser_multibyte_text() -> None:
+    data = json.dumps(
+        {
+            "methodResponses": [
+                ["Email/get", {"list": [{"subject": "Mr. Saturn 🪐"}]}, "0"]
+            ],
+            "sessionState": "test;session;state",
+        },
+        ensure_ascii=False,
+    ).encode()
+    items, _ = parse(data, 1)
+    assert items == [("Email/get", {"subject": "Mr. Saturn 🪐"})]
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        b"",
+        b'{"methodResponses": [["Email/get", {"list": [{"id": "f0001"}',
+        b'{"sessionState": 1994',
+        b'["methodResponses"]',
+        b'{"methodResponses": [["Email/get" {}, "0"]]}',
+    ],
+)
+def test_streaming_parser_invalid_response(data: bytes) -> None:
+    with pytest.raises(ValueError):
+        parse(data, 1)
+
+
+def test_list_item_decoder() -> None:
+    assert list_item_decoder("Email/get")({"id": "f0001"}) == Email(id="f0001")
+    assert list_item_decoder("Mailbox/get")({"id": "MBX1"}) == Mailbox(
+        id="MBX1"
+    )
+    assert list_item_decoder("Email/query")({"id": "f0001"}) == {"id": "f0001"}
+    assert list_item_decoder("Custom/get")({"id": "c1"}) == {"id": "c1"}
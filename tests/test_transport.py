@@ -0,0 +1,142 @@
+import gzip
+import time
+from collections.abc import Iterable
+from pathlib import Path
+
+import pytest
+from requests.adapters import BaseAdapter
+
+from jmapc import (
+    Client,
+    EmailBodyPart,
+    EventSourceConfig,
+    RecordingTransport,
+    ReplayError,
+    ReplayTransport,
+)
+from jmapc.methods import CoreEcho, EmailGet
+from jmapc.testing import JMAPServer, JMAPStore
+from jmapc.transport import Exchange, read_archive, replace_strings
+
+
+@pytest.fixture
+def server() -> Iterable[JMAPServer]:
+    store = JMAPStore()
+    store.seed(10)
+    with JMAPServer(store, latency=0.1) as server:
+        yield server
+
+
+def make_client(server_url: str, transport: BaseAdapter) -> Client:
+    return Client(
+        host=server_url,
+        auth=("ness", "pk_fire"),
+        event_source_config=EventSourceConfig(closeafter="state"),
+        transport=transport,
+    )
+
+
+def test_record_replay(server: JMAPServer, tempdir: Path) -> None:
+    path = tempdir / "exchanges.jsonl.gz"
+    data = bytes(range(256)) * 4
+    client = make_client(server.url, transport=RecordingTransport(path))
+    recorded = [
+        client.request(EmailGet(ids=["M1", "M2"])),
+        client.request(EmailGet(ids=["M3"])),
+        client.request(CoreEcho(data=dict(a=1))),
+    ]
+    recorded_event = next(client.events)
+    blob = client.upload_blob(data, "application/octet-stream")
+    attachment = EmailBodyPart(
+        blob_id=blob.id, name="data.bin", type="application/octet-stream"
+    )
+    client.download_blob(attachment, tempdir / "recorded.bin", 256)
+    client.requests_session.close()
+    server.stop()
+
+    transport = ReplayTransport(path)
+    client = make_client(server.url, transport=transport)
+    # Requests are matched by body regardless of order
+    assert [
+        client.request(CoreEcho(data=dict(a=1))),
+        client.request(EmailGet(ids=["M3"])),
+        client.request(EmailGet(ids=["M1", "M2"])),
+    ] == recorded[::-1]
+    assert next(client.events) == recorded_event
+    assert client.upload_blob(data, "application/octet-stream") == blob
+    client.download_blob(attachment, tempdir / "replayed.bin", 256)
+    assert (tempdir / "replayed.bin").read_bytes() == data
+    assert transport.remaining == 0
+    with pytest.raises(ReplayError):
+        client.request(CoreEcho(data=dict(a=1)))
+
+
+def test_record_redact(server: JMAPServer, tempdir: Path) -> None:
+    path = tempdir / "exchanges.jsonl.gz"
+    client = make_client(
+        server.url,
+        transport=RecordingTransport(
+            path, redact=replace_strings({"u1138": "u0", "ness@": "paula@"})
+        ),
+    )
+    client.request(EmailGet(ids=["M1"]))
+    client.requests_session.close()
+    exchanges = read_archive(path)
+    assert [(e.method, e.url, e.status) for e in exchanges] == [
+        ("GET", f"{server.url}/.well-known/jmap", 200),
+        ("POST", f"{server.url}/api/", 200),
+    ]
+    for exchange in exchanges:
+        assert b"u1138" not in exchange.body
+        assert b"ness@" not in exchange.body
+        assert "Content-Length" not in exchange.headers
+        assert exchange.elapsed >= 0.1
+    assert exchanges[1].request_body and b'"u0"' in exchanges[1].request_body
+
+    replay_client = make_client(server.url, transport=ReplayTransport(path))
+    assert replay_client.account_id == "u0"
+    assert replay_client.jmap_session.username == "paula@onett.example.net"
+
+
+@pytest.mark.parametrize("latency_scale", [0.0, 1.0])
+def test_replay_latency(
+    server: JMAPServer, tempdir: Path, latency_scale: float
+) -> None:
+    path = tempdir / "exchanges.jsonl.gz"
+    client = make_client(server.url, transport=RecordingTransport(path))
+    client.request(CoreEcho(data=dict(a=1)))
+    client.requests_session.close()
+    client = make_client(
+        server.url,
+        transport=ReplayTransport(path, latency_scale=latency_scale),
+    )
+    start = time.perf_counter()
+    client.request(CoreEcho(data=dict(a=1)))
+    duration = time.perf_counter() - start
+    # Replay includes both the session and API requests
+    assert (duration >= 0.2) is bool(latency_scale)
+
+
+def test_exchange_encoding() -> None:
+    exchange = Exchange(
+        method="POST",
+        url="https://jmap-example.localhost/upload/u1138/",
+        request_headers={"Range": "bytes=0-1"},
+        request_body=b"\xff\x00",
+        status=201,
+        headers={"Content-Type": "application/json"},
+        elapsed=0.25,
+        chunks=[(0.25, b"\xfe"), (0.5, b"\x01")],
+    )
+    data = exchange.to_dict()
+    assert data["encoding"] == "base64"
+    assert data["chunks"] == [[0.25, "/g=="], [0.5, "AQ=="]]
+    assert Exchange.from_dict(data) == exchange
+
+
+def test_read_archive_version(tempdir: Path) -> None:
+    path = tempdir / "exchanges.jsonl.gz"
+    with gzip.open(path, "wt") as f:
+        f.write('{"version": 2}\n')
+    with pytest.raises(ValueError, match="Unsupported archive version 2"):
+        read_archive(path)
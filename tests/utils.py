@@ -5,6 +5,8 @@ from typing import Any, Callable
 import requests
 import responses
 
+from jmapc.client import ClientBase
+
 
 def assert_request_return_response(
     expected_request: dict[str, Any],
@@ -33,3 +35,9 @@ def expect_jmap_call(
         url="https://jmap-api.localhost/api",
         callback=assert_request_return_response(expected_request, response),
     )
+
+
+def cached_session_key(client: ClientBase) -> str:
+    key = client._session_cache_key
+    assert key
+    return key